@@ -0,0 +1,388 @@
+"""Offline pipeline benchmark: conversion, ingestion, retrieval, answering and conversation.
+
+Builds a synthetic corpus of JSON and Turtle credentials and runs it through
+the real pipeline, with fake chat and embedding models standing in for
+OpenAI. Each fake sleeps for a configurable latency per call, so results
+model a remote backend without network access or an API key. Per-stage
+latency percentiles, throughput and peak traced memory are printed as JSON.
+
+Run from the repository root:
+
+    python benchmarks/bench_pipeline.py --credentials 1000 --questions 50 --llm-latency-ms 20
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from chains.conversational_vc_rag import ConversationalVCRAG
+from chains.vc_rag_system import VCRAGSystem
+from models.router import RouterConfig
+from utils.bm25_index import BM25Index
+from utils.ingestion import BulkIngestor, IngestionStats, process_records
+from utils.metadata_index import MetadataIndex
+from utils.mmap_store import MmapVectorStore
+from utils.sharded_store import MetadataPartitioner, ShardedVectorStore
+
+CREDENTIAL_TYPES = [
+    "PassportCredential", "DriverLicenseCredential", "UniversityDegreeCredential",
+    "EmployeeCredential", "VaccinationCredential", "GymMembershipCredential",
+    "LibraryCardCredential", "ProfessionalLicenseCredential", "ResidencePermitCredential",
+    "HealthInsuranceCredential", "BankAccountCredential", "StudentIdCredential",
+]
+ISSUER_NAMES = [
+    "gov", "dmv", "university", "acme", "health", "gym", "library", "bar-association",
+    "immigration", "insurer", "bank", "college", "city", "hospital", "airline", "telecom",
+]
+SUBJECT_FIELDS = ["name", "memberLevel", "nationality", "degree", "licenseNumber", "department", "score"]
+
+TURTLE_PREFIXES = """@prefix cred: <https://www.w3.org/2018/credentials#> .
+@prefix ex: <http://example.org/vocab#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+"""
+
+PERCENTILES = (50, 95, 99)
+_WORD = re.compile(r"\w+")
+_QUESTION_LINE = re.compile(r"(?:Original question|Follow Up Input|Question|Human):[ \t]*(.+)")
+
+
+def issuer_ids(count: int) -> List[str]:
+    return [f"did:example:{ISSUER_NAMES[i % len(ISSUER_NAMES)]}{i // len(ISSUER_NAMES) or ''}" for i in range(count)]
+
+
+def credential_types(count: int) -> List[str]:
+    return [
+        CREDENTIAL_TYPES[i % len(CREDENTIAL_TYPES)] + str(i // len(CREDENTIAL_TYPES) or "")
+        for i in range(count)
+    ]
+
+
+def make_corpus(
+    size: int,
+    issuers: int = 16,
+    types: int = 12,
+    turtle_fraction: float = 0.3,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """Synthetic credential records: plain JSON credentials and ``rdf`` Turtle records."""
+    rng = random.Random(seed)
+    issuer_pool = issuer_ids(issuers)
+    type_pool = credential_types(types)
+    records = []
+    for i in range(size):
+        credential_type = rng.choice(type_pool)
+        issuer = rng.choice(issuer_pool)
+        issued = date(2019, 1, 1) + timedelta(days=rng.randrange(6 * 365))
+        expires = issued + timedelta(days=rng.randrange(365, 10 * 365))
+        subject = {"id": f"did:example:holder{i}", "name": f"Holder {i}"}
+        for field in rng.sample(SUBJECT_FIELDS[1:], 3):
+            subject[field] = f"{field}-{rng.randrange(1000)}"
+        credential_id = f"urn:uuid:{uuid.UUID(int=rng.getrandbits(128))}"
+        if rng.random() < turtle_fraction:
+            properties = " ; ".join(f'ex:{key} "{value}"' for key, value in subject.items() if key != "id")
+            records.append({
+                "id": credential_id,
+                "rdf": TURTLE_PREFIXES + f"""<{credential_id}> a cred:VerifiableCredential, ex:{credential_type} ;
+    cred:issuer <{issuer}> ;
+    cred:issuanceDate "{issued.isoformat()}"^^xsd:date ;
+    cred:expirationDate "{expires.isoformat()}"^^xsd:date ;
+    cred:credentialSubject [ {properties} ] .
+""",
+                "type": ["VerifiableCredential", credential_type],
+                "issuer": issuer,
+                "issuanceDate": issued.isoformat(),
+                "expirationDate": expires.isoformat()
+            })
+        else:
+            records.append({
+                "id": credential_id,
+                "type": ["VerifiableCredential", credential_type],
+                "issuer": issuer,
+                "issuanceDate": issued.isoformat(),
+                "expirationDate": expires.isoformat(),
+                "credentialSubject": subject,
+                "proof": {
+                    "type": "Ed25519Signature2020",
+                    "verificationMethod": f"{issuer}#key-1",
+                    "proofValue": "z" + hashlib.sha256(credential_id.encode("utf-8")).hexdigest() * 2
+                }
+            })
+    return records
+
+
+def make_questions(count: int, issuers: int = 16, types: int = 12, seed: int = 0) -> List[str]:
+    """Credential questions mixing content, listing and issuer lookups."""
+    rng = random.Random(seed + 1)
+    issuer_pool = issuer_ids(issuers)
+    type_pool = credential_types(types)
+    templates = [
+        lambda: f"What is the {rng.choice(SUBJECT_FIELDS)} on my {rng.choice(type_pool)}?",
+        lambda: f"When does my {rng.choice(type_pool)} expire?",
+        lambda: f"Which credentials were issued by {rng.choice(issuer_pool)}?",
+        lambda: f"How many {rng.choice(type_pool)} credentials do I have?",
+        lambda: f"Tell me about the credential issued by {rng.choice(issuer_pool)}",
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words hashing embeddings with an injected per-call latency.
+
+    Texts sharing words get similar vectors, so retrieval and routing behave
+    plausibly without a model.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for word in _WORD.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.size] += 1.0 if digest & (1 << 63) else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class SyntheticChatModel(BaseChatModel):
+    """Chat model that answers each pipeline prompt in the expected format after ``latency`` seconds."""
+
+    latency: float = 0.0
+    answer_words: int = 60
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "synthetic"
+
+    def _respond(self, prompt: str) -> str:
+        if '"datasource"' in prompt:
+            return '{"datasource": "vc_knowledge_base", "reasoning": "The question is about a credential."}'
+        # The current question is the last labelled line; chat history comes before it
+        labelled = _QUESTION_LINE.findall(prompt)
+        question = labelled[-1].strip() if labelled else "the credential"
+        if "different ways to ask" in prompt:
+            return "\n".join(f"{question} (perspective {i})" for i in range(1, 5))
+        if "Standalone question" in prompt:
+            return question
+        words = (f"According to the credentials, {question} " * self.answer_words).split()
+        return " ".join(words[:self.answer_words])
+
+    def _result(self, messages: List[Any]) -> ChatResult:
+        self.calls += 1
+        content = self._respond(str(messages[-1].content))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+
+def summarize(samples: List[float], elapsed: float, peak_memory: Optional[int]) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds, throughput and peak memory for one stage."""
+    ordered = sorted(samples)
+    summary: Dict[str, Any] = {
+        "count": len(ordered),
+        "total_seconds": elapsed,
+        "throughput_per_second": len(ordered) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+            "max": 1000 * ordered[-1] if ordered else 0.0
+        },
+        "peak_memory_bytes": peak_memory
+    }
+    for percentile in PERCENTILES:
+        # Nearest-rank percentile
+        index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+        summary["latency_ms"][f"p{percentile}"] = 1000 * ordered[index] if ordered else 0.0
+    return summary
+
+
+def run_stage(inputs: List[Any], operation: Callable[[Any], Any], trace_memory: bool) -> Dict[str, Any]:
+    """Time ``operation`` on every input, tracking peak traced memory over the whole stage."""
+    if trace_memory:
+        tracemalloc.start()
+    samples = []
+    started = time.perf_counter()
+    try:
+        for item in inputs:
+            begin = time.perf_counter()
+            operation(item)
+            samples.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return summarize(samples, elapsed, peak)
+
+
+def run_benchmark(
+    credentials: int = 500,
+    questions: int = 30,
+    sessions: int = 5,
+    turns: int = 3,
+    issuers: int = 16,
+    types: int = 12,
+    turtle_fraction: float = 0.3,
+    llm_latency_ms: float = 0.0,
+    embedding_latency_ms: float = 0.0,
+    batch_size: int = 128,
+    trace_memory: bool = True,
+    store: str = "chroma",
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Run every stage on a fresh synthetic corpus and return the JSON-ready report."""
+    records = make_corpus(credentials, issuers, types, turtle_fraction, seed)
+    question_set = make_questions(questions, issuers, types, seed)
+    embeddings = HashingEmbeddings(latency=embedding_latency_ms / 1000)
+    llm = SyntheticChatModel(latency=llm_latency_ms / 1000)
+    if store == "mmap":
+        vector_store = MmapVectorStore(embeddings)
+    elif store == "sharded":
+        vector_store = ShardedVectorStore(embeddings, partitioner=MetadataPartitioner("issuer"))
+    else:
+        vector_store = Chroma(collection_name=f"bench-{uuid.uuid4().hex}", embedding_function=embeddings)
+    lexical_index, metadata_index = BM25Index(), MetadataIndex()
+    stages: Dict[str, Any] = {}
+
+    processed: List[Dict[str, Any]] = []
+    stages["process"] = run_stage(records, lambda record: processed.extend(process_records([record])[0]), trace_memory)
+
+    ingestor = BulkIngestor(
+        vector_store,
+        embeddings=embeddings,
+        batch_size=batch_size,
+        upsert_size=batch_size,
+        lexical_index=lexical_index,
+        metadata_index=metadata_index
+    )
+    chunks = [processed[start:start + batch_size] for start in range(0, len(processed), batch_size)]
+    stages["ingest"] = run_stage(chunks, lambda chunk: ingestor.ingest_processed([chunk], IngestionStats()), trace_memory)
+    stages["ingest"]["documents_per_second"] = len(processed) / stages["ingest"]["total_seconds"] if processed else 0.0
+
+    system = VCRAGSystem(
+        vector_store=vector_store,
+        router_config=RouterConfig(),
+        llm=llm,
+        lexical_index=lexical_index,
+        metadata_index=metadata_index
+    )
+    stages["retrieve"] = run_stage(question_set, system.rag_fusion.retrieve, trace_memory)
+    stages["answer"] = run_stage(question_set, system.answer, trace_memory)
+
+    conversation = ConversationalVCRAG(vector_store=vector_store, router_config=RouterConfig(), llm=llm)
+    session_turns = [
+        (f"session-{session}", question_set[(session * turns + turn) % len(question_set)])
+        for session in range(sessions)
+        for turn in range(turns)
+    ] if question_set else []
+    stages["conversation"] = run_stage(
+        session_turns,
+        lambda item: conversation.process_query(item[1], session_id=item[0]),
+        trace_memory
+    )
+
+    return {
+        "config": {
+            "credentials": credentials,
+            "turtle_fraction": turtle_fraction,
+            "issuers": issuers,
+            "types": types,
+            "questions": questions,
+            "sessions": sessions,
+            "turns": turns,
+            "llm_latency_ms": llm_latency_ms,
+            "embedding_latency_ms": embedding_latency_ms,
+            "batch_size": batch_size,
+            "store": store,
+            "seed": seed
+        },
+        "stages": stages,
+        "backend_calls": {"llm": llm.calls, "embeddings": embeddings.calls},
+        "router_tiers": {tier.value: count for tier, count in system.router.tier_counts.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--credentials", type=int, default=500)
+    parser.add_argument("--turtle-fraction", type=float, default=0.3)
+    parser.add_argument("--issuers", type=int, default=16)
+    parser.add_argument("--types", type=int, default=12)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip tracemalloc, which slows every stage")
+    parser.add_argument("--store", choices=["chroma", "mmap", "sharded"], default="chroma")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        credentials=args.credentials,
+        questions=args.questions,
+        sessions=args.sessions,
+        turns=args.turns,
+        issuers=args.issuers,
+        types=args.types,
+        turtle_fraction=args.turtle_fraction,
+        llm_latency_ms=args.llm_latency_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        batch_size=args.batch_size,
+        trace_memory=not args.no_trace_memory,
+        store=args.store,
+        seed=args.seed
+    )
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
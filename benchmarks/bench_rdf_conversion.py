@@ -0,0 +1,78 @@
+"""Throughput benchmark: per-record RDF conversion vs. batch file parsing.
+
+Run from the repository root:
+
+    python benchmarks/bench_rdf_conversion.py --credentials 2000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from rdflib import Graph
+from rdflib.namespace import RDF
+
+from utils.data_processor import VCDataProcessor
+from utils.rdf_batch import iter_rdf_records
+
+PREFIXES = """@prefix cred: <https://www.w3.org/2018/credentials#> .
+@prefix ex: <http://example.org/vocab#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+"""
+
+
+def credential_turtle(i: int) -> str:
+    return f"""<urn:uuid:{i}> a cred:VerifiableCredential, ex:Credential{i % 7} ;
+    cred:issuer <did:example:issuer{i % 13}> ;
+    cred:issuanceDate "2023-01-{i % 28 + 1:02d}"^^xsd:date ;
+    cred:expirationDate "2028-01-{i % 28 + 1:02d}"^^xsd:date ;
+    cred:credentialSubject [ ex:name "Holder {i}" ; ex:memberLevel "Level {i % 5}" ; ex:score {i % 900} ] .
+"""
+
+
+def legacy_rdf_to_text(rdf_data: str) -> str:
+    """The pre-batch VCDataProcessor.rdf_to_text, kept for comparison."""
+    g = Graph()
+    g.parse(data=rdf_data, format="turtle")
+    text_parts = []
+    for s, p, o in g.triples((None, RDF.type, None)):
+        text_parts.append(f"Type: {o}")
+    for s, p, o in g.triples((None, None, None)):
+        if p != RDF.type:
+            text_parts.append(f"{p}: {o}")
+    return "\n".join(text_parts)
+
+
+def timed(label: str, count: int, func) -> None:
+    start = time.perf_counter()
+    produced = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>28}: {produced:6d} credentials in {elapsed:7.3f}s ({count / elapsed:9.1f} credentials/sec)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--credentials", type=int, default=2000)
+    args = parser.parse_args()
+
+    records = [PREFIXES + credential_turtle(i) for i in range(args.credentials)]
+    with tempfile.TemporaryDirectory() as tmp:
+        turtle_path = Path(tmp) / "credentials.ttl"
+        turtle_path.write_text(PREFIXES + "".join(credential_turtle(i) for i in range(args.credentials)))
+        nt_path = Path(tmp) / "credentials.nt"
+        graph = Graph()
+        graph.parse(turtle_path, format="turtle")
+        graph.serialize(nt_path, format="nt", encoding="utf-8")
+
+        timed("legacy per-record", args.credentials, lambda: sum(1 for r in records if legacy_rdf_to_text(r)))
+        timed("per-record rdf_to_text", args.credentials, lambda: sum(1 for r in records if VCDataProcessor.rdf_to_text(r)))
+        timed("batch Turtle parse", args.credentials, lambda: sum(1 for _ in iter_rdf_records(str(turtle_path))))
+        timed("batch N-Triples via Graph", args.credentials, lambda: sum(1 for _ in iter_rdf_records(str(nt_path), stream=False)))
+        timed("streamed N-Triples", args.credentials, lambda: sum(1 for _ in iter_rdf_records(str(nt_path))))
+
+
+if __name__ == "__main__":
+    main()
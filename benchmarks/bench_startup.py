@@ -0,0 +1,87 @@
+"""Startup benchmark: per-module import time and cold start of the RAG systems.
+
+Every measurement runs in a fresh interpreter, so nothing is imported yet
+and the numbers match a short-lived worker or CLI process. No network
+access is needed; the cold start uses fake embeddings and an in-memory
+vector store.
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+MODULES = [
+    "utils.data_processor",
+    "utils.ingestion",
+    "chains.router_chain",
+    "chains.rag_fusion",
+    "chains.vc_rag_system",
+    "chains.conversational_vc_rag",
+]
+
+# Imported, constructed and used for one locally-routed question
+COLD_STARTS = {
+    "vc_rag_system": """
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chains.vc_rag_system import VCRAGSystem
+from models.router import RouterConfig
+from utils.mmap_store import MmapVectorStore
+store = MmapVectorStore(DeterministicFakeEmbedding(size=32))
+store.add_texts(["Types: VerifiableCredential, PassportCredential"], ids=["passport"])
+system = VCRAGSystem(vector_store=store, router_config=RouterConfig())
+system.router.route("What is the weather in Paris?")
+""",
+    "conversational_vc_rag": """
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from chains.conversational_vc_rag import ConversationalVCRAG
+from models.router import RouterConfig
+from utils.mmap_store import MmapVectorStore
+store = MmapVectorStore(DeterministicFakeEmbedding(size=32))
+rag = ConversationalVCRAG(vector_store=store, router_config=RouterConfig())
+rag.end_session("cli")
+""",
+}
+
+
+def time_snippet(code: str) -> float:
+    """Seconds ``code`` takes in a fresh interpreter, excluding interpreter startup."""
+    script = f"import time\nstarted = time.perf_counter()\n{code}\nprint(time.perf_counter() - started)\n"
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def median_ms(code: str, runs: int) -> float:
+    return 1000 * statistics.median(time_snippet(code) for _ in range(runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "import_ms": {module: median_ms(f"import {module}", args.runs) for module in MODULES},
+        "cold_start_ms": {name: median_ms(code, args.runs) for name, code in COLD_STARTS.items()}
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,74 @@
-import os
-from typing import Dict, List, Optional
-from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain.prompts import PromptTemplate
+from functools import cached_property
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import threading
+from langchain_core.documents import Document
+from models.memory import SessionMemoryConfig
 from models.router import RouterConfig
-from utils.data_processor import VCDataProcessor
+from utils.clients import chat_model
+from utils.context_packer import ContextPacker
+from utils.follow_ups import FollowUpCache
+from utils.rank_fusion import document_key
+from utils.semantic_cache import SemanticCache
+from utils.session_memory import SessionMemory, SessionMemoryManager
+from utils.streaming import GenerationTimer, chunk_text, context_event, final_event, token_event
+from utils.vector_search import get_embedding_function
+from utils.working_set import WorkingSet, is_standalone_question
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.vectorstores import VectorStore
+    from langchain.chains import ConversationalRetrievalChain
 
 class ConversationalVCRAG:
     def __init__(
         self,
-        vector_store: Chroma,
+        vector_store: "VectorStore",
         router_config: RouterConfig,
         generation_model_name: str = "gpt-4-turbo-preview",
         generation_temperature: float = 0.0,
         memory_key: str = "chat_history",
-        allow_private_info: bool = False
+        allow_private_info: bool = False,
+        answer_cache: Optional[SemanticCache] = None,
+        memory_config: Optional[SessionMemoryConfig] = None,
+        context_packer: Optional[ContextPacker] = None,
+        llm: Optional["BaseChatModel"] = None,
+        speculative_follow_ups: bool = False,
+        follow_up_timeout: float = 10.0
     ):
         self.vector_store = vector_store
         self.router_config = router_config
         self.allow_private_info = allow_private_info
-        self.last_documents = []
+        self.answer_cache = answer_cache
+        self.context_packer = context_packer or ContextPacker()
+        self.generation_model_name = generation_model_name
+        self.generation_temperature = generation_temperature
         
-        # Initialize the LLM for generation
-        self.llm = ChatOpenAI(
-            model_name=generation_model_name,
-            temperature=generation_temperature
-        )
+        # The generation LLM and the QA chain are built on first use
+        if llm is not None:
+            self.llm = llm
         
-        # Initialize memory with output key
-        self.memory = ConversationBufferMemory(
+        # Per-session memories; all sessions share the QA chain and LLM client
+        self.sessions = SessionMemoryManager(
+            memory_config or SessionMemoryConfig(),
+            summarize=self._summarize_history,
+            asummarize=self._asummarize_history,
             memory_key=memory_key,
-            output_key="answer",
-            return_messages=True
+            on_evict=self._cancel_follow_ups
         )
         
-        # Create QA chain
-        self.qa_chain = self._create_qa_chain()
+        # How turns were condensed and retrieved
+        self.turn_counts = {"condensed": 0, "standalone": 0, "retrieved": 0, "reused": 0}
+        
+        # Opt-in: generate follow-up suggestions alongside each answer
+        self.follow_up_timeout = follow_up_timeout
+        self.follow_ups = FollowUpCache(self._generate_follow_ups) if speculative_follow_ups else None
     
-    def _create_qa_chain(self) -> ConversationalRetrievalChain:
-        """Create a conversational QA chain."""
-        # Create the prompt template
+    @cached_property
+    def qa_prompt(self) -> "PromptTemplate":
+        """Prompt for the QA step, shared by the chain and the per-session answer path."""
+        from langchain_core.prompts import PromptTemplate
+        
         template = """You are a helpful assistant that answers questions about Verifiable Credentials.
         Use the following pieces of context to answer the question at the end.
         If you don't know the answer, just say that you don't know, don't try to make up an answer.
@@ -55,10 +82,64 @@ class ConversationalVCRAG:
         Human: {question}
         Assistant: Let me help you with that. """
         
-        QA_PROMPT = PromptTemplate(
+        return PromptTemplate(
             template=template,
             input_variables=["context", "chat_history", "question"]
         )
+    
+    @cached_property
+    def llm(self) -> "BaseChatModel":
+        """Shared client for the generation model."""
+        return chat_model(self.generation_model_name, self.generation_temperature)
+    
+    @cached_property
+    def qa_chain(self) -> "ConversationalRetrievalChain":
+        return self._create_qa_chain()
+    
+    @property
+    def memory(self) -> SessionMemory:
+        """Memory of the default session."""
+        return self.sessions.get()
+    
+    @property
+    def last_documents(self) -> List:
+        """Documents retrieved for the default session's last turn."""
+        return self.sessions.get().last_documents
+    
+    @last_documents.setter
+    def last_documents(self, documents: List) -> None:
+        self.sessions.get().last_documents = documents
+    
+    def _summarize_history(self, summary: str, new_lines: str) -> str:
+        """Fold turns that left the history window into the rolling summary."""
+        from langchain.memory.prompt import SUMMARY_PROMPT
+        
+        return self.llm.invoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines)).content
+    
+    async def _asummarize_history(self, summary: str, new_lines: str) -> str:
+        from langchain.memory.prompt import SUMMARY_PROMPT
+        
+        response = await self.llm.ainvoke(SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines))
+        return response.content
+    
+    def end_session(self, session_id: Optional[str] = None) -> None:
+        """Discard a session's conversation memory."""
+        self.sessions.end(session_id)
+    
+    def _cancel_follow_ups(self, session_id: str) -> None:
+        """Abandon a session's unfinished suggestions: its next query arrived or it was evicted."""
+        if getattr(self, "follow_ups", None) is not None:
+            self.follow_ups.cancel(session_id)
+    
+    def _set_documents(self, session: SessionMemory, documents: List) -> None:
+        """Record a turn's documents and start suggesting follow-ups for them in the background."""
+        session.last_documents = documents
+        if self.follow_ups is not None:
+            self.follow_ups.start(session.session_id, documents)
+    
+    def _create_qa_chain(self) -> "ConversationalRetrievalChain":
+        """Create a conversational QA chain."""
+        from langchain.chains import ConversationalRetrievalChain
         
         # Create the chain with improved retrieval
         return ConversationalRetrievalChain.from_llm(
@@ -69,21 +150,25 @@ class ConversationalVCRAG:
                     "k": 5  # Increase number of retrieved documents
                 }
             ),
-            memory=self.memory,
-            combine_docs_chain_kwargs={"prompt": QA_PROMPT},
+            combine_docs_chain_kwargs={"prompt": self.qa_prompt},
             return_source_documents=True,  # Ensure we get source documents
             return_generated_question=True
         )
     
+    @staticmethod
+    def _credential_type(doc) -> str:
+        """Credential type from ``credential_type`` or the ``type`` field set by ``process_vc_data``."""
+        metadata = getattr(doc, "metadata", None) or {}
+        return metadata.get("credential_type") or metadata.get("type") or "Unknown"
+    
     def _format_context(self, documents: List) -> str:
         """Format retrieved documents into a string for context."""
         formatted_context = []
         for doc in documents:
-            if hasattr(doc, 'metadata') and 'credential_type' in doc.metadata:
-                formatted_context.append(
-                    f"Credential Type: {doc.metadata['credential_type']}\n"
-                    f"Content: {doc.page_content}\n"
-                )
+            formatted_context.append(
+                f"Credential Type: {self._credential_type(doc)}\n"
+                f"Content: {doc.page_content}\n"
+            )
         return "\n".join(formatted_context)
     
     def _extract_source_data(self, documents: List) -> List[Dict]:
@@ -92,51 +177,300 @@ class ConversationalVCRAG:
         for doc in documents:
             if hasattr(doc, 'metadata'):
                 source_data.append({
-                    "credential_type": doc.metadata.get("credential_type", "Unknown"),
+                    "credential_type": self._credential_type(doc),
                     "content": doc.page_content,
                     "metadata": doc.metadata
                 })
         return source_data
     
-    def process_query(self, question: str) -> Dict:
-        """Process a question and return the answer with context."""
-        # Get the answer from the QA chain using invoke
-        result = self.qa_chain.invoke({"question": question})
+    @staticmethod
+    def _is_first_turn(session: SessionMemory) -> bool:
+        return not session.chat_memory.messages and not session.summary
+    
+    def _lookup_cached_answer(self, question: str, session: SessionMemory) -> Optional[Dict]:
+        """Serve a stand-alone question from the answer cache.
+
+        Answers only depend on the question when there is no chat history, so
+        the cache is consulted for the first turn of a conversation only.
+        """
+        if self.answer_cache is None or not self._is_first_turn(session):
+            return None
         
-        # Store the last retrieved documents
-        self.last_documents = result.get("source_documents", [])
+        cached = self.answer_cache.lookup(question)
+        if cached is None:
+            return None
         
+        # Keep the conversation state consistent with an uncached turn
+        self.sessions.save_turn(session, question, cached["answer"])
+        self._set_documents(session, [
+            Document(page_content=item["content"], metadata=item["metadata"])
+            for item in cached.get("source_data", [])
+        ])
+        return cached
+    
+    def _build_response(
+        self,
+        question: str,
+        answer: str,
+        generated_question: str,
+        is_first_turn: bool,
+        documents: List
+    ) -> Dict:
+        """Build the answer dict for the retrieved documents and cache first turns."""
         # Format the context
-        context = self._format_context(self.last_documents)
+        context = self._format_context(documents)
         
         # Extract source data
-        source_data = self._extract_source_data(self.last_documents)
+        source_data = self._extract_source_data(documents)
         
-        return {
-            "answer": result["answer"],
+        response = {
+            "answer": answer,
             "reasoning": "The answer was generated based on the retrieved Verifiable Credentials.",
-            "source": "vc_knowledge_base" if self.last_documents else "not_found",
+            "source": "vc_knowledge_base" if documents else "not_found",
             "context": context,
             "source_data": source_data,  # Include the actual source data
-            "generated_question": result.get("generated_question", question)
+            "generated_question": generated_question
         }
+        
+        if self.answer_cache is not None and is_first_turn and documents:
+            self.answer_cache.store(
+                question,
+                response,
+                [document_key(doc) for doc in documents]
+            )
+        
+        return response
     
-    def get_follow_up_suggestions(self) -> List[str]:
-        """Generate follow-up questions based on the last context."""
-        if not self.last_documents:
-            return []
+    def process_query(self, question: str, session_id: Optional[str] = None) -> Dict:
+        """Process a question within a session and return the answer with context.
+
+        Without ``session_id`` the default session is used.
+        """
+        session = self.sessions.get(session_id)
+        self._cancel_follow_ups(session.session_id)
+        is_first_turn = self._is_first_turn(session)
+        cached = self._lookup_cached_answer(question, session)
+        if cached is not None:
+            return cached
         
-        # Create a prompt for generating follow-up questions
-        follow_up_prompt = f"""Based on the following Verifiable Credentials information, suggest 3 relevant follow-up questions:
+        # Condense and retrieve with the shared chain's steps, using this session's history
+        chat_history, generated_question, documents = self._prepare_turn(question, session)
+        self._set_documents(session, documents)
         
-        {self._format_context(self.last_documents)}
+        prompt = self._qa_prompt_text(documents, chat_history, generated_question)
+        answer = self.llm.invoke(prompt).content
+        self.sessions.save_turn(session, question, answer)
+        
+        return self._build_response(question, answer, generated_question, is_first_turn, documents)
+    
+    def _chat_history_text(self, session: SessionMemory) -> str:
+        """Render a session's summary and recent turns the way the QA chain does."""
+        from langchain.chains.conversational_retrieval.base import _get_chat_history
+        
+        history = session.load_memory_variables({})[session.memory_key]
+        return _get_chat_history(history)
+    
+    def _qa_prompt_text(self, documents: List, chat_history: str, question: str) -> str:
+        """Format the QA prompt exactly as the chain's stuff-documents step would."""
+        return self.qa_prompt.format(
+            context="\n\n".join(doc.page_content for doc in documents),
+            chat_history=chat_history,
+            question=question
+        )
+    
+    def _needs_condensing(self, question: str, chat_history: str) -> bool:
+        """Condense only follow-ups that may depend on the history to be understood."""
+        if not chat_history:
+            return False
+        if self.sessions.config.standalone_check and is_standalone_question(question):
+            self.turn_counts["standalone"] += 1
+            return False
+        self.turn_counts["condensed"] += 1
+        return True
+    
+    def _working_set_documents(self, session: SessionMemory, embedding: List[float]) -> Optional[List]:
+        """The session's recent credentials, if the question is close to the one that retrieved them."""
+        working_set = session.working_set
+        if working_set is None or working_set.similarity(embedding) < self.sessions.config.working_set_similarity:
+            return None
+        self.turn_counts["reused"] += 1
+        return list(working_set.documents)
+    
+    def _remember_retrieval(self, session: SessionMemory, embedding: List[float], documents: List) -> List:
+        if session.working_set is None:
+            session.working_set = WorkingSet(self.sessions.config.working_set_size)
+        session.working_set.update(embedding, documents)
+        self.turn_counts["retrieved"] += 1
+        return documents
+    
+    def _retrieve(self, question: str, session: SessionMemory) -> List:
+        """Documents for a turn, from the session's working set or a fresh search.
+
+        The question is embedded once, both to compare it with the working
+        set and, on a miss, to search by vector with the chain's retriever
+        settings.
+        """
+        retriever = self.qa_chain.retriever
+        if self.sessions.config.working_set_similarity is None:
+            self.turn_counts["retrieved"] += 1
+            return retriever.invoke(question)
+        
+        embedding = get_embedding_function(self.vector_store).embed_query(question)
+        documents = self._working_set_documents(session, embedding)
+        if documents is not None:
+            return documents
+        documents = retriever.vectorstore.similarity_search_by_vector(embedding, **retriever.search_kwargs)
+        return self._remember_retrieval(session, embedding, documents)
+    
+    async def _aretrieve(self, question: str, session: SessionMemory) -> List:
+        """Asynchronous variant of ``_retrieve``."""
+        retriever = self.qa_chain.retriever
+        if self.sessions.config.working_set_similarity is None:
+            self.turn_counts["retrieved"] += 1
+            return await retriever.ainvoke(question)
+        
+        embedding = await get_embedding_function(self.vector_store).aembed_query(question)
+        documents = self._working_set_documents(session, embedding)
+        if documents is not None:
+            return documents
+        documents = await retriever.vectorstore.asimilarity_search_by_vector(embedding, **retriever.search_kwargs)
+        return self._remember_retrieval(session, embedding, documents)
+    
+    def _prepare_turn(self, question: str, session: SessionMemory) -> Tuple[str, str, List]:
+        """Condense the question with chat history if needed and retrieve documents for it, packed to the token budget."""
+        chat_history = self._chat_history_text(session)
+        generated_question = question
+        if self._needs_condensing(question, chat_history):
+            generated_question = self.qa_chain.question_generator.invoke({
+                "question": question,
+                "chat_history": chat_history
+            })["text"]
+        documents = self.context_packer.pack(self._retrieve(generated_question, session)).documents
+        return chat_history, generated_question, documents
+    
+    async def _aprepare_turn(self, question: str, session: SessionMemory) -> Tuple[str, str, List]:
+        """Asynchronous variant of ``_prepare_turn``."""
+        chat_history = self._chat_history_text(session)
+        generated_question = question
+        if self._needs_condensing(question, chat_history):
+            generated_question = (await self.qa_chain.question_generator.ainvoke({
+                "question": question,
+                "chat_history": chat_history
+            }))["text"]
+        documents = self.context_packer.pack(await self._aretrieve(generated_question, session)).documents
+        return chat_history, generated_question, documents
+    
+    def process_query_stream(self, question: str, session_id: Optional[str] = None) -> Iterator[Dict]:
+        """Stream the answer to a question as events.
+
+        Yields a ``context`` event with the retrieved documents' metadata, one
+        ``token`` event per chunk of generated text, and a ``final`` event whose
+        ``result`` is the dict ``process_query`` would return and whose
+        ``timings`` hold time-to-first-token and total generation time.
+        """
+        session = self.sessions.get(session_id)
+        self._cancel_follow_ups(session.session_id)
+        is_first_turn = self._is_first_turn(session)
+        cached = self._lookup_cached_answer(question, session)
+        if cached is not None:
+            yield token_event(cached["answer"])
+            yield final_event(cached)
+            return
+        
+        chat_history, generated_question, documents = self._prepare_turn(question, session)
+        self._set_documents(session, documents)
+        yield context_event(documents, self._format_context(documents))
+        
+        timer = GenerationTimer()
+        timer.start()
+        answer_parts = []
+        prompt = self._qa_prompt_text(documents, chat_history, generated_question)
+        for chunk in self.llm.stream(prompt):
+            text = chunk_text(chunk)
+            if not text:
+                continue
+            timer.mark_token()
+            answer_parts.append(text)
+            yield token_event(text)
+        timer.finish()
+        
+        answer = "".join(answer_parts)
+        self.sessions.save_turn(session, question, answer)
+        yield final_event(self._build_response(question, answer, generated_question, is_first_turn, documents), timer)
+    
+    async def aprocess_query_stream(self, question: str, session_id: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Asynchronous variant of ``process_query_stream``."""
+        session = self.sessions.get(session_id)
+        self._cancel_follow_ups(session.session_id)
+        is_first_turn = self._is_first_turn(session)
+        cached = self._lookup_cached_answer(question, session)
+        if cached is not None:
+            yield token_event(cached["answer"])
+            yield final_event(cached)
+            return
+        
+        chat_history, generated_question, documents = await self._aprepare_turn(question, session)
+        self._set_documents(session, documents)
+        yield context_event(documents, self._format_context(documents))
+        
+        timer = GenerationTimer()
+        timer.start()
+        answer_parts = []
+        prompt = self._qa_prompt_text(documents, chat_history, generated_question)
+        async for chunk in self.llm.astream(prompt):
+            text = chunk_text(chunk)
+            if not text:
+                continue
+            timer.mark_token()
+            answer_parts.append(text)
+            yield token_event(text)
+        timer.finish()
+        
+        answer = "".join(answer_parts)
+        await self.sessions.asave_turn(session, question, answer)
+        yield final_event(self._build_response(question, answer, generated_question, is_first_turn, documents), timer)
+    
+    def _follow_up_prompt(self, documents: Sequence) -> str:
+        """Prompt asking for follow-up questions about the given documents."""
+        return f"""Based on the following Verifiable Credentials information, suggest 3 relevant follow-up questions:
+        
+        {self._format_context(documents)}
         
         Generate 3 follow-up questions that would help explore this information further.
         Questions should be specific and related to the credentials shown.
         Return only the questions, one per line."""
+    
+    def _generate_follow_ups(self, documents: Sequence, cancelled: Optional[threading.Event] = None) -> Optional[List[str]]:
+        """Ask the LLM for follow-up questions; returns None if ``cancelled`` is set meanwhile."""
+        prompt = self._follow_up_prompt(documents)
+        if cancelled is None:
+            content = self.llm.invoke(prompt).content
+        else:
+            # Stream so a superseded background task stops between chunks
+            parts = []
+            for chunk in self.llm.stream(prompt):
+                if cancelled.is_set():
+                    return None
+                parts.append(chunk_text(chunk))
+            content = "".join(parts)
+        questions = [q.strip() for q in content.split('\n') if q.strip()]
         
-        # Get follow-up questions from the LLM
-        response = self.llm.invoke(follow_up_prompt)
-        questions = [q.strip() for q in response.content.split('\n') if q.strip()]
+        return questions[:3]  # Return at most 3 questions
+    
+    def get_follow_up_suggestions(self, session_id: Optional[str] = None, timeout: Optional[float] = None) -> List[str]:
+        """Generate follow-up questions based on the session's last context.
+
+        With ``speculative_follow_ups`` the suggestions started alongside the
+        answer are returned from the cache, or awaited for at most
+        ``timeout`` seconds (``follow_up_timeout`` by default); a timeout
+        yields no suggestions.
+        """
+        last_documents = self.sessions.get(session_id).last_documents
+        if not last_documents:
+            return []
+        
+        if self.follow_ups is not None:
+            return self.follow_ups.get(last_documents, self.follow_up_timeout if timeout is None else timeout)
         
-        return questions[:3]  # Return at most 3 questions 
\ No newline at end of file
+        # Get follow-up questions from the LLM
+        return self._generate_follow_ups(last_documents)
@@ -0,0 +1,123 @@
+from typing import Any, Dict, Iterable, Optional
+import re
+
+from models.router import DataSource
+
+# Vocabulary that signals a question about the holder's credentials
+VC_LEXICON = {
+    "verifiable", "credential", "credentials", "vc", "vcs", "issuer", "issued",
+    "issuance", "expire", "expires", "expired", "expiry", "expiration",
+    "validity", "holder", "did", "proof", "signed", "revoked", "revocation",
+    "passport", "diploma", "degree", "university", "license", "licence",
+    "membership", "certificate", "certification", "nationality", "identity",
+    "employment", "employer", "insurance", "vaccination", "badge",
+}
+
+# Terms that only occur in questions about credentials; words such as
+# "expired" or "university" are common elsewhere and need one of these
+# before the lexicon alone can route a question in domain
+CREDENTIAL_TERMS = {
+    "verifiable", "credential", "credentials", "vc", "vcs", "did", "issuer", "holder",
+    "passport", "diploma", "degree", "license", "licence", "certificate", "vaccination", "badge",
+}
+
+# Lexicon score of a question that has no credential-specific term
+GENERIC_SCORE_CAP = 0.25
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+
+class LocalRouteClassifier:
+    """Cheap, LLM-free in/out-of-domain classifier for router questions.
+
+    Scores a question by its overlap with a Verifiable Credentials lexicon
+    and, when a vector store is available, by its nearest-neighbour relevance
+    to the stored credentials. Confidence near 1 means clearly in domain and
+    near 0 means clearly out of domain; anything in between is left to the
+    LLM router, and so are out-of-domain guesses, which ``RouterChain`` only
+    uses when the LLM is unavailable.
+    """
+
+    def __init__(
+        self,
+        vector_store: Optional[Any] = None,
+        lexicon: Optional[Iterable[str]] = None,
+        lexicon_saturation: int = 2,
+        credential_terms: Optional[Iterable[str]] = None
+    ):
+        self.vector_store = vector_store
+        self.lexicon = set(VC_LEXICON if lexicon is None else lexicon)
+        if credential_terms is None:
+            credential_terms = CREDENTIAL_TERMS if lexicon is None else self.lexicon
+        self.credential_terms = set(credential_terms)
+        self.lexicon_saturation = lexicon_saturation
+
+    def add_terms(self, terms: Iterable[str]) -> None:
+        """Extend the lexicon, e.g. with credential type names from the corpus."""
+        for term in terms:
+            # PassportCredential -> passport, credential
+            tokens = self._tokenize(_CAMEL_CASE_PATTERN.sub(" ", term))
+            self.lexicon.update(tokens)
+            self.credential_terms.update(tokens)
+
+    @staticmethod
+    def _tokenize(text: str) -> list:
+        return _TOKEN_PATTERN.findall(text.lower())
+
+    def lexicon_score(self, question: str) -> float:
+        """Fraction of the saturation count of lexicon terms found in the question.
+
+        Capped at ``GENERIC_SCORE_CAP`` unless one of the terms is credential-specific.
+        """
+        # "DriverLicenseCredential" counts as driver, license and credential
+        tokens = self._tokenize(_CAMEL_CASE_PATTERN.sub(" ", question))
+        matches = {token for token in tokens if token in self.lexicon}
+        score = min(1.0, len(matches) / self.lexicon_saturation)
+        if not matches & self.credential_terms:
+            score = min(score, GENERIC_SCORE_CAP)
+        return score
+
+    def _combine(self, lexical: float, neighbour: Optional[float]) -> Dict[str, Any]:
+        if neighbour is None:
+            score = lexical
+        else:
+            score = 0.5 * lexical + 0.5 * neighbour
+        in_domain = score >= 0.5
+        if in_domain:
+            confidence = score
+        elif neighbour is None:
+            # Missing vocabulary alone is not evidence that the corpus can't answer
+            confidence = 0.0
+        else:
+            confidence = 1.0 - score
+        return {
+            "datasource": DataSource.VC_KNOWLEDGE_BASE if in_domain else DataSource.NOT_FOUND,
+            "confidence": confidence,
+            "reasoning": (
+                f"Local classifier: lexicon score {lexical:.2f}"
+                + ("" if neighbour is None else f", nearest credential relevance {neighbour:.2f}")
+            )
+        }
+
+    def classify(self, question: str) -> Dict[str, Any]:
+        """Return the local routing decision with its confidence."""
+        neighbour = None
+        if self.vector_store is not None:
+            try:
+                results = self.vector_store.similarity_search_with_relevance_scores(question, k=1)
+                neighbour = max(0.0, min(1.0, results[0][1])) if results else 0.0
+            except Exception:
+                neighbour = None
+        return self._combine(self.lexicon_score(question), neighbour)
+
+    async def aclassify(self, question: str) -> Dict[str, Any]:
+        """Asynchronous variant of ``classify``."""
+        neighbour = None
+        if self.vector_store is not None:
+            try:
+                results = await self.vector_store.asimilarity_search_with_relevance_scores(question, k=1)
+                neighbour = max(0.0, min(1.0, results[0][1])) if results else 0.0
+            except Exception:
+                neighbour = None
+        return self._combine(self.lexicon_score(question), neighbour)
@@ -1,25 +1,61 @@
-from typing import List, Dict, Any
+import asyncio
+import json
+from functools import cached_property
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import numpy as np
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+
+from utils.bm25_index import BM25Index
+from utils.clients import chat_model
+from utils.rank_fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+from utils.tokens import count_tokens
+from utils.tracing import NULL_TRACER
+from utils.vector_search import (
+    ScoredDocument,
+    batch_similarity_search_by_vectors,
+    get_embedding_function
+)
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.vectorstores import VectorStore
 
 class RAGFusion:
     def __init__(
         self,
-        vector_store: Chroma,
-        llm: ChatOpenAI,
+        vector_store: "VectorStore",
+        llm: Optional["BaseChatModel"] = None,
         num_queries: int = 4,
-        top_k: int = 3
+        top_k: int = 3,
+        max_concurrent_searches: int = 4,
+        batch_queries: bool = False,
+        rrf_k: int = DEFAULT_RRF_K,
+        query_weights: Optional[List[float]] = None,
+        lexical_index: Optional[BM25Index] = None,
+        tracer: Optional[Any] = None,
+        model_name: str = "gpt-4",
+        temperature: float = 0.7
     ):
         self.vector_store = vector_store
-        self.llm = llm
+        if llm is not None:
+            self.llm = llm
+        self.model_name = model_name
+        self.temperature = temperature
         self.num_queries = num_queries
         self.top_k = top_k
+        self.max_concurrent_searches = max_concurrent_searches
+        self.batch_queries = batch_queries
+        self.rrf_k = rrf_k
+        self.query_weights = query_weights
+        self.lexical_index = lexical_index
+        self.tracer = tracer or NULL_TRACER
+
+    @cached_property
+    def query_generation_prompt(self) -> "PromptTemplate":
+        """Prompt for generating the query variations."""
+        from langchain_core.prompts import PromptTemplate
         
-        # Initialize query generation prompt
-        self.query_generation_prompt = PromptTemplate(
+        return PromptTemplate(
             input_variables=["question", "num_queries"],
             template="""Given the following question, generate {num_queries} different ways to ask the same question.
             Each query should capture a different aspect or perspective of the original question.
@@ -28,57 +64,293 @@ class RAGFusion:
             Generate {num_queries} queries:
             1. """
         )
-        
+
+    @cached_property
+    def llm(self) -> "BaseChatModel":
+        """Shared client for ``model_name``, created when queries are first generated."""
+        return chat_model(self.model_name, self.temperature)
+
+    @cached_property
+    def query_generation_chain(self):
         # Create the chain using the new RunnableSequence pattern
-        self.query_generation_chain = self.query_generation_prompt | self.llm
+        return self.query_generation_prompt | self.llm
+
+    def _parse_queries(self, content: str) -> List[str]:
+        """Parse the LLM response into individual queries."""
+        queries = [q.strip() for q in content.split("\n") if q.strip()]
+        return queries[:self.num_queries]
+
+    def _traced_queries(self, span: Any, question: str, content: str) -> List[str]:
+        queries = self._parse_queries(content)
+        if span.recording:
+            span.set(
+                tokens_in=count_tokens(self.query_generation_prompt.format(question=question, num_queries=self.num_queries)),
+                tokens_out=count_tokens(content),
+                queries=len(queries)
+            )
+        return queries
 
     def generate_queries(self, question: str) -> List[str]:
         """Generate multiple queries from the original question."""
-        response = self.query_generation_chain.invoke({
-            "question": question,
-            "num_queries": self.num_queries
-        })
-        
-        # Parse the response to extract individual queries
-        queries = [q.strip() for q in response.content.split("\n") if q.strip()]
-        return queries[:self.num_queries]
+        with self.tracer.span("generate_queries") as span:
+            response = self.query_generation_chain.invoke({
+                "question": question,
+                "num_queries": self.num_queries
+            })
+            
+            # Parse the response to extract individual queries
+            return self._traced_queries(span, question, response.content)
+
+    async def agenerate_queries(self, question: str) -> List[str]:
+        """Asynchronously generate multiple queries from the original question."""
+        with self.tracer.span("generate_queries") as span:
+            response = await self.query_generation_chain.ainvoke({
+                "question": question,
+                "num_queries": self.num_queries
+            })
+            return self._traced_queries(span, question, response.content)
+
+    def generate_queries_batch(self, questions: List[str], max_concurrency: Optional[int] = None) -> List[List[str]]:
+        """Generate queries for many questions with the chat model's ``batch``.
+
+        A question whose generation fails gets no generated queries and is
+        searched with the original question only.
+        """
+        with self.tracer.span("generate_queries_batch", questions=len(questions)) as span:
+            responses = self.query_generation_chain.batch(
+                [{"question": question, "num_queries": self.num_queries} for question in questions],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True
+            )
+            queries = [
+                [] if isinstance(response, Exception) else self._parse_queries(response.content)
+                for response in responses
+            ]
+            span.set(failures=sum(isinstance(response, Exception) for response in responses))
+        return queries
+
+    def fuse(self, results: List[List[Any]]) -> List[Tuple[Any, float]]:
+        """Fuse per-search result lists into ``(document, rrf_score)`` pairs, best first.
+
+        ``query_weights`` apply positionally to the result lists; lists beyond
+        the configured weights get weight 1.0.
+        """
+        weights = None
+        if self.query_weights is not None:
+            weights = list(self.query_weights[:len(results)])
+            weights += [1.0] * (len(results) - len(weights))
+        return reciprocal_rank_fusion(results, k=self.rrf_k, weights=weights)
 
     def reciprocal_rank_fusion(self, results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """Combine and re-rank results using Reciprocal Rank Fusion."""
-        # Initialize scores dictionary
-        scores = {}
-        
-        # Calculate RRF scores
-        for rank, result_list in enumerate(results):
-            for doc in result_list:
-                doc_id = doc.metadata.get("id", str(doc))
-                if doc_id not in scores:
-                    scores[doc_id] = {"score": 0, "doc": doc}
-                scores[doc_id]["score"] += 1.0 / (rank + 1)
-        
-        # Sort by RRF score
-        ranked_docs = sorted(
-            scores.values(),
-            key=lambda x: x["score"],
-            reverse=True
+        return [doc for doc, _ in self.fuse(results)]
+
+    def search_batch(
+        self,
+        question: str,
+        queries: List[str],
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[ScoredDocument]]:
+        """Embed the original question and all queries in one call and search them together.
+
+        Returns one ``(document, distance)`` list per search, the original
+        question first, followed by the generated queries in order.
+        """
+        search_texts = [question] + list(queries)
+        embeddings = get_embedding_function(self.vector_store).embed_documents(search_texts)
+        return batch_similarity_search_by_vectors(
+            self.vector_store,
+            embeddings,
+            k=self.top_k,
+            filter=filter
         )
-        
-        return [item["doc"] for item in ranked_docs]
 
-    def retrieve(self, question: str) -> List[Dict[str, Any]]:
-        """Perform RAG-Fusion retrieval."""
+    async def asearch_batch(
+        self,
+        question: str,
+        queries: List[str],
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[ScoredDocument]]:
+        """Asynchronous variant of ``search_batch``."""
+        search_texts = [question] + list(queries)
+        embeddings = await get_embedding_function(self.vector_store).aembed_documents(search_texts)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            lambda: batch_similarity_search_by_vectors(self.vector_store, embeddings, k=self.top_k, filter=filter)
+        )
+
+    def lexical_shortcut(
+        self,
+        question: str,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Documents for identifier-heavy questions answered by the lexical index alone.
+
+        Returns None unless the question names a DID, URL, date or type name
+        and the best BM25 hit contains all of them, in which case query
+        generation and vector search are skipped.
+        """
+        if self.lexical_index is None:
+            return None
+        with self.tracer.span("lexical_shortcut") as span:
+            results = self.lexical_index.identifier_match(question, k=self.top_k, filter=filter)
+            span.set(hit=results is not None)
+        if results is None:
+            return None
+        return [doc for doc, _ in results]
+
+    def _with_lexical(
+        self,
+        question: str,
+        all_results: List[List[Any]],
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Any]]:
+        """Append the BM25 result list for the question, if a lexical index is set."""
+        if self.lexical_index is None:
+            return all_results
+        with self.tracer.span("lexical_search") as span:
+            lexical = [doc for doc, _ in self.lexical_index.search(question, k=self.top_k, filter=filter)]
+            span.set(retrieved=len(lexical))
+        return list(all_results) + [lexical]
+
+    def _fuse_top(
+        self,
+        question: str,
+        all_results: List[List[Any]],
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Add the lexical list, fuse all result lists and keep the ``top_k`` documents."""
+        all_results = self._with_lexical(question, all_results, filter)
+        with self.tracer.span("fuse") as span:
+            fused_results = self.reciprocal_rank_fusion(all_results)[:self.top_k]
+            if span.recording:
+                span.set(lists=len(all_results), candidates=sum(len(results) for results in all_results), fused=len(fused_results))
+        return fused_results
+
+    def retrieve(
+        self,
+        question: str,
+        queries: Optional[List[str]] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Perform RAG-Fusion retrieval.
+
+        ``filter`` is a Chroma ``where`` clause applied to every search.
+        """
+        shortcut = self.lexical_shortcut(question, filter=filter)
+        if shortcut is not None:
+            return shortcut
+        
         # Generate multiple queries
-        queries = self.generate_queries(question)
+        if queries is None:
+            queries = self.generate_queries(question)
         
-        # Retrieve documents for each query
-        all_results = []
-        for query in queries:
-            results = self.vector_store.similarity_search(
-                query,
-                k=self.top_k
-            )
-            all_results.append(results)
+        with self.tracer.span("search", searches=len(queries), batched=self.batch_queries) as span:
+            if self.batch_queries:
+                all_results = self.search_batch(question, queries, filter=filter)
+            else:
+                # Retrieve documents for each query
+                all_results = []
+                for query in queries:
+                    with self.tracer.span("similarity_search"):
+                        results = self.vector_store.similarity_search(
+                            query,
+                            k=self.top_k,
+                            filter=filter
+                        )
+                    all_results.append(results)
+            span.set(retrieved=sum(len(results) for results in all_results))
         
         # Combine and re-rank results
-        fused_results = self.reciprocal_rank_fusion(all_results)
-        return fused_results[:self.top_k] 
\ No newline at end of file
+        return self._fuse_top(question, all_results, filter)
+
+    def retrieve_batch(
+        self,
+        questions: List[str],
+        filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """RAG-Fusion retrieval for many questions at once.
+
+        Queries are generated in one ``batch`` call, then every question and
+        its queries are embedded in a single request per distinct filter and
+        searched together. ``filters`` holds one ``where`` clause per question.
+        """
+        filters = filters or [None] * len(questions)
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(questions)
+        pending = []
+        for i, (question, where) in enumerate(zip(questions, filters)):
+            shortcut = self.lexical_shortcut(question, filter=where)
+            if shortcut is not None:
+                results[i] = shortcut
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+        
+        query_lists = dict(zip(pending, self.generate_queries_batch([questions[i] for i in pending], max_concurrency)))
+        groups: Dict[str, List[int]] = {}
+        for i in pending:
+            groups.setdefault(json.dumps(filters[i], sort_keys=True, default=str), []).append(i)
+        
+        embeddings = get_embedding_function(self.vector_store)
+        for group in groups.values():
+            texts, bounds = [], []
+            for i in group:
+                start = len(texts)
+                texts += [questions[i]] + query_lists[i]
+                bounds.append((i, start, len(texts)))
+            with self.tracer.span("search", searches=len(texts), batched=True) as span:
+                scored_lists = batch_similarity_search_by_vectors(
+                    self.vector_store,
+                    embeddings.embed_documents(texts),
+                    k=self.top_k,
+                    filter=filters[group[0]]
+                )
+                span.set(retrieved=sum(len(scored) for scored in scored_lists))
+            for i, start, end in bounds:
+                results[i] = self._fuse_top(questions[i], scored_lists[start:end], filters[i])
+        return results
+
+    async def aretrieve(
+        self,
+        question: str,
+        queries: Optional[List[str]] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        use_shortcut: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Perform RAG-Fusion retrieval with concurrent per-query searches.
+
+        At most ``max_concurrent_searches`` searches are in flight at once so a
+        large fan-out cannot saturate the vector store. Callers that already
+        tried ``lexical_shortcut`` pass ``use_shortcut=False``.
+        """
+        if use_shortcut:
+            shortcut = self.lexical_shortcut(question, filter=filter)
+            if shortcut is not None:
+                return shortcut
+        
+        if queries is None:
+            queries = await self.agenerate_queries(question)
+        
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_searches))
+        
+        async def search(query: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                with self.tracer.span("similarity_search"):
+                    return await self.vector_store.asimilarity_search(
+                        query,
+                        k=self.top_k,
+                        filter=filter
+                    )
+        
+        with self.tracer.span("search", searches=len(queries), batched=self.batch_queries) as span:
+            if self.batch_queries:
+                all_results = await self.asearch_batch(question, queries, filter=filter)
+            else:
+                # gather preserves query order, so fusion sees the same lists as retrieve()
+                all_results = await asyncio.gather(*(search(query) for query in queries))
+            span.set(retrieved=sum(len(results) for results in all_results))
+        
+        return self._fuse_top(question, all_results, filter)
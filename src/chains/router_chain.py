@@ -1,22 +1,58 @@
-from typing import Dict, Any
-from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from collections import OrderedDict
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 from pydantic import BaseModel
 import json
+import re
+import threading
 
-from models.router import DataSource, RouterConfig
+from models.router import DataSource, RouteQuery, RouterConfig, RouteTier
+from chains.local_router import LocalRouteClassifier
+from utils.clients import chat_model
+from utils.semantic_cache import normalize_question
+from utils.tracing import NULL_TRACER
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.prompts import PromptTemplate
+
+_JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
 
 class RouterChain:
-    def __init__(self, config: RouterConfig):
+    """Tiered question router.
+
+    Decisions come from, in order: a cache of normalized questions, a local
+    classifier (lexicon plus nearest-credential similarity), and finally the
+    LLM when the local confidence is below ``local_confidence_threshold``.
+    The local tier only ever routes into the knowledge base: relevance scores
+    of related and unrelated questions are too close to reject a question
+    without the LLM, so would-be ``not_found`` decisions go to the LLM.
+    """
+
+    def __init__(
+        self,
+        config: RouterConfig,
+        vector_store: Optional[Any] = None,
+        llm: Optional["BaseChatModel"] = None,
+        tracer: Optional[Any] = None
+    ):
         self.config = config
-        self.llm = ChatOpenAI(
-            model_name=config.model_name,
-            temperature=config.temperature,
-            max_tokens=config.max_tokens
+        self.tracer = tracer or NULL_TRACER
+        self.local_classifier = (
+            LocalRouteClassifier(vector_store=vector_store) if config.local_routing else None
         )
+        self._decision_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.tier_counts = {tier: 0 for tier in RouteTier}
+        if llm is not None:
+            self.llm = llm
+
+    @cached_property
+    def router_prompt(self) -> "PromptTemplate":
+        """Prompt for the LLM routing tier."""
+        from langchain_core.prompts import PromptTemplate
         
-        # Initialize router prompt
-        self.router_prompt = PromptTemplate(
+        return PromptTemplate(
             input_variables=["question"],
             template="""You are a router that determines whether a question can be answered using the Verifiable Credentials knowledge base.
             
@@ -36,32 +72,193 @@ class RouterChain:
             IMPORTANT: Respond ONLY with the JSON object, no other text.
             """
         )
-        
+
+    @cached_property
+    def llm(self) -> "BaseChatModel":
+        """Shared client for the router model, created on the first LLM-tier decision."""
+        return chat_model(
+            self.config.model_name,
+            self.config.temperature,
+            max_tokens=self.config.max_tokens
+        )
+
+    @cached_property
+    def router_chain(self):
         # Create the chain using the new RunnableSequence pattern
-        self.router_chain = self.router_prompt | self.llm
+        return self.router_prompt | self.llm
 
-    def route(self, question: str) -> Dict[str, Any]:
-        """Route a question to the appropriate data source."""
+    def _parse_response(self, content: str) -> Optional[Dict[str, Any]]:
+        """Parse the router LLM output into a routing decision, or None if it is malformed."""
         try:
-            # Get response from LLM
-            response = self.router_chain.invoke({"question": question})
-            
-            # Extract the JSON string from the response
-            json_str = response.content.strip()
+            # Tolerate code fences or prose around the JSON object
+            match = _JSON_OBJECT_PATTERN.search(content)
+            json_str = match.group(0) if match else content.strip()
             
             # Parse the JSON response
             result = json.loads(json_str)
             
             # Validate the datasource
-            datasource = DataSource(result["datasource"])
-            
-            return {
-                "datasource": datasource,
-                "reasoning": result["reasoning"]
-            }
+            return self._decision(
+                DataSource(result["datasource"]),
+                result["reasoning"],
+                RouteTier.LLM
+            )
+        except Exception:
+            return None
+
+    @staticmethod
+    def _decision(datasource: DataSource, reasoning: str, tier: RouteTier) -> Dict[str, Any]:
+        return RouteQuery(
+            datasource=datasource,
+            reasoning=reasoning,
+            decided_by=tier
+        ).model_dump()
+
+    def _cached_decision(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._cache_lock:
+            decision = self._decision_cache.get(key)
+            if decision is None:
+                return None
+            self._decision_cache.move_to_end(key)
+        return {**decision, "decided_by": RouteTier.CACHE}
+
+    def _cache_decision(self, key: str, decision: Dict[str, Any]) -> None:
+        if self.config.decision_cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._decision_cache[key] = decision
+            self._decision_cache.move_to_end(key)
+            while len(self._decision_cache) > self.config.decision_cache_size:
+                self._decision_cache.popitem(last=False)
+
+    def _local_decision(self, local: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if local is None or local["confidence"] < self.config.local_confidence_threshold:
+            return None
+        if local["datasource"] != DataSource.VC_KNOWLEDGE_BASE:
+            return None
+        return self._decision(local["datasource"], local["reasoning"], RouteTier.LOCAL)
+
+    def _fallback_decision(self, local: Optional[Dict[str, Any]], error: str) -> Dict[str, Any]:
+        """Decision used when the LLM call fails or returns unparseable output."""
+        if local is not None and local["confidence"] > 0:
+            return self._decision(
+                local["datasource"],
+                f"{local['reasoning']} (LLM router unavailable: {error})",
+                RouteTier.LOCAL
+            )
+        return self._decision(
+            DataSource.NOT_FOUND,
+            f"Error parsing router response: {error}",
+            RouteTier.LLM
+        )
+
+    def _record(self, key: str, decision: Dict[str, Any], cacheable: bool = True) -> Dict[str, Any]:
+        self.tier_counts[decision["decided_by"]] += 1
+        if cacheable:
+            self._cache_decision(key, decision)
+        return decision
+
+    @staticmethod
+    def _traced(span: Any, decision: Dict[str, Any]) -> Dict[str, Any]:
+        if span.recording:
+            tier = RouteTier(decision["decided_by"])
+            span.set(decided_by=tier.value, cache_hit=tier == RouteTier.CACHE)
+        return decision
+
+    def route(self, question: str) -> Dict[str, Any]:
+        """Route a question to the appropriate data source."""
+        with self.tracer.span("route") as span:
+            return self._traced(span, self._route(question))
+
+    async def aroute(self, question: str) -> Dict[str, Any]:
+        """Asynchronously route a question to the appropriate data source."""
+        with self.tracer.span("route") as span:
+            return self._traced(span, await self._aroute(question))
+
+    def _route(self, question: str) -> Dict[str, Any]:
+        key = normalize_question(question)
+        cached = self._cached_decision(key)
+        if cached is not None:
+            return self._record(key, cached, cacheable=False)
+        
+        local = self.local_classifier.classify(question) if self.local_classifier else None
+        decision = self._local_decision(local)
+        if decision is not None:
+            return self._record(key, decision)
+        
+        try:
+            # Get response from LLM
+            response = self.router_chain.invoke({"question": question})
         except Exception as e:
-            # If there's any error in parsing, default to not_found
-            return {
-                "datasource": DataSource.NOT_FOUND,
-                "reasoning": f"Error parsing router response: {str(e)}"
-            } 
\ No newline at end of file
+            response = e
+        return self._llm_decision(key, local, response)
+
+    async def _aroute(self, question: str) -> Dict[str, Any]:
+        key = normalize_question(question)
+        cached = self._cached_decision(key)
+        if cached is not None:
+            return self._record(key, cached, cacheable=False)
+        
+        local = await self.local_classifier.aclassify(question) if self.local_classifier else None
+        decision = self._local_decision(local)
+        if decision is not None:
+            return self._record(key, decision)
+        
+        try:
+            response = await self.router_chain.ainvoke({"question": question})
+        except Exception as e:
+            response = e
+        return self._llm_decision(key, local, response)
+
+    def route_batch(self, questions: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Route many questions, sending those the cache and local tier cannot decide to the LLM in one batch.
+
+        Decisions are returned in input order. ``max_concurrency`` caps the
+        concurrent LLM requests of the batch.
+        """
+        with self.tracer.span("route_batch", questions=len(questions)) as span:
+            decisions: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+            keys = [normalize_question(question) for question in questions]
+            pending = []
+            for i, (question, key) in enumerate(zip(questions, keys)):
+                cached = self._cached_decision(key)
+                if cached is not None:
+                    decisions[i] = self._record(key, cached, cacheable=False)
+                    continue
+                local = self.local_classifier.classify(question) if self.local_classifier else None
+                decision = self._local_decision(local)
+                if decision is not None:
+                    decisions[i] = self._record(key, decision)
+                else:
+                    pending.append((i, local))
+            
+            if pending:
+                responses = self.router_chain.batch(
+                    [{"question": questions[i]} for i, _ in pending],
+                    config={"max_concurrency": max_concurrency},
+                    return_exceptions=True
+                )
+                for (i, local), response in zip(pending, responses):
+                    decisions[i] = self._llm_decision(keys[i], local, response)
+            span.set(llm_calls=len(pending))
+            return decisions
+
+    def _llm_decision(self, key: str, local: Optional[Dict[str, Any]], response: Any) -> Dict[str, Any]:
+        """Record the decision for an LLM response, falling back if the call raised or returned malformed output."""
+        if isinstance(response, Exception):
+            return self._record(key, self._fallback_decision(local, str(response)), cacheable=False)
+        decision = self._parse_response(response.content)
+        if decision is None:
+            return self._record(key, self._fallback_decision(local, "malformed JSON"), cacheable=False)
+        return self._record(key, decision)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Number of decisions made by each tier and the share that avoided the LLM."""
+        total = sum(self.tier_counts.values())
+        return {
+            "decisions": {tier.value: count for tier, count in self.tier_counts.items()},
+            "llm_avoided_rate": (
+                (total - self.tier_counts[RouteTier.LLM]) / total if total else 0.0
+            )
+        }
@@ -1,37 +1,80 @@
-from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import PromptTemplate
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import cached_property
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, Iterable, Iterator, List, Optional, Tuple
 
 from models.router import RouterConfig, DataSource
 from chains.router_chain import RouterChain
 from chains.rag_fusion import RAGFusion
+from utils.bm25_index import BM25Index
+from utils.clients import chat_model
+from utils.context_packer import ContextPacker
+from utils.metadata_index import MetadataIndex, extract_filter, listing_answer, listing_kind
+from utils.rank_fusion import document_key
+from utils.retry import call_with_backoff
+from utils.semantic_cache import SemanticCache, normalize_question
+from utils.streaming import (
+    GenerationTimer,
+    chunk_text,
+    context_event,
+    final_event,
+    route_event,
+    token_event
+)
+from utils.tokens import count_tokens
+from utils.tracing import NULL_TRACER, Tracer, with_timings
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.vectorstores import VectorStore
 
 class VCRAGSystem:
     def __init__(
         self,
-        vector_store: Chroma,
+        vector_store: "VectorStore",
         router_config: RouterConfig,
         generation_model_name: str = "gpt-4",
-        generation_temperature: float = 0.7
+        generation_temperature: float = 0.7,
+        batch_queries: bool = False,
+        answer_cache: Optional[SemanticCache] = None,
+        lexical_index: Optional[BM25Index] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        context_packer: Optional[ContextPacker] = None,
+        llm: Optional["BaseChatModel"] = None,
+        tracer: Optional[Tracer] = None
     ):
         self.vector_store = vector_store
+        self.tracer = tracer or NULL_TRACER
+        self.answer_cache = answer_cache
+        self.metadata_index = metadata_index
+        self.context_packer = context_packer or ContextPacker()
+        self.generation_model_name = generation_model_name
+        self.generation_temperature = generation_temperature
+        if llm is not None:
+            self.generation_llm = llm
         
-        # Initialize router
-        self.router = RouterChain(router_config)
+        # Initialize router; an injected ``llm`` serves every stage
+        self.router = RouterChain(router_config, vector_store=vector_store, llm=llm, tracer=self.tracer)
         
-        # Initialize RAG-Fusion
+        # Initialize RAG-Fusion; without an injected ``llm`` it shares the generation client
         self.rag_fusion = RAGFusion(
             vector_store=vector_store,
-            llm=ChatOpenAI(
-                model_name=generation_model_name,
-                temperature=generation_temperature
-            )
+            llm=llm,
+            batch_queries=batch_queries,
+            lexical_index=lexical_index,
+            tracer=self.tracer,
+            model_name=generation_model_name,
+            temperature=generation_temperature
         )
+
+    @cached_property
+    def generation_prompt(self) -> "PromptTemplate":
+        """Prompt for answer generation."""
+        from langchain_core.prompts import PromptTemplate
         
-        # Initialize generation prompt
-        self.generation_prompt = PromptTemplate(
+        return PromptTemplate(
             input_variables=["question", "context"],
             template="""You are an AI assistant that answers questions about Verifiable Credentials.
             Use the following context to answer the question. If the answer cannot be found in the context,
@@ -44,12 +87,16 @@ class VCRAGSystem:
             
             Answer:"""
         )
-        
+
+    @cached_property
+    def generation_llm(self) -> "BaseChatModel":
+        """Shared client for the generation model, created on the first generated answer."""
+        return chat_model(self.generation_model_name, self.generation_temperature)
+
+    @cached_property
+    def generation_chain(self):
         # Create the chain using the new RunnableSequence pattern
-        self.generation_chain = self.generation_prompt | ChatOpenAI(
-            model_name=generation_model_name,
-            temperature=generation_temperature
-        )
+        return self.generation_prompt | self.generation_llm
 
     def _format_context(self, documents: List[Dict[str, Any]]) -> str:
         """Format retrieved documents into a context string."""
@@ -60,33 +107,441 @@ class VCRAGSystem:
             context_parts.append("---")
         return "\n".join(context_parts)
 
+    def _not_found_response(self, route_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the response returned when the router rejects a question."""
+        return {
+            "answer": "I apologize, but I cannot find the information you're looking for in the Verifiable Credentials knowledge base.",
+            "reasoning": route_result["reasoning"],
+            "source": "not_found"
+        }
+
+    def _metadata_query(self, question: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Resolve issuer, type and date constraints in the question locally.
+
+        Returns a complete response for counting and listing questions, which
+        need neither retrieval nor generation, and for questions whose
+        constraints cannot be pushed down into retrieval exactly, such as
+        those no credential satisfies; otherwise the ``where`` clause to push
+        down into retrieval. Both are None without a metadata index.
+        """
+        if self.metadata_index is None:
+            return None, None
+        with self.tracer.span("metadata_query") as span:
+            query = extract_filter(question, self.metadata_index)
+            kind = listing_kind(question, query)
+            where = None
+            if kind is None and not query.is_empty():
+                where = self.metadata_index.where_clause(query)
+                # Retrieval without a filter would return similar but non-matching credentials
+                if where is None and self.metadata_index.count(query) < len(self.metadata_index):
+                    kind = "list"
+            span.set(answered=kind is not None, filtered=not query.is_empty())
+            if kind is not None:
+                answer, context = listing_answer(self.metadata_index, query, kind)
+                return {
+                    "answer": answer,
+                    "reasoning": "Answered from the credential metadata index",
+                    "source": "metadata_index",
+                    "context": context
+                }, None
+            return None, where
+
+    def _cache_lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        if self.answer_cache is None:
+            return None
+        with self.tracer.span("cache_lookup") as span:
+            cached = self.answer_cache.lookup(question)
+            span.set(cache_hit=cached is not None)
+        return cached
+
+    async def _acache_lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        if self.answer_cache is None:
+            return None
+        with self.tracer.span("cache_lookup") as span:
+            cached = await self.answer_cache.alookup(question)
+            span.set(cache_hit=cached is not None)
+        return cached
+
+    def _pack(self, documents: List[Any]) -> List[Any]:
+        """Deduplicate retrieved documents and fit them to the token budget."""
+        with self.tracer.span("pack") as span:
+            packed = self.context_packer.pack(documents)
+            span.set(retrieved=len(documents), documents=len(packed.documents), tokens=packed.tokens, tokens_saved=packed.tokens_saved)
+        return packed.documents
+
+    def _generation_tokens(self, span: Any, question: str, context: str, answer: str) -> None:
+        if span.recording:
+            span.set(
+                tokens_in=count_tokens(self.generation_prompt.format(question=question, context=context)),
+                tokens_out=count_tokens(answer)
+            )
+
+    def _answer_response(
+        self,
+        question: str,
+        route_result: Dict[str, Any],
+        documents: List[Any],
+        context: str,
+        answer: str
+    ) -> Dict[str, Any]:
+        """Build the response for an answered question and cache it."""
+        result = {
+            "answer": answer,
+            "reasoning": route_result["reasoning"],
+            "source": "vc_knowledge_base",
+            "context": context
+        }
+        
+        if self.answer_cache is not None:
+            self.answer_cache.store(question, result, [document_key(doc) for doc in documents])
+        
+        return result
+
     def answer(self, question: str) -> Dict[str, Any]:
-        """Process a question and generate an answer."""
+        """Process a question and generate an answer.
+
+        With a tracer, the answer also carries its ``request_id`` and a
+        ``timings`` dict of milliseconds per stage.
+        """
+        with self.tracer.request("answer") as trace:
+            result = self._answer(question)
+        return with_timings(result, trace)
+
+    def _answer(self, question: str) -> Dict[str, Any]:
+        cached = self._cache_lookup(question)
+        if cached is not None:
+            return cached
+        
+        direct, where = self._metadata_query(question)
+        if direct is not None:
+            return direct
+        
         # Route the question
         route_result = self.router.route(question)
         
         if route_result["datasource"] == DataSource.NOT_FOUND:
-            return {
-                "answer": "I apologize, but I cannot find the information you're looking for in the Verifiable Credentials knowledge base.",
-                "reasoning": route_result["reasoning"],
-                "source": "not_found"
-            }
+            return self._not_found_response(route_result)
         
-        # Retrieve relevant documents using RAG-Fusion
-        documents = self.rag_fusion.retrieve(question)
+        # Retrieve relevant documents using RAG-Fusion, deduplicated and fitted to the token budget
+        documents = self._pack(self.rag_fusion.retrieve(question, filter=where))
         
         # Format context
         context = self._format_context(documents)
         
         # Generate answer
-        response = self.generation_chain.invoke({
-            "question": question,
-            "context": context
-        })
+        with self.tracer.span("generate") as span:
+            response = self.generation_chain.invoke({
+                "question": question,
+                "context": context
+            })
+            self._generation_tokens(span, question, context, response.content)
         
-        return {
-            "answer": response.content,
-            "reasoning": route_result["reasoning"],
-            "source": "vc_knowledge_base",
-            "context": context
-        } 
\ No newline at end of file
+        return self._answer_response(question, route_result, documents, context, response.content)
+
+    def _generate_answer(
+        self,
+        question: str,
+        route_result: Dict[str, Any],
+        documents: List[Any],
+        max_retries: int
+    ) -> Dict[str, Any]:
+        """Pack, generate and cache one batch answer, retrying rate-limited generation with backoff."""
+        documents = self._pack(documents)
+        context = self._format_context(documents)
+        try:
+            with self.tracer.span("generate") as span:
+                response = call_with_backoff(
+                    lambda: self.generation_chain.invoke({"question": question, "context": context}),
+                    max_retries=max_retries
+                )
+                self._generation_tokens(span, question, context, response.content)
+        except Exception as e:
+            return {
+                "answer": "",
+                "reasoning": f"Generation failed: {e}",
+                "source": "error",
+                "context": context
+            }
+        return self._answer_response(question, route_result, documents, context, response.content)
+
+    def answer_batch(
+        self,
+        questions: Iterable[str],
+        max_concurrency: int = 8,
+        ordered: bool = True,
+        window_size: int = 256,
+        max_retries: int = 5
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Answer many questions, yielding ``(index, result)`` pairs as answers become available.
+
+        Questions are read lazily in windows of ``window_size``. Within a
+        window, questions that are equal after normalization are answered
+        once; the rest are routed in one LLM batch, retrieved with one
+        embedding request and a multi-query vector lookup, and generated on
+        at most ``max_concurrency`` threads with backoff on rate limits.
+        Results follow input order, or completion order with
+        ``ordered=False``. A question whose generation keeps failing gets a
+        result with source ``error``.
+        """
+        iterator = iter(questions)
+        offset = 0
+        while True:
+            window = list(islice(iterator, window_size))
+            if not window:
+                return
+            yield from self._answer_window(window, offset, max_concurrency, ordered, max_retries)
+            offset += len(window)
+
+    def _answer_window(
+        self,
+        window: List[str],
+        offset: int,
+        max_concurrency: int,
+        ordered: bool,
+        max_retries: int
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        # Positions in the window of each distinct normalized question
+        positions: Dict[str, List[int]] = {}
+        for position, question in enumerate(window):
+            positions.setdefault(normalize_question(question), []).append(position)
+        unique = [window[group[0]] for group in positions.values()]
+        groups = list(positions.values())
+        
+        ready: Dict[int, Dict[str, Any]] = {}
+        pending = []
+        for u, question in enumerate(unique):
+            result = self._cache_lookup(question)
+            where = None
+            if result is None:
+                result, where = self._metadata_query(question)
+            if result is not None:
+                ready[u] = result
+            else:
+                pending.append((u, where))
+        
+        routes = self.router.route_batch([unique[u] for u, _ in pending], max_concurrency=max_concurrency)
+        answerable = []
+        for (u, where), route_result in zip(pending, routes):
+            if route_result["datasource"] == DataSource.NOT_FOUND:
+                ready[u] = self._not_found_response(route_result)
+            else:
+                answerable.append((u, where, route_result))
+        
+        retrieved = self.rag_fusion.retrieve_batch(
+            [unique[u] for u, _, _ in answerable],
+            [where for _, where, _ in answerable],
+            max_concurrency=max_concurrency
+        ) if answerable else []
+        
+        def results_for(u: int, result: Dict[str, Any]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+            # Duplicates get their own copy of the shared result
+            for n, position in enumerate(groups[u]):
+                yield offset + position, result if n == 0 else dict(result)
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        try:
+            futures: Dict[Future, int] = {
+                executor.submit(self._generate_answer, unique[u], route_result, documents, max_retries): u
+                for (u, _, route_result), documents in zip(answerable, retrieved)
+            }
+            if not ordered:
+                for u, result in ready.items():
+                    yield from results_for(u, result)
+                for future in as_completed(futures):
+                    yield from results_for(futures[future], future.result())
+                return
+            
+            by_unique = {u: future for future, u in futures.items()}
+            owner = {position: u for u, group in enumerate(groups) for position in group}
+            for position in range(len(window)):
+                u = owner[position]
+                if u not in ready:
+                    ready[u] = by_unique[u].result()
+                result = ready[u]
+                yield offset + position, result if groups[u][0] == position else dict(result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _aroute(
+        self,
+        question: str,
+        where: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], Optional["asyncio.Task"], Optional[List[Any]]]:
+        """Route a question while RAG-Fusion query generation runs speculatively.
+
+        Routing and query generation are started together, so the request
+        waits on the slower of the two instead of their sum. Returns the
+        routing decision, the query generation task and the lexical shortcut
+        documents. The task is None when the router rejects the question (it
+        is cancelled) or when the lexical index can answer retrieval without
+        generated queries.
+        """
+        route_task = asyncio.create_task(self.router.aroute(question))
+        queries_task = None
+        shortcut = self.rag_fusion.lexical_shortcut(question, filter=where)
+        if shortcut is None:
+            queries_task = asyncio.create_task(self.rag_fusion.agenerate_queries(question))
+        
+        try:
+            route_result = await route_task
+        except BaseException:
+            if queries_task is not None:
+                queries_task.cancel()
+            raise
+        
+        if route_result["datasource"] == DataSource.NOT_FOUND and queries_task is not None:
+            queries_task.cancel()
+            queries_task = None
+        return route_result, queries_task, shortcut
+
+    async def _aretrieve(
+        self,
+        question: str,
+        where: Optional[Dict[str, Any]],
+        queries_task: Optional["asyncio.Task"],
+        shortcut: Optional[List[Any]]
+    ) -> List[Any]:
+        """Packed documents for a routed question, reusing the shortcut ``_aroute`` looked up."""
+        if shortcut is not None:
+            return self._pack(shortcut)
+        queries = await queries_task if queries_task is not None else None
+        return self._pack(await self.rag_fusion.aretrieve(question, queries=queries, filter=where, use_shortcut=False))
+
+    async def aanswer(self, question: str) -> Dict[str, Any]:
+        """Asynchronously process a question and generate an answer."""
+        with self.tracer.request("answer") as trace:
+            result = await self._aanswer(question)
+        return with_timings(result, trace)
+
+    async def _aanswer(self, question: str) -> Dict[str, Any]:
+        cached = await self._acache_lookup(question)
+        if cached is not None:
+            return cached
+        
+        direct, where = self._metadata_query(question)
+        if direct is not None:
+            return direct
+        
+        route_result, queries_task, shortcut = await self._aroute(question, where)
+        if route_result["datasource"] == DataSource.NOT_FOUND:
+            return self._not_found_response(route_result)
+        
+        documents = await self._aretrieve(question, where, queries_task, shortcut)
+        context = self._format_context(documents)
+        
+        with self.tracer.span("generate") as span:
+            response = await self.generation_chain.ainvoke({
+                "question": question,
+                "context": context
+            })
+            self._generation_tokens(span, question, context, response.content)
+        
+        return self._answer_response(question, route_result, documents, context, response.content)
+
+    def answer_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        """Stream an answer as events.
+
+        Yields a ``route`` event with the routing decision, a ``context`` event
+        with the retrieved documents' metadata, one ``token`` event per chunk of
+        generated text, and a ``final`` event whose ``result`` is the dict
+        ``answer`` would return and whose ``timings`` hold time-to-first-token
+        and total generation time. With a tracer, that ``result`` also carries
+        the per-stage ``timings``.
+        """
+        with self.tracer.request("answer_stream") as trace:
+            for event in self._answer_stream(question):
+                yield self._with_stage_timings(event, trace)
+
+    @staticmethod
+    def _with_stage_timings(event: Dict[str, Any], trace: Any) -> Dict[str, Any]:
+        if trace is None or event["type"] != "final":
+            return event
+        return {**event, "result": with_timings(event["result"], trace)}
+
+    def _answer_stream(self, question: str) -> Iterator[Dict[str, Any]]:
+        cached = self._cache_lookup(question)
+        if cached is not None:
+            yield token_event(cached["answer"])
+            yield final_event(cached)
+            return
+        
+        direct, where = self._metadata_query(question)
+        if direct is not None:
+            yield token_event(direct["answer"])
+            yield final_event(direct)
+            return
+        
+        route_result = self.router.route(question)
+        yield route_event(route_result)
+        
+        if route_result["datasource"] == DataSource.NOT_FOUND:
+            yield final_event(self._not_found_response(route_result))
+            return
+        
+        documents = self._pack(self.rag_fusion.retrieve(question, filter=where))
+        context = self._format_context(documents)
+        yield context_event(documents, context)
+        
+        timer = GenerationTimer()
+        with self.tracer.span("generate") as span:
+            timer.start()
+            answer_parts = []
+            for chunk in self.generation_chain.stream({"question": question, "context": context}):
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                timer.mark_token()
+                answer_parts.append(text)
+                yield token_event(text)
+            timer.finish()
+            self._generation_tokens(span, question, context, "".join(answer_parts))
+        
+        result = self._answer_response(question, route_result, documents, context, "".join(answer_parts))
+        yield final_event(result, timer)
+
+    async def aanswer_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """Asynchronous variant of ``answer_stream``."""
+        with self.tracer.request("answer_stream") as trace:
+            async for event in self._aanswer_stream(question):
+                yield self._with_stage_timings(event, trace)
+
+    async def _aanswer_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        cached = await self._acache_lookup(question)
+        if cached is not None:
+            yield token_event(cached["answer"])
+            yield final_event(cached)
+            return
+        
+        direct, where = self._metadata_query(question)
+        if direct is not None:
+            yield token_event(direct["answer"])
+            yield final_event(direct)
+            return
+        
+        route_result, queries_task, shortcut = await self._aroute(question, where)
+        yield route_event(route_result)
+        
+        if route_result["datasource"] == DataSource.NOT_FOUND:
+            yield final_event(self._not_found_response(route_result))
+            return
+        
+        documents = await self._aretrieve(question, where, queries_task, shortcut)
+        context = self._format_context(documents)
+        yield context_event(documents, context)
+        
+        timer = GenerationTimer()
+        with self.tracer.span("generate") as span:
+            timer.start()
+            answer_parts = []
+            async for chunk in self.generation_chain.astream({"question": question, "context": context}):
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                timer.mark_token()
+                answer_parts.append(text)
+                yield token_event(text)
+            timer.finish()
+            self._generation_tokens(span, question, context, "".join(answer_parts))
+        
+        result = self._answer_response(question, route_result, documents, context, "".join(answer_parts))
+        yield final_event(result, timer)
@@ -0,0 +1,21 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class SemanticCacheConfig(BaseModel):
+    """Configuration for the semantic answer cache."""
+    similarity_threshold: float = Field(
+        default=0.95,
+        description="Minimum cosine similarity between question embeddings for a cache hit"
+    )
+    max_entries: int = Field(
+        default=1024,
+        description="Maximum number of cached answers"
+    )
+    max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Approximate memory bound for cached embeddings and answers"
+    )
+    ttl_seconds: Optional[float] = Field(
+        default=3600.0,
+        description="Time after which an entry expires; None disables expiry"
+    )
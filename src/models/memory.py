@@ -0,0 +1,37 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+class SessionMemoryConfig(BaseModel):
+    """Configuration for per-session conversation memory."""
+    max_token_limit: int = Field(
+        default=1500,
+        description="Token budget for a session's summary and verbatim history"
+    )
+    window_turns: int = Field(
+        default=6,
+        description="Maximum number of recent turns kept verbatim; older turns are summarized"
+    )
+    max_sessions: int = Field(
+        default=1024,
+        description="Maximum number of sessions held in memory"
+    )
+    idle_ttl_seconds: Optional[float] = Field(
+        default=1800.0,
+        description="Idle time after which a session is evicted from memory; None disables expiry"
+    )
+    store_path: Optional[str] = Field(
+        default=None,
+        description="SQLite file sessions are persisted to so they survive restarts"
+    )
+    standalone_check: bool = Field(
+        default=True,
+        description="Skip the condensation LLM call for follow-up questions a local check finds self-contained"
+    )
+    working_set_similarity: Optional[float] = Field(
+        default=0.9,
+        description="Cosine similarity to the question that filled a session's working set above which the set is reused instead of searching; None always searches"
+    )
+    working_set_size: int = Field(
+        default=10,
+        description="Maximum number of recently retrieved credentials kept per session"
+    )
@@ -6,6 +6,12 @@ class DataSource(str, Enum):
     VC_KNOWLEDGE_BASE = "vc_knowledge_base"
     NOT_FOUND = "not_found"
 
+class RouteTier(str, Enum):
+    """Enum for the router tier that made a routing decision."""
+    CACHE = "cache"
+    LOCAL = "local"
+    LLM = "llm"
+
 class RouteQuery(BaseModel):
     """Model for query routing decision."""
     datasource: DataSource = Field(
@@ -14,9 +20,25 @@ class RouteQuery(BaseModel):
     reasoning: str = Field(
         description="Explanation of why this data source was chosen"
     )
+    decided_by: RouteTier = Field(
+        default=RouteTier.LLM,
+        description="The router tier that made the decision"
+    )
 
 class RouterConfig(BaseModel):
     """Configuration for the router."""
     model_name: str = "gpt-4"
     temperature: float = 0.0
-    max_tokens: int = 150 
\ No newline at end of file
+    max_tokens: int = 150
+    decision_cache_size: int = Field(
+        default=1024,
+        description="Number of normalized questions whose routing decision is cached"
+    )
+    local_routing: bool = Field(
+        default=True,
+        description="Try the local classifier before calling the LLM"
+    )
+    local_confidence_threshold: float = Field(
+        default=0.75,
+        description="Minimum local classifier confidence to skip the LLM"
+    )
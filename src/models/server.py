@@ -0,0 +1,33 @@
+from typing import Dict
+from pydantic import BaseModel, Field
+
+class ServerConfig(BaseModel):
+    """Configuration for the asyncio HTTP serving layer."""
+    host: str = Field(
+        default="127.0.0.1",
+        description="Interface the server listens on"
+    )
+    port: int = Field(
+        default=8080,
+        description="Port the server listens on; 0 picks a free port"
+    )
+    max_pending: int = Field(
+        default=128,
+        description="Requests admitted at once, running or waiting for a stage slot; further requests get 429"
+    )
+    stage_limits: Dict[str, int] = Field(
+        default_factory=lambda: {"answer": 16, "stream": 16, "conversation": 8, "ingest": 1},
+        description="Concurrent pipeline executions per stage"
+    )
+    max_body_bytes: int = Field(
+        default=16 * 1024 * 1024,
+        description="Largest accepted request body"
+    )
+    read_timeout: float = Field(
+        default=30.0,
+        description="Seconds to wait for a request's headers and body"
+    )
+    shutdown_timeout: float = Field(
+        default=30.0,
+        description="Seconds in-flight requests get to finish on shutdown before being cancelled"
+    )
@@ -0,0 +1,190 @@
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import heapq
+import json
+import math
+import os
+import re
+import threading
+
+from langchain_core.documents import Document
+
+from utils.vector_search import matches_where
+
+INDEX_VERSION = 1
+
+# DIDs, URLs, URNs, dates and credential type names that should match as a
+# whole; other CamelCase words such as "EmployeeNumber" are ordinary words
+IDENTIFIER_PATTERN = re.compile(
+    r"(?:did:[a-z0-9]+:[\w.:%\-]+"
+    r"|https?://[^\s,;)\"']+"
+    r"|urn:[\w:.\-]+"
+    r"|\d{4}-\d{2}-\d{2}"
+    r"|\b(?:[A-Z][a-z0-9]+)+Credential\b)"
+)
+# Terms whose idf falls below this occur in about nine documents out of ten;
+# they barely change the ranking but would walk nearly every posting
+MIN_IDF = 0.1
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def identifier_terms(text: str) -> List[str]:
+    """Identifier tokens (DIDs, URLs, dates, ``*Credential`` type names) found in the text."""
+    return [match.rstrip(".").lower() for match in IDENTIFIER_PATTERN.findall(text)]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into BM25 terms.
+
+    Identifiers are kept whole so an exact DID or date matches strongly, and
+    are also split into their word parts (``PassportCredential`` yields
+    ``passportcredential``, ``passport`` and ``credential``).
+    """
+    terms = identifier_terms(text)
+    terms.extend(_WORD_PATTERN.findall(_CAMEL_CASE_PATTERN.sub(" ", text).lower()))
+    return terms
+
+
+class BM25Index:
+    """Local inverted index scoring documents with Okapi BM25.
+
+    Built over the same ids, texts and metadata that ``process_vc_data``
+    produces, updated incrementally as credentials are upserted or removed,
+    and persisted as JSON. Searching needs no embedding call.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def _load(self) -> None:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        for doc_id, entry in data["documents"].items():
+            self._add(doc_id, entry["text"], entry["metadata"], Counter(entry["tf"]))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the index to disk atomically."""
+        target = Path(path) if path else self.path
+        if target is None:
+            raise ValueError("No path given for saving the BM25 index")
+        with self._lock:
+            payload = {
+                "version": INDEX_VERSION,
+                "documents": {
+                    doc_id: {"text": entry["text"], "metadata": entry["metadata"], "tf": entry["tf"]}
+                    for doc_id, entry in self._documents.items()
+                }
+            }
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(target.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, target)
+
+    def _add(self, doc_id: str, text: str, metadata: Dict[str, Any], tf: Counter) -> None:
+        length = sum(tf.values())
+        self._documents[doc_id] = {"text": text, "metadata": metadata, "tf": dict(tf), "length": length}
+        self._total_length += length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        """Remove documents from the index."""
+        with self._lock:
+            for doc_id in doc_ids:
+                entry = self._documents.pop(doc_id, None)
+                if entry is None:
+                    continue
+                self._total_length -= entry["length"]
+                for term in entry["tf"]:
+                    postings = self._postings.get(term)
+                    if postings is not None:
+                        postings.pop(doc_id, None)
+                        if not postings:
+                            del self._postings[term]
+
+    def upsert(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Add a document, replacing any previous version with the same id."""
+        with self._lock:
+            self.remove([doc_id])
+            self._add(doc_id, text, metadata or {}, Counter(tokenize(text)))
+
+    def upsert_processed(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Index processed credentials as produced by the ingestion pipeline."""
+        for item in items:
+            self.upsert(item["id"], item["text"], item["metadata"])
+
+    def _top(self, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        num_docs = len(self._documents)
+        if not num_docs or not terms:
+            return []
+        average_length = self._total_length / num_docs
+        scores: Dict[str, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            if idf < MIN_IDF:
+                continue
+            for doc_id, count in postings.items():
+                length = self._documents[doc_id]["length"]
+                norm = count + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / norm
+        candidates = scores.items()
+        if filter:
+            candidates = [
+                (doc_id, score) for doc_id, score in candidates
+                if matches_where(self._documents[doc_id]["metadata"], filter)
+            ]
+        return heapq.nlargest(k, candidates, key=lambda item: item[1])
+
+    def _document(self, doc_id: str) -> Document:
+        entry = self._documents[doc_id]
+        return Document(page_content=entry["text"], metadata=entry["metadata"])
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Return the ``k`` best matching documents with their BM25 scores.
+
+        ``filter`` is a Chroma-style ``where`` clause on document metadata.
+        """
+        with self._lock:
+            return [(self._document(doc_id), score) for doc_id, score in self._top(query, k, filter)]
+
+    def identifier_match(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """Lexical results for identifier-heavy queries, or None.
+
+        Returns the search results when the query mentions at least one
+        identifier and the best hit contains every identifier in it, which is
+        strong enough evidence to skip vector retrieval.
+        """
+        identifiers = identifier_terms(query)
+        if not identifiers:
+            return None
+        with self._lock:
+            best = self._top(query, k, filter)
+            if not best or not all(term in self._documents[best[0][0]]["tf"] for term in identifiers):
+                return None
+            return [(self._document(doc_id), score) for doc_id, score in best]
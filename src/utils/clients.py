@@ -0,0 +1,138 @@
+"""Process-wide registry of OpenAI chat and embedding clients.
+
+Systems ask the registry for a client instead of constructing one, so every
+component using the same model and parameters shares one client object, and
+all clients share one pooled HTTP connection pool per process.
+``langchain_openai``, ``openai`` and ``httpx`` are imported on first use;
+nothing is imported or connected until a client is actually requested.
+"""
+from collections.abc import Hashable
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import threading
+
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 32
+
+
+def _freeze(params: Dict[str, Any]) -> Tuple[Tuple[str, Hashable], ...]:
+    return tuple(sorted((key, value if isinstance(value, Hashable) else repr(value)) for key, value in params.items()))
+
+
+class ClientRegistry:
+    """Builds each distinct chat or embedding client once and hands out the shared instance."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._clients: Dict[Tuple, Any] = {}
+        self._http_clients: Optional[Tuple[Any, Any]] = None
+        self._closing: Set["asyncio.Task"] = set()
+        self._lock = threading.Lock()
+
+    def http_clients(self) -> Tuple[Any, Any]:
+        """The shared ``httpx.Client`` and ``httpx.AsyncClient``, created on first call."""
+        with self._lock:
+            if self._http_clients is None:
+                import httpx
+
+                limits = httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                )
+                self._http_clients = (httpx.Client(limits=limits), httpx.AsyncClient(limits=limits))
+            return self._http_clients
+
+    def _get(self, kind: str, params: Dict[str, Any], build: Callable[[Any, Any], Any]) -> Any:
+        key = (kind, _freeze(params))
+        with self._lock:
+            client = self._clients.get(key)
+        if client is not None:
+            return client
+        http_client, http_async_client = self.http_clients()
+        client = build(http_client, http_async_client)
+        with self._lock:
+            # Another thread may have built the same client meanwhile
+            return self._clients.setdefault(key, client)
+
+    def chat_model(self, model_name: str, temperature: float = 0.7, **params: Any) -> Any:
+        """Shared ``ChatOpenAI`` for a model and parameter set."""
+        def build(http_client: Any, http_async_client: Any) -> Any:
+            from langchain_openai import ChatOpenAI
+
+            return ChatOpenAI(
+                model_name=model_name,
+                temperature=temperature,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **params
+            )
+
+        return self._get("chat", {"model_name": model_name, "temperature": temperature, **params}, build)
+
+    def embeddings(self, model: str = "text-embedding-ada-002", **params: Any) -> Any:
+        """Shared ``OpenAIEmbeddings`` for a model and parameter set."""
+        def build(http_client: Any, http_async_client: Any) -> Any:
+            from langchain_openai import OpenAIEmbeddings
+
+            return OpenAIEmbeddings(
+                model=model,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **params
+            )
+
+        return self._get("embeddings", {"model": model, **params}, build)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def _release(self) -> Optional[Tuple[Any, Any]]:
+        """Drop every client and hand back the HTTP clients to close."""
+        with self._lock:
+            self._clients.clear()
+            http_clients, self._http_clients = self._http_clients, None
+        return http_clients
+
+    def close(self) -> None:
+        """Drop every client and close both shared connection pools.
+
+        Inside a running event loop the async pool is closed by a task on that
+        loop; ``aclose`` waits for it instead.
+        """
+        http_clients = self._release()
+        if http_clients is None:
+            return
+        http_client, http_async_client = http_clients
+        http_client.close()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(http_async_client.aclose())
+            return
+        task = loop.create_task(http_async_client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def aclose(self) -> None:
+        """Drop every client and close both shared connection pools."""
+        http_clients = self._release()
+        if http_clients is not None:
+            http_clients[0].close()
+            await http_clients[1].aclose()
+
+
+_default_registry = ClientRegistry()
+
+
+def default_registry() -> ClientRegistry:
+    return _default_registry
+
+
+def chat_model(model_name: str, temperature: float = 0.7, **params: Any) -> Any:
+    """Shared chat client from the process-wide registry."""
+    return _default_registry.chat_model(model_name, temperature, **params)
@@ -0,0 +1,222 @@
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Sequence, Set, Tuple, Union
+import hashlib
+import re
+import threading
+
+from langchain_core.documents import Document
+
+from utils.rank_fusion import document_key
+from utils.tokens import count_tokens, truncate_to_tokens
+
+# Field names whose values rarely help answer a question: proofs, signatures,
+# JSON-LD plumbing and status/refresh endpoints.
+LOW_VALUE_FIELDS = frozenset({
+    "proof", "proofValue", "jws", "signatureValue", "proofPurpose", "verificationMethod",
+    "@context", "context", "created", "nonce", "challenge", "domain",
+    "credentialStatus", "credentialSchema", "refreshService", "termsOfUse",
+    "statusListIndex", "statusListCredential", "statusPurpose",
+})
+
+# Long values without spaces are usually encoded keys, hashes or signatures
+_OPAQUE_VALUE = re.compile(r"^[A-Za-z0-9+/=_\-.~:]{48,}$")
+_FIELD_LINE = re.compile(r"^(\s*)([^:\s][^:]*(?::[^:\s]+)?):\s?(.*)$")
+_WORD = re.compile(r"\w+")
+
+LOW_VALUE_PREVIEW_CHARS = 12
+
+ScoredInput = Union[Any, Tuple[Any, float]]
+
+
+def _normalized(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _field_name(key: str) -> str:
+    return re.split(r"[#/:]", key.strip())[-1]
+
+
+def shorten_low_value_fields(text: str) -> str:
+    """Cut low-value field values (proofs, contexts, opaque encodings) down to a short preview."""
+    lines = []
+    for line in text.split("\n"):
+        match = _FIELD_LINE.match(line)
+        if match:
+            indent, key, value = match.groups()
+            value = value.strip()
+            low_value = _field_name(key) in LOW_VALUE_FIELDS or _OPAQUE_VALUE.match(value)
+            if low_value and len(value) > LOW_VALUE_PREVIEW_CHARS:
+                line = f"{indent}{key}: {value[:LOW_VALUE_PREVIEW_CHARS]}…"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@dataclass
+class PackedContext:
+    """Documents selected for a prompt and what packing saved."""
+    documents: List[Document]
+    tokens: int
+    original_tokens: int
+    duplicates: int = 0
+    near_duplicates: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "documents": len(self.documents),
+            "tokens": self.tokens,
+            "original_tokens": self.original_tokens,
+            "tokens_saved": self.tokens_saved,
+            "duplicates": self.duplicates,
+            "near_duplicates": self.near_duplicates,
+            "truncated": self.truncated,
+            "dropped": self.dropped
+        }
+
+
+@dataclass
+class _Entry:
+    document: Any
+    text: str
+    tokens: int
+    truncated: bool = False
+
+
+class ContextPacker:
+    """Selects and trims retrieved documents to fit a prompt token budget.
+
+    Documents are taken in fused-score order. Exact duplicates (same id or
+    same normalized content) and near-duplicates (word-shingle Jaccard
+    similarity at or above ``near_duplicate_threshold``) are dropped.
+    Documents with different ``id`` metadata are never near-duplicates, so
+    credentials differing only in dates or identifiers all survive. If the
+    rest exceeds ``max_tokens``, low-value fields are shortened first, then
+    the lowest-ranked documents are truncated, or dropped once they would
+    keep fewer than ``min_document_tokens``. Tokens are counted locally.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        near_duplicate_threshold: float = 0.9,
+        min_document_tokens: int = 32,
+        per_document_overhead: int = 8
+    ):
+        self.max_tokens = max_tokens
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.min_document_tokens = min_document_tokens
+        self.per_document_overhead = per_document_overhead
+        self._lock = threading.Lock()
+        self.packed = 0
+        self.original_tokens = 0
+        self.tokens = 0
+
+    @staticmethod
+    def _ranked(documents: Sequence[ScoredInput]) -> List[Any]:
+        """Documents best first; ``(document, score)`` pairs are sorted by score."""
+        if documents and all(isinstance(item, tuple) for item in documents):
+            return [doc for doc, _ in sorted(documents, key=lambda item: item[1], reverse=True)]
+        return list(documents)
+
+    def _deduplicate(self, documents: List[Any], packed: PackedContext) -> List[_Entry]:
+        entries: List[_Entry] = []
+        seen: Set[str] = set()
+        kept_shingles: List[Tuple[Any, FrozenSet]] = []
+        for doc in documents:
+            text = doc.page_content
+            digest = hashlib.blake2b(_normalized(text).encode("utf-8"), digest_size=16).hexdigest()
+            keys = {digest, document_key(doc)}
+            if keys & seen:
+                packed.duplicates += 1
+                continue
+            doc_id = (getattr(doc, "metadata", None) or {}).get("id")
+            shingles = _shingles(text)
+            if any(
+                not (doc_id and other_id and doc_id != other_id)
+                and _jaccard(shingles, other) >= self.near_duplicate_threshold
+                for other_id, other in kept_shingles
+            ):
+                packed.near_duplicates += 1
+                continue
+            seen |= keys
+            kept_shingles.append((doc_id, shingles))
+            entries.append(_Entry(doc, text, count_tokens(text)))
+        return entries
+
+    def _total(self, entries: List[_Entry]) -> int:
+        return sum(entry.tokens + self.per_document_overhead for entry in entries)
+
+    def pack(self, documents: Sequence[ScoredInput]) -> PackedContext:
+        """Deduplicate and fit documents into the token budget."""
+        ranked = self._ranked(documents)
+        original_tokens = sum(count_tokens(doc.page_content) + self.per_document_overhead for doc in ranked)
+        packed = PackedContext(documents=[], tokens=0, original_tokens=original_tokens)
+        entries = self._deduplicate(ranked, packed)
+        total = self._total(entries)
+
+        # Shorten low-value fields, lowest-ranked documents first
+        for entry in reversed(entries):
+            if total <= self.max_tokens:
+                break
+            shortened = shorten_low_value_fields(entry.text)
+            if shortened != entry.text:
+                tokens = count_tokens(shortened)
+                total -= entry.tokens - tokens
+                entry.text, entry.tokens, entry.truncated = shortened, tokens, True
+
+        # Then truncate or drop the lowest-ranked documents
+        while entries and total > self.max_tokens:
+            entry = entries[-1]
+            keep = entry.tokens - (total - self.max_tokens)
+            # One token is left for the truncation marker
+            text = truncate_to_tokens(entry.text, keep - 1) if keep >= self.min_document_tokens else ""
+            tokens = count_tokens(text)
+            if not text or tokens >= entry.tokens:
+                entries.pop()
+                packed.dropped += 1
+                total -= entry.tokens + self.per_document_overhead
+                continue
+            total -= entry.tokens - tokens
+            entry.text, entry.tokens, entry.truncated = text, tokens, True
+
+        for entry in entries:
+            if entry.truncated:
+                packed.truncated += 1
+                packed.documents.append(Document(page_content=entry.text, metadata=dict(entry.document.metadata)))
+            else:
+                packed.documents.append(entry.document)
+        packed.tokens = total
+
+        with self._lock:
+            self.packed += 1
+            self.original_tokens += packed.original_tokens
+            self.tokens += packed.tokens
+        return packed
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Cumulative token counts over every packed context."""
+        return {
+            "contexts": self.packed,
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "tokens_saved": self.original_tokens - self.tokens
+        }
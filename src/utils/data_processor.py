@@ -1,7 +1,5 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional
 import json
-from rdflib import Graph, URIRef, Literal
-from rdflib.namespace import RDF, XSD
 
 class VCDataProcessor:
     @staticmethod
@@ -46,24 +44,26 @@ class VCDataProcessor:
     @staticmethod
     def rdf_to_text(rdf_data: str) -> str:
         """Convert RDF data to a text representation."""
+        # rdflib is only imported once RDF input shows up
+        from rdflib import Graph
+        from utils.rdf_batch import graph_to_text
+        
         g = Graph()
         g.parse(data=rdf_data, format="turtle")
         
-        text_parts = []
-        
-        # Extract type information
-        for s, p, o in g.triples((None, RDF.type, None)):
-            text_parts.append(f"Type: {o}")
-        
-        # Extract other properties
-        for s, p, o in g.triples((None, None, None)):
-            if p != RDF.type:  # Skip type triples as they're already handled
-                if isinstance(o, Literal):
-                    text_parts.append(f"{p}: {o}")
-                else:
-                    text_parts.append(f"{p}: {o}")
+        # Group triples by subject in one pass, nesting blank nodes and compacting IRIs
+        return graph_to_text(g)
+
+    @staticmethod
+    def iter_rdf_credentials(path: str, format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Split an RDF file into one ``process_vc_data`` record per credential.
+
+        The file is parsed once (N-Triples and N-Quads are streamed line by
+        line) and each record carries its rendered ``text``.
+        """
+        from utils.rdf_batch import iter_rdf_records
         
-        return "\n".join(text_parts)
+        return iter_rdf_records(path, format=format)
 
     @staticmethod
     def _convert_metadata_value(value: Any) -> str:
@@ -80,8 +80,11 @@ class VCDataProcessor:
             text_content = VCDataProcessor.json_to_text(vc_data["json"])
         elif "rdf" in vc_data:
             text_content = VCDataProcessor.rdf_to_text(vc_data["rdf"])
+        elif "text" in vc_data:
+            # Already rendered, e.g. by iter_rdf_credentials
+            text_content = vc_data["text"]
         else:
-            raise ValueError("VC data must contain either 'json' or 'rdf' field")
+            raise ValueError("VC data must contain either 'json', 'rdf' or 'text' field")
         
         # Create metadata with string values
         metadata = {
@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+SQLITE_MAX_VARIABLES = 500
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def _model_name(embeddings: Any) -> str:
+    for attribute in ("model", "model_name", "deployment"):
+        value = getattr(embeddings, attribute, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(embeddings).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed, persistent cache in front of an embeddings client.
+
+    Vectors are keyed by model name and a hash of the text and stored as
+    float32 or float16 blobs in SQLite (in memory unless ``path`` is given).
+    Cache misses within a call are deduplicated and embedded in a single
+    upstream request. Once more than ``max_entries`` vectors are stored the
+    least recently used are evicted. Queries share entries with documents,
+    as OpenAI embeds both the same way; set ``separate_queries`` for models
+    that embed queries differently.
+
+    Drop-in replacement wherever an embeddings instance is passed to Chroma.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: Optional[str] = None,
+        model_name: Optional[str] = None,
+        dtype: str = "float32",
+        max_entries: int = 1_000_000,
+        separate_queries: bool = False
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}; use one of {sorted(DTYPES)}")
+        self.embeddings = embeddings
+        self.model_name = model_name or _model_name(embeddings)
+        self.dtype = DTYPES[dtype]
+        self.max_entries = max_entries
+        self.separate_queries = separate_queries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                dtype TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embedding_cache_lru ON embedding_cache (last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    def key(self, text: str, query: bool = False) -> str:
+        hasher = hashlib.sha256(self.model_name.encode("utf-8"))
+        hasher.update(b"\x01" if query and self.separate_queries else b"\x00")
+        hasher.update(text.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _lookup(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = list(keys[start:start + SQLITE_MAX_VARIABLES])
+                rows = self._conn.execute(
+                    f"SELECT key, vector, dtype FROM embedding_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob, dtype in rows:
+                    found[key] = np.frombuffer(blob, dtype=DTYPES[dtype]).astype(np.float64).tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, items: List[Tuple[str, List[float]]]) -> None:
+        now = time.time()
+        dtype_name = np.dtype(self.dtype).name
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embedding_cache VALUES (?, ?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=self.dtype).tobytes(), dtype_name, now)
+                    for key, vector in items
+                ]
+            )
+            self._entries += self._conn.total_changes - before
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN "
+                    "(SELECT key FROM embedding_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,)
+                )
+                self._entries -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def _partition(
+        self,
+        texts: List[str],
+        query: bool = False
+    ) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """Keys per text, cached vectors, and the unique missing texts by key."""
+        keys = [self.key(text, query) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing.setdefault(key, text)
+        return keys, found, missing
+
+    def _merge(
+        self,
+        keys: List[str],
+        found: Dict[str, List[float]],
+        missing: Dict[str, str],
+        vectors: List[List[float]]
+    ) -> List[List[float]]:
+        fresh = list(zip(missing, vectors))
+        if fresh:
+            self._store(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._partition(texts)
+        vectors: List[List[float]] = []
+        if missing:
+            self.upstream_calls += 1
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+        return self._merge(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._partition(texts)
+        vectors: List[List[float]] = []
+        if missing:
+            self.upstream_calls += 1
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+        return self._merge(keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._partition([text], query=True)
+        vectors = []
+        if missing:
+            self.upstream_calls += 1
+            vectors = [self.embeddings.embed_query(text)]
+        return self._merge(keys, found, missing, vectors)[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, missing = self._partition([text], query=True)
+        vectors = []
+        if missing:
+            self.upstream_calls += 1
+            vectors = [await self.embeddings.aembed_query(text)]
+        return self._merge(keys, found, missing, vectors)[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+            self._entries = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "upstream_calls": self.upstream_calls,
+            "entries": self._entries,
+            "evictions": self.evictions
+        }
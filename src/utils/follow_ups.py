@@ -0,0 +1,150 @@
+"""Speculative follow-up suggestions, cached per set of retrieved documents.
+
+As soon as a turn has its documents, ``FollowUpCache.start`` generates
+suggestions for them on a background thread while the answer is being
+written. Results are keyed by the documents' identity, so any session
+retrieving the same credentials reuses them. A session's next query, or
+its eviction, cancels its unfinished task unless another session still
+waits for it: a queued task never runs and a running one stops at its
+next check of the ``cancelled`` event.
+"""
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+import threading
+
+from utils.rank_fusion import document_key
+
+# Generates suggestions for documents; returns None when it noticed ``cancelled`` was set
+Generator = Callable[[Sequence, Optional[threading.Event]], Optional[List[str]]]
+
+DocumentSetKey = FrozenSet[str]
+
+
+def document_set_key(documents: Sequence) -> DocumentSetKey:
+    return frozenset(document_key(doc) for doc in documents)
+
+
+class FollowUpCache:
+    """Background generation and LRU cache of follow-up suggestions."""
+
+    def __init__(self, generate: Generator, max_workers: int = 2, capacity: int = 256):
+        self.generate = generate
+        self.capacity = capacity
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="follow-ups")
+        self._results: "OrderedDict[DocumentSetKey, List[str]]" = OrderedDict()
+        self._in_flight: Dict[DocumentSetKey, Tuple[Future, threading.Event]] = {}
+        # Unfinished task each session waits for, and the sessions waiting for each task
+        self._pending: Dict[str, DocumentSetKey] = {}
+        self._waiting: Dict[DocumentSetKey, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "started": 0, "cancelled": 0, "waited": 0, "timeouts": 0, "failed": 0}
+
+    def start(self, session_id: str, documents: Sequence) -> None:
+        """Begin generating suggestions for a session's documents unless cached or already running."""
+        if not documents:
+            return
+        key = document_set_key(documents)
+        with self._lock:
+            self._release(session_id, keep=key)
+            if key in self._results:
+                return
+            if key not in self._in_flight:
+                cancelled = threading.Event()
+                future = self._executor.submit(self._run, key, list(documents), cancelled)
+                self._in_flight[key] = (future, cancelled)
+                self.stats["started"] += 1
+            self._pending[session_id] = key
+            self._waiting.setdefault(key, set()).add(session_id)
+
+    def cancel(self, session_id: str) -> None:
+        """Abandon a session's unfinished task, e.g. because its next query arrived or it was evicted."""
+        with self._lock:
+            self._release(session_id)
+
+    def _release(self, session_id: str, keep: Optional[DocumentSetKey] = None) -> None:
+        # Cancel the session's task unless it is still wanted, by this or another session
+        key = self._pending.get(session_id)
+        if key is None or key == keep:
+            return
+        del self._pending[session_id]
+        sessions = self._waiting.get(key)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if sessions:
+                return
+            del self._waiting[key]
+        entry = self._in_flight.pop(key, None)
+        if entry is not None:
+            future, cancelled = entry
+            cancelled.set()
+            future.cancel()
+            self.stats["cancelled"] += 1
+
+    def _run(self, key: DocumentSetKey, documents: List, cancelled: threading.Event) -> Optional[List[str]]:
+        try:
+            questions = self.generate(documents, cancelled)
+        finally:
+            with self._lock:
+                entry = self._in_flight.get(key)
+                if entry is not None and entry[1] is cancelled:
+                    del self._in_flight[key]
+                    for session_id in self._waiting.pop(key, ()):
+                        del self._pending[session_id]
+        if questions is not None and not cancelled.is_set():
+            self._store(key, questions)
+        return questions
+
+    def _store(self, key: DocumentSetKey, questions: List[str]) -> None:
+        with self._lock:
+            self._results[key] = questions
+            self._results.move_to_end(key)
+            while len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+
+    def get(self, documents: Sequence, timeout: Optional[float] = None) -> List[str]:
+        """Suggestions for ``documents``: cached, awaited from the running task, or generated now.
+
+        Waiting on a running task gives up after ``timeout`` seconds and
+        returns no suggestions; it keeps running and fills the cache. A task
+        that failed counts as a miss and the suggestions are generated now.
+        """
+        if not documents:
+            return []
+        key = document_set_key(documents)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                self.stats["hits"] += 1
+                return list(cached)
+            entry = self._in_flight.get(key)
+        if entry is not None:
+            self.stats["waited"] += 1
+            try:
+                questions = entry[0].result(timeout=timeout)
+            except TimeoutError:
+                self.stats["timeouts"] += 1
+                return []
+            except CancelledError:
+                questions = None
+            except Exception:
+                # The speculative task failing must not fail the user's turn
+                self.stats["failed"] += 1
+                questions = None
+            if questions is not None:
+                return list(questions)
+        self.stats["misses"] += 1
+        questions = self.generate(documents, None) or []
+        self._store(key, questions)
+        return list(questions)
+
+    def close(self) -> None:
+        """Cancel every unfinished task and stop the worker threads."""
+        with self._lock:
+            for _, cancelled in self._in_flight.values():
+                cancelled.set()
+            self._in_flight.clear()
+            self._pending.clear()
+            self._waiting.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,594 @@
+"""Streaming bulk ingestion of Verifiable Credentials into a vector store.
+
+Usage (from ``src/``):
+
+    python -m utils.ingestion data/credentials.jsonl data/rdf/ --workers 4
+"""
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from utils.data_processor import VCDataProcessor
+from utils.vector_search import get_embedding_function, upsert_embeddings
+
+JSON_SUFFIXES = {".json"}
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+RDF_SUFFIXES = {".ttl": "turtle", ".nt": "nt", ".nq": "nquads"}
+
+
+def _iter_files(paths: Iterable[str]) -> Iterator[Path]:
+    for path in map(Path, paths):
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file():
+                    yield child
+        else:
+            yield path
+
+
+# Key of the records standing in for a whole RDF file; workers parse and split them
+RDF_FILE = "rdf_file"
+JSON_READ_SIZE = 1 << 16
+
+
+def _iter_json_values(handle: Any, read_size: int = JSON_READ_SIZE) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time, or the document itself.
+
+    The file is read in blocks of ``read_size`` characters, so memory is
+    bounded by the largest element rather than the file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        block = handle.read(read_size)
+        if not block:
+            break
+        buffer = block.lstrip()
+    if not buffer.startswith("["):
+        document = buffer + handle.read()
+        yield json.loads(document)
+        return
+    position, eof = 1, False
+    while True:
+        # Skip whitespace and separators; refill when the buffer runs out
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            value, end = None, -1
+        # A value ending at the buffer edge may be a truncated number; read on unless at EOF
+        if end == -1 or (end >= len(buffer) and not eof):
+            if eof:
+                raise ValueError(f"Truncated JSON array in {getattr(handle, 'name', 'input')}")
+            block = handle.read(read_size)
+            eof = not block
+            buffer = buffer[position:] + block
+            position = 0
+            continue
+        yield value
+        position = end
+
+
+def iter_vc_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Lazily read credential records from JSON, JSONL and RDF files or directories.
+
+    JSONL files are read line by line. A JSON file may hold one credential or a
+    list of them, which is read element by element. An RDF file becomes a
+    single ``{"rdf_file": ..., "format": ...}`` record; ``process_records``
+    parses it and splits it per credential subject in the conversion workers.
+    """
+    for path in _iter_files(paths):
+        suffix = path.suffix.lower()
+        if suffix in JSONL_SUFFIXES:
+            with path.open(encoding="utf-8") as handle:
+                for line in handle:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+        elif suffix in JSON_SUFFIXES:
+            with path.open(encoding="utf-8") as handle:
+                yield from _iter_json_values(handle)
+        elif suffix in RDF_SUFFIXES:
+            yield {RDF_FILE: str(path), "format": RDF_SUFFIXES[suffix]}
+
+
+def _issuer_id(issuer: Any) -> str:
+    if isinstance(issuer, dict):
+        return str(issuer.get("id", ""))
+    return str(issuer or "")
+
+
+def to_vc_data(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a raw credential in the shape ``VCDataProcessor.process_vc_data`` expects.
+
+    Records that already carry a ``json``, ``rdf`` or ``text`` field are passed through.
+    """
+    if "json" in record or "rdf" in record or "text" in record:
+        return record
+    return {
+        "id": record.get("id", ""),
+        "json": record,
+        "type": record.get("type", []),
+        "issuer": _issuer_id(record.get("issuer")),
+        "issuanceDate": record.get("issuanceDate", ""),
+        "expirationDate": record.get("expirationDate", "")
+    }
+
+
+def document_id(processed: Dict[str, Any]) -> str:
+    """Vector store id for a processed credential: its id, or a hash of its text."""
+    doc_id = processed["metadata"].get("id")
+    if doc_id:
+        return str(doc_id)
+    return "sha1:" + hashlib.sha1(processed["text"].encode("utf-8")).hexdigest()
+
+
+def _iter_credentials(records: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+    """``(credential, None)`` per credential, or ``(None, error)`` for an RDF file that fails to parse."""
+    for record in records:
+        if RDF_FILE not in record:
+            yield record, None
+            continue
+        try:
+            for credential in VCDataProcessor.iter_rdf_credentials(record[RDF_FILE], format=record.get("format")):
+                yield credential, None
+        except Exception as e:
+            yield None, f"{record[RDF_FILE]}: {e}"
+
+
+def iter_processed(
+    records: Iterable[Dict[str, Any]],
+    chunk_size: Optional[int] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], List[str]]]:
+    """Convert records lazily, in slices of at most ``chunk_size`` credentials.
+
+    RDF file records are parsed and split into their credentials here, so a
+    large file is converted one slice at a time. Each slice holds the
+    processed documents and an error message for every credential (or RDF
+    file) that could not be converted.
+    """
+    processed, errors = [], []
+    for credential, error in _iter_credentials(records):
+        if credential is None:
+            errors.append(error)
+        else:
+            try:
+                item = VCDataProcessor.process_vc_data(to_vc_data(credential))
+                item["id"] = document_id(item)
+                processed.append(item)
+            except Exception as e:
+                errors.append(f"{credential.get('id', '<no id>')}: {e}")
+        if chunk_size and len(processed) + len(errors) >= chunk_size:
+            yield processed, errors
+            processed, errors = [], []
+    if processed or errors:
+        yield processed, errors
+
+
+def process_records(records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Convert a chunk of records to text and metadata.
+
+    Runs in worker processes. Returns the processed documents and an error
+    message for every credential (or RDF file) that could not be converted.
+    """
+    processed, errors = [], []
+    for chunk_processed, chunk_errors in iter_processed(records):
+        processed.extend(chunk_processed)
+        errors.extend(chunk_errors)
+    return processed, errors
+
+
+def stream_processed(records: List[Dict[str, Any]], chunk_size: int, results: Any) -> None:
+    """Worker task putting the ``iter_processed`` slices on a bounded queue, then None."""
+    try:
+        for result in iter_processed(records, chunk_size):
+            results.put(result)
+    finally:
+        results.put(None)
+
+
+def _queued_results(results: Any, future: Future) -> Iterator[Tuple[List[Dict[str, Any]], List[str]]]:
+    """Slices put on ``results`` by a ``stream_processed`` task, until it finishes."""
+    while True:
+        try:
+            result = results.get(timeout=1.0)
+        except queue.Empty:
+            # A worker that died never puts the final None
+            if future.done() and results.empty():
+                future.result()
+                return
+            continue
+        if result is None:
+            break
+        yield result
+    future.result()
+
+
+def _future_results(future: Future) -> Iterator[Tuple[List[Dict[str, Any]], List[str]]]:
+    yield future.result()
+
+
+def _record_chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Chunks of ``size`` records; an RDF file record gets a chunk of its own."""
+    chunk = []
+    for record in records:
+        if RDF_FILE in record:
+            if chunk:
+                yield chunk
+                chunk = []
+            yield [record]
+            continue
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+MAX_RECORDED_ERRORS = 1000
+
+
+@dataclass
+class IngestionStats:
+    """Counters for one ingestion run."""
+    records: int = 0
+    documents: int = 0
+    embedding_batches: int = 0
+    upserts: int = 0
+    error_count: int = 0
+    errors: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    def add_errors(self, errors: List[str]) -> None:
+        """Count conversion errors, keeping only the first messages."""
+        self.error_count += len(errors)
+        room = MAX_RECORDED_ERRORS - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+    @property
+    def docs_per_second(self) -> float:
+        elapsed = self.elapsed or (time.perf_counter() - self.started_at)
+        return self.documents / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "records": self.records,
+            "documents": self.documents,
+            "embedding_batches": self.embedding_batches,
+            "upserts": self.upserts,
+            "errors": self.error_count,
+            "elapsed_seconds": self.elapsed,
+            "docs_per_second": self.docs_per_second
+        }
+
+
+class BulkIngestor:
+    """Streams credentials through conversion, batched embedding and chunked upserts.
+
+    Records are converted in a process pool, grouped into embedding batches
+    bounded by count and characters, embedded with at most ``max_in_flight``
+    concurrent requests, and upserted in chunks of ``upsert_size``. Every
+    stage holds a bounded amount of work, so memory stays flat regardless of
+    input size. Stores that only reach disk through ``save`` (file-backed
+    ``MmapVectorStore`` and ``ShardedVectorStore``) are saved at the end of
+    every ingest and delete, before the local indexes.
+    """
+
+    def __init__(
+        self,
+        vector_store: Any,
+        embeddings: Optional[Any] = None,
+        batch_size: int = 256,
+        max_batch_chars: int = 400_000,
+        upsert_size: int = 2048,
+        max_workers: Optional[int] = None,
+        process_chunk_size: int = 256,
+        max_in_flight: int = 4,
+        answer_cache: Optional[Any] = None,
+        lexical_index: Optional[Any] = None,
+        metadata_index: Optional[Any] = None,
+        progress: Optional[Callable[[IngestionStats], None]] = None
+    ):
+        self.vector_store = vector_store
+        self.embeddings = embeddings or get_embedding_function(vector_store)
+        self.batch_size = batch_size
+        self.max_batch_chars = max_batch_chars
+        self.upsert_size = upsert_size
+        self.max_workers = max_workers
+        self.process_chunk_size = process_chunk_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.metadata_index = metadata_index
+        self.progress = progress
+
+    def processed_chunks(self, records: Iterable[Dict[str, Any]], stats: IngestionStats) -> Iterator[List[Dict[str, Any]]]:
+        """Convert records in a process pool, keeping a bounded number of chunks in flight.
+
+        An RDF file is converted by one worker, which sends its credentials
+        back in ``process_chunk_size`` slices over a bounded queue.
+        """
+        chunks = _record_chunks(records, self.process_chunk_size)
+        if self.max_workers == 0:
+            for chunk in chunks:
+                yield from self._collect(iter_processed(chunk, self.process_chunk_size), stats)
+            return
+
+        with ExitStack() as stack:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=self.max_workers))
+            manager = None
+            pending: Deque[Iterator[Tuple[List[Dict[str, Any]], List[str]]]] = deque()
+            window = 2 * (self.max_workers or os.cpu_count() or 1)
+            for chunk in chunks:
+                if RDF_FILE in chunk[0]:
+                    if manager is None:
+                        manager = stack.enter_context(multiprocessing.Manager())
+                    results = manager.Queue(maxsize=2)
+                    future = executor.submit(stream_processed, chunk, self.process_chunk_size, results)
+                    pending.append(_queued_results(results, future))
+                else:
+                    pending.append(_future_results(executor.submit(process_records, chunk)))
+                if len(pending) >= window:
+                    yield from self._collect(pending.popleft(), stats)
+            while pending:
+                yield from self._collect(pending.popleft(), stats)
+
+    @staticmethod
+    def _collect(
+        results: Iterable[Tuple[List[Dict[str, Any]], List[str]]],
+        stats: IngestionStats
+    ) -> Iterator[List[Dict[str, Any]]]:
+        for processed, errors in results:
+            stats.records += len(processed) + len(errors)
+            stats.add_errors(errors)
+            yield processed
+
+    def _embedding_batches(self, chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """Regroup processed documents into batches bounded by count and characters."""
+        batch, batch_chars = [], 0
+        for chunk in chunks:
+            for item in chunk:
+                text_chars = len(item["text"])
+                if batch and (len(batch) >= self.batch_size or batch_chars + text_chars > self.max_batch_chars):
+                    yield batch
+                    batch, batch_chars = [], 0
+                batch.append(item)
+                batch_chars += text_chars
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[List[float]]]:
+        return batch, self.embeddings.embed_documents([item["text"] for item in batch])
+
+    def _flush(
+        self,
+        buffer: Dict[str, Tuple[Dict[str, Any], List[float]]],
+        stats: IngestionStats,
+        on_upsert: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> None:
+        if not buffer:
+            return
+        ids = list(buffer)
+        items = [buffer[doc_id][0] for doc_id in ids]
+        upsert_embeddings(
+            self.vector_store,
+            ids=ids,
+            texts=[item["text"] for item in items],
+            embeddings=[buffer[doc_id][1] for doc_id in ids],
+            metadatas=[item["metadata"] for item in items]
+        )
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate_documents(ids)
+        for index in self._local_indexes():
+            index.upsert_processed(items)
+        if on_upsert is not None:
+            on_upsert(items)
+        stats.documents += len(ids)
+        stats.upserts += 1
+        buffer.clear()
+        if self.progress is not None:
+            self.progress(stats)
+
+    def ingest(self, records: Iterable[Dict[str, Any]]) -> IngestionStats:
+        """Ingest an iterable of credential records and return run statistics."""
+        stats = IngestionStats()
+        return self.ingest_processed(self.processed_chunks(records, stats), stats)
+
+    def ingest_processed(
+        self,
+        chunks: Iterable[List[Dict[str, Any]]],
+        stats: IngestionStats,
+        on_upsert: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> IngestionStats:
+        """Embed and upsert already-converted documents.
+
+        ``on_upsert`` is called with each chunk of documents once it has been
+        written to the vector store.
+        """
+        # Keyed by id so a credential repeated within one upsert chunk is written once
+        buffer: Dict[str, Tuple[Dict[str, Any], List[float]]] = {}
+
+        def collect(future: Future) -> None:
+            batch, vectors = future.result()
+            stats.embedding_batches += 1
+            for item, vector in zip(batch, vectors):
+                buffer[item["id"]] = (item, vector)
+            if len(buffer) >= self.upsert_size:
+                self._flush(buffer, stats, on_upsert)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as embed_pool:
+            in_flight: Deque[Future] = deque()
+            for batch in self._embedding_batches(chunks):
+                in_flight.append(embed_pool.submit(self._embed_batch, batch))
+                if len(in_flight) >= self.max_in_flight:
+                    collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+
+        self._flush(buffer, stats, on_upsert)
+        self._save_vector_store()
+        self._save_local_indexes()
+        stats.elapsed = time.perf_counter() - stats.started_at
+        return stats
+
+    def delete(self, ids: List[str]) -> None:
+        """Remove documents from the vector store and local indexes and drop answers that cited them."""
+        for chunk in _chunked(ids, self.upsert_size):
+            self.vector_store.delete(ids=chunk)
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate_documents(chunk)
+            for index in self._local_indexes():
+                index.remove(chunk)
+        if ids:
+            self._save_vector_store()
+            self._save_local_indexes()
+
+    def _local_indexes(self) -> List[Any]:
+        """Local indexes kept in sync with the vector store."""
+        return [index for index in (self.lexical_index, self.metadata_index) if index is not None]
+
+    def _save_vector_store(self) -> None:
+        """Persist a vector store that writes to disk only on ``save``; Chroma persists by itself."""
+        save = getattr(self.vector_store, "save", None)
+        if callable(save) and getattr(self.vector_store, "path", "") is not None:
+            save()
+
+    def _save_local_indexes(self) -> None:
+        """Persist the local indexes that are backed by a file."""
+        for index in self._local_indexes():
+            if index.path is not None:
+                index.save()
+
+    def ingest_paths(self, paths: Iterable[str]) -> IngestionStats:
+        """Ingest every credential found in the given files or directories."""
+        return self.ingest(iter_vc_records(paths))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bulk-ingest Verifiable Credentials into Chroma.")
+    parser.add_argument("paths", nargs="+", help="JSON, JSONL or Turtle files, or directories of them")
+    parser.add_argument("--collection", default="vc_collection")
+    parser.add_argument("--persist-directory", default="./data/chroma_db")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embedding request")
+    parser.add_argument("--upsert-size", type=int, default=2048, help="Documents per vector store upsert")
+    parser.add_argument("--workers", type=int, default=None, help="Conversion processes (0 to convert inline)")
+    parser.add_argument("--in-flight", type=int, default=4, help="Concurrent embedding requests")
+    parser.add_argument("--manifest", default=None, help="Manifest path; enables incremental sync")
+    parser.add_argument("--dry-run", action="store_true", help="With --manifest, print the diff without applying it")
+    parser.add_argument("--lexical-index", default=None, help="BM25 index path to keep in sync with the collection")
+    parser.add_argument("--metadata-index", default=None, help="Metadata index path to keep in sync with the collection")
+    parser.add_argument("--embedding-cache", default=None, help="SQLite file caching embeddings across runs")
+    parser.add_argument("--prune-expired", action="store_true", help="With --manifest, remove expired credentials")
+    parser.add_argument("--shard-by", default=None, help="Split the collection into shards by 'hash', 'issuer' or 'type'")
+    parser.add_argument("--shards", type=int, default=8, help="With --shard-by hash, number of shards")
+    parser.add_argument("--rebuild-shard", default=None, help="With --shard-by, drop one shard and re-ingest only its records")
+    args = parser.parse_args(argv)
+    if args.rebuild_shard and not args.shard_by:
+        parser.error("--rebuild-shard requires --shard-by")
+    if args.rebuild_shard and args.manifest:
+        parser.error("--rebuild-shard re-ingests every record routed to the shard and cannot be combined with --manifest")
+
+    from langchain_community.vectorstores import Chroma
+    from utils.clients import default_registry
+
+    embeddings = default_registry().embeddings()
+    if args.embedding_cache:
+        from utils.embedding_cache import CachedEmbeddings
+
+        embeddings = CachedEmbeddings(embeddings, path=args.embedding_cache)
+    if args.shard_by:
+        import chromadb
+        from utils.sharded_store import ShardedVectorStore, make_partitioner
+
+        # Each shard is its own collection named "<collection>-<shard>"
+        client = chromadb.PersistentClient(path=args.persist_directory)
+        prefix = f"{args.collection}-"
+        names = [getattr(collection, "name", collection) for collection in client.list_collections()]
+        existing = [name[len(prefix):] for name in names if name.startswith(prefix)]
+        if args.rebuild_shard in existing:
+            client.delete_collection(prefix + args.rebuild_shard)
+        vector_store = ShardedVectorStore(
+            embeddings,
+            shard_factory=lambda name: Chroma(client=client, collection_name=prefix + name, embedding_function=embeddings),
+            partitioner=make_partitioner(args.shard_by, args.shards),
+            shards=existing,
+            write_shards=[args.rebuild_shard] if args.rebuild_shard else None
+        )
+    else:
+        vector_store = Chroma(
+            collection_name=args.collection,
+            embedding_function=embeddings,
+            persist_directory=args.persist_directory
+        )
+
+    lexical_index = None
+    if args.lexical_index:
+        from utils.bm25_index import BM25Index
+
+        lexical_index = BM25Index(args.lexical_index)
+    metadata_index = None
+    if args.metadata_index:
+        from utils.metadata_index import MetadataIndex
+
+        metadata_index = MetadataIndex(args.metadata_index)
+
+    def report(stats: IngestionStats) -> None:
+        print(f"{stats.documents} documents ingested ({stats.docs_per_second:.1f} docs/sec)", flush=True)
+
+    ingestor = BulkIngestor(
+        vector_store,
+        batch_size=args.batch_size,
+        upsert_size=args.upsert_size,
+        max_workers=args.workers,
+        max_in_flight=args.in_flight,
+        lexical_index=lexical_index,
+        metadata_index=metadata_index,
+        progress=report
+    )
+    if args.manifest:
+        from utils.manifest import IncrementalSync, IngestionManifest
+
+        sync = IncrementalSync(ingestor, IngestionManifest(args.manifest), prune_expired=args.prune_expired)
+        plan = sync.sync(iter_vc_records(args.paths), dry_run=args.dry_run)
+        print(plan.describe())
+        if args.dry_run:
+            return
+        stats = sync.stats
+    else:
+        stats = ingestor.ingest_paths(args.paths)
+    print(json.dumps(stats.as_dict(), indent=2))
+    if args.rebuild_shard:
+        print(f"{vector_store.stats['skipped']} documents belong to other shards and were left untouched")
+    for error in stats.errors[:20]:
+        print(f"skipped {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import hashlib
+import json
+import os
+
+from utils.ingestion import BulkIngestor, IngestionStats
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(processed: Dict[str, Any]) -> str:
+    """Hash of a processed credential's normalized text and metadata."""
+    payload = json.dumps(
+        {"text": processed["text"].strip(), "metadata": processed["metadata"]},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_expired(processed: Dict[str, Any], today: Optional[date] = None) -> bool:
+    """Whether a processed credential's expiration date has passed."""
+    expiration = str(processed["metadata"].get("expiration_date") or "")[:10]
+    if not expiration:
+        return False
+    try:
+        return date.fromisoformat(expiration) < (today or date.today())
+    except ValueError:
+        return False
+
+
+class IngestionManifest:
+    """Local record of which credential versions are in the vector store.
+
+    Maps credential id to the content hash of the text and metadata that was
+    embedded, and is written atomically so an interrupted sync leaves the
+    previous manifest intact.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, str] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.entries = data.get("entries", {})
+
+    def get(self, doc_id: str) -> Optional[str]:
+        return self.entries.get(doc_id)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "entries": self.entries}, sort_keys=True),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class SyncPlan:
+    """Difference between the source corpus and the manifest."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged
+        }
+
+    def describe(self, limit: int = 50) -> str:
+        """Human-readable diff listing up to ``limit`` ids per section."""
+        lines = [", ".join(f"{name}: {count}" for name, count in self.summary().items())]
+        for sign, ids in (("+", self.added), ("~", self.changed), ("-", self.removed)):
+            lines.extend(f"{sign} {doc_id}" for doc_id in ids[:limit])
+            if len(ids) > limit:
+                lines.append(f"{sign} ... {len(ids) - limit} more")
+        return "\n".join(lines)
+
+
+class IncrementalSync:
+    """Embeds only new or changed credentials and deletes ones missing from the source.
+
+    Each record is converted with ``process_vc_data`` and hashed. Records whose
+    hash matches the manifest are skipped before any embedding call, so a
+    refresh costs O(changes) instead of O(corpus).
+    """
+
+    def __init__(self, ingestor: BulkIngestor, manifest: IngestionManifest, prune_expired: bool = False):
+        self.ingestor = ingestor
+        self.manifest = manifest
+        self.prune_expired = prune_expired
+        self.stats: Optional[IngestionStats] = None
+
+    def _diff(
+        self,
+        chunks: Iterable[List[Dict[str, Any]]],
+        plan: SyncPlan,
+        seen: set,
+        hashes: Dict[str, str],
+        converted: set
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield only new or changed documents, recording the diff in ``plan``."""
+        for chunk in chunks:
+            pending = []
+            for item in chunk:
+                doc_id = item["id"]
+                converted.add(doc_id)
+                if self.prune_expired and is_expired(item):
+                    continue
+                seen.add(doc_id)
+                digest = content_hash(item)
+                previous = self.manifest.get(doc_id)
+                if previous == digest:
+                    plan.unchanged += 1
+                    continue
+                if doc_id not in hashes:
+                    (plan.added if previous is None else plan.changed).append(doc_id)
+                hashes[doc_id] = digest
+                pending.append(item)
+            if pending:
+                yield pending
+
+    def sync(self, records: Iterable[Dict[str, Any]], dry_run: bool = False) -> SyncPlan:
+        """Bring the vector store in line with ``records`` and return the applied diff.
+
+        With ``dry_run`` the diff is computed without embedding, writing or
+        deleting anything. A record that fails conversion keeps its previous
+        version; if a failed record has no id, so its previous version cannot
+        be told apart from removed credentials, nothing is removed.
+        """
+        plan = SyncPlan()
+        stats = IngestionStats()
+        seen: set = set()
+        hashes: Dict[str, str] = {}
+        requested: set = set()
+        converted: set = set()
+        unnamed = 0
+
+        def tracked(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            nonlocal unnamed
+            for record in records:
+                if record.get("id"):
+                    requested.add(str(record["id"]))
+                else:
+                    unnamed += 1
+                yield record
+
+        changes = self._diff(self.ingestor.processed_chunks(tracked(records), stats), plan, seen, hashes, converted)
+
+        if dry_run:
+            for _ in changes:
+                pass
+        else:
+            def record_upserted(items: List[Dict[str, Any]]) -> None:
+                for item in items:
+                    self.manifest.entries[item["id"]] = hashes[item["id"]]
+
+            self.ingestor.ingest_processed(changes, stats, on_upsert=record_upserted)
+
+        failed = requested - converted
+        seen |= failed
+        if stats.error_count > len(failed):
+            plan.removed = []
+        else:
+            plan.removed = [doc_id for doc_id in self.manifest.entries if doc_id not in seen]
+        self.stats = stats
+
+        if not dry_run:
+            self.ingestor.delete(plan.removed)
+            for doc_id in plan.removed:
+                del self.manifest.entries[doc_id]
+            self.manifest.save()
+        return plan
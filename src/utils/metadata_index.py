@@ -0,0 +1,454 @@
+"""Columnar index over credential metadata and a question-side filter extractor.
+
+``process_vc_data`` extracts issuer, type and dates into metadata. This index
+keeps those fields as numpy columns (issuer and type dictionary-encoded, dates
+as ordinals) so constraints in a question can be resolved locally: either
+pushed down into the vector store ``where`` clause, or used to answer
+listing and counting questions without retrieval or generation.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+INDEX_VERSION = 1
+BASE_TYPE = "VerifiableCredential"
+
+# Ordinal stored for a missing date
+NO_DATE = 0
+
+# Larger id sets are not pushed down; the filter is too unselective to help
+MAX_PUSHDOWN_IDS = 5000
+MAX_LISTED = 50
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Parse the date part of an ISO 8601 date or datetime string."""
+    text = str(value or "")[:10]
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def _split_types(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(item) for item in value if item]
+    return [part.strip() for part in str(value or "").split(",") if part.strip()]
+
+
+@dataclass
+class MetadataFilter:
+    """Constraints on credential metadata. Date bounds are half-open: ``[from, until)``."""
+    issuer: Optional[str] = None
+    types: List[str] = field(default_factory=list)
+    issued_from: Optional[date] = None
+    issued_until: Optional[date] = None
+    expires_from: Optional[date] = None
+    expires_until: Optional[date] = None
+
+    def is_empty(self) -> bool:
+        return not (
+            self.issuer or self.types
+            or self.issued_from or self.issued_until
+            or self.expires_from or self.expires_until
+        )
+
+    def describe(self) -> str:
+        parts = []
+        if self.types:
+            parts.append("type " + " or ".join(self.types))
+        if self.issuer:
+            parts.append(f"issued by {self.issuer}")
+        if self.issued_from:
+            parts.append(f"issued on or after {self.issued_from.isoformat()}")
+        if self.issued_until:
+            parts.append(f"issued before {self.issued_until.isoformat()}")
+        if self.expires_from:
+            parts.append(f"expiring on or after {self.expires_from.isoformat()}")
+        if self.expires_until:
+            parts.append(f"expiring before {self.expires_until.isoformat()}")
+        return ", ".join(parts)
+
+
+class MetadataIndex:
+    """Columnar, dictionary-encoded index of credential metadata.
+
+    Rows are addressed by vector store id. Removed rows are tombstoned in
+    memory and left out when the index is saved.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1024):
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+        self.ids: List[str] = []
+        self.credential_ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self.issuers: List[str] = []
+        self._issuer_codes: Dict[str, int] = {}
+        self.types: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        self._issuer = np.full(capacity, -1, dtype=np.int32)
+        self._issued = np.zeros(capacity, dtype=np.int32)
+        self._expires = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        # One membership column per credential type
+        self._type_columns: List[np.ndarray] = []
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._alive)
+        if size <= capacity:
+            return
+        new_capacity = max(size, 2 * capacity)
+
+        def resize(column: np.ndarray, fill: Any) -> np.ndarray:
+            grown = np.full(new_capacity, fill, dtype=column.dtype)
+            grown[:capacity] = column
+            return grown
+
+        self._issuer = resize(self._issuer, -1)
+        self._issued = resize(self._issued, NO_DATE)
+        self._expires = resize(self._expires, NO_DATE)
+        self._alive = resize(self._alive, False)
+        self._type_columns = [resize(column, False) for column in self._type_columns]
+
+    def _issuer_code(self, issuer: str) -> int:
+        code = self._issuer_codes.get(issuer)
+        if code is None:
+            code = self._issuer_codes[issuer] = len(self.issuers)
+            self.issuers.append(issuer)
+        return code
+
+    def _type_code(self, type_name: str) -> int:
+        code = self._type_codes.get(type_name)
+        if code is None:
+            code = self._type_codes[type_name] = len(self.types)
+            self.types.append(type_name)
+            self._type_columns.append(np.zeros(len(self._alive), dtype=bool))
+        return code
+
+    def upsert(self, doc_id: str, metadata: Dict[str, Any]) -> None:
+        """Index or re-index one credential's metadata."""
+        with self._lock:
+            row = self._rows.get(doc_id)
+            if row is None:
+                row = len(self.ids)
+                self._grow(row + 1)
+                self.ids.append(doc_id)
+                self.credential_ids.append("")
+                self._rows[doc_id] = row
+            else:
+                for column in self._type_columns:
+                    column[row] = False
+            self.credential_ids[row] = str(metadata.get("id") or "")
+            issuer = str(metadata.get("issuer") or "")
+            self._issuer[row] = self._issuer_code(issuer) if issuer else -1
+            issued = parse_date(metadata.get("issuance_date"))
+            expires = parse_date(metadata.get("expiration_date"))
+            self._issued[row] = issued.toordinal() if issued else NO_DATE
+            self._expires[row] = expires.toordinal() if expires else NO_DATE
+            for type_name in _split_types(metadata.get("type")):
+                self._type_columns[self._type_code(type_name)][row] = True
+            self._alive[row] = True
+
+    def upsert_processed(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Index processed credentials as produced by the ingestion pipeline."""
+        for item in items:
+            self.upsert(item["id"], item["metadata"])
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = False
+
+    def _mask(self, query: MetadataFilter) -> np.ndarray:
+        size = len(self.ids)
+        mask = self._alive[:size].copy()
+        if query.issuer is not None:
+            code = self._issuer_codes.get(query.issuer, -2)
+            mask &= self._issuer[:size] == code
+        if query.types:
+            type_mask = np.zeros(size, dtype=bool)
+            for type_name in query.types:
+                code = self._type_codes.get(type_name)
+                if code is not None:
+                    type_mask |= self._type_columns[code][:size]
+            mask &= type_mask
+        for column, lower, upper in (
+            (self._issued, query.issued_from, query.issued_until),
+            (self._expires, query.expires_from, query.expires_until),
+        ):
+            if lower is not None:
+                mask &= column[:size] >= lower.toordinal()
+            if upper is not None:
+                # Credentials without the date never satisfy a date bound
+                mask &= (column[:size] < upper.toordinal()) & (column[:size] != NO_DATE)
+        return mask
+
+    def match(self, query: MetadataFilter) -> List[str]:
+        """Ids of the credentials satisfying every constraint."""
+        with self._lock:
+            return [self.ids[row] for row in np.flatnonzero(self._mask(query))]
+
+    def count(self, query: MetadataFilter) -> int:
+        with self._lock:
+            return int(self._mask(query).sum())
+
+    def where_clause(self, query: MetadataFilter) -> Optional[Dict[str, Any]]:
+        """Chroma ``where`` clause restricting search to exactly the matching credentials.
+
+        Dates are stored as strings in Chroma, so range predicates cannot be
+        expressed there; credential ids are pushed down instead, the matching
+        ones with ``$in`` or, when more than ``MAX_PUSHDOWN_IDS`` match, the
+        other ones with ``$nin``. Returns None when there is nothing to
+        filter out, and also when the constraints cannot be pushed down
+        exactly: nothing matches (Chroma rejects an empty ``$in``), a
+        credential that would need to be named has no id, or both lists are
+        too long. Callers tell these apart by comparing ``count`` with the
+        index size, and answer from the index rather than search unfiltered.
+        """
+        if query.is_empty():
+            return None
+        with self._lock:
+            mask = self._mask(query)
+            matching = np.flatnonzero(mask)
+            others = np.flatnonzero(self._alive[:len(self.ids)] & ~mask)
+            if not len(matching) or not len(others):
+                return None
+            if len(matching) <= MAX_PUSHDOWN_IDS:
+                operator, rows = "$in", matching
+            elif len(others) <= MAX_PUSHDOWN_IDS:
+                operator, rows = "$nin", others
+            else:
+                return None
+            # Credentials without an id cannot be addressed by a metadata filter
+            credential_ids = [self.credential_ids[row] for row in rows]
+        if not all(credential_ids):
+            return None
+        return {"id": {operator: credential_ids}}
+
+    def describe_rows(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """Decode the indexed metadata for the given ids."""
+        described = []
+        with self._lock:
+            for doc_id in doc_ids:
+                row = self._rows[doc_id]
+                issued, expires = int(self._issued[row]), int(self._expires[row])
+                described.append({
+                    "id": self.credential_ids[row] or doc_id,
+                    "types": [name for name, column in zip(self.types, self._type_columns) if column[row]],
+                    "issuer": self.issuers[self._issuer[row]] if self._issuer[row] >= 0 else "",
+                    "issuance_date": date.fromordinal(issued).isoformat() if issued else "",
+                    "expiration_date": date.fromordinal(expires).isoformat() if expires else ""
+                })
+        return described
+
+    def _load(self) -> None:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        for row, doc_id in enumerate(data["ids"]):
+            self.upsert(doc_id, {
+                "id": data["credential_ids"][row],
+                "issuer": data["issuers"][data["issuer"][row]] if data["issuer"][row] >= 0 else "",
+                "type": [data["types"][code] for code in data["row_types"][row]],
+                "issuance_date": date.fromordinal(data["issued"][row]).isoformat() if data["issued"][row] else "",
+                "expiration_date": date.fromordinal(data["expires"][row]).isoformat() if data["expires"][row] else ""
+            })
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the live rows to disk atomically."""
+        target = Path(path) if path else self.path
+        if target is None:
+            raise ValueError("No path given for saving the metadata index")
+        with self._lock:
+            rows = sorted(self._rows.values())
+            payload = {
+                "version": INDEX_VERSION,
+                "ids": [self.ids[row] for row in rows],
+                "credential_ids": [self.credential_ids[row] for row in rows],
+                "issuers": self.issuers,
+                "types": self.types,
+                "issuer": [int(self._issuer[row]) for row in rows],
+                "row_types": [
+                    [code for code, column in enumerate(self._type_columns) if column[row]]
+                    for row in rows
+                ],
+                "issued": [int(self._issued[row]) for row in rows],
+                "expires": [int(self._expires[row]) for row in rows]
+            }
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(target.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp_path, target)
+
+
+_DATE = r"(\d{4}-\d{2}-\d{2}|\d{4}-\d{2}|\d{4})"
+_EXPIRY_PATTERN = re.compile(
+    r"\b(?:expir\w*|valid\s+until|valid\s+through)\s+(before|by|until|after|since|in|on|during)\s+" + _DATE,
+    re.IGNORECASE
+)
+_ISSUANCE_PATTERN = re.compile(
+    r"\b(?:issued|issuance|obtained|received)\s+(?:\S+\s+){0,3}?(before|by|until|after|since|in|on|during)\s+" + _DATE,
+    re.IGNORECASE
+)
+_STILL_VALID_PATTERN = re.compile(r"\b(?:not\s+(?:yet\s+)?expired|unexpired|still\s+valid|currently\s+valid)\b", re.IGNORECASE)
+_EXPIRED_PATTERN = re.compile(r"\bexpired\b", re.IGNORECASE)
+_COUNT_PATTERN = re.compile(r"^\s*(?:how\s+many|count|number\s+of)\b", re.IGNORECASE)
+_LIST_PATTERN = re.compile(r"^\s*(?:list|show|enumerate|give\s+me)\b.*\bcredentials\b", re.IGNORECASE | re.DOTALL)
+_WHICH_PATTERN = re.compile(r"^\s*(?:which|what)\b.*\bcredentials\b", re.IGNORECASE | re.DOTALL)
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Words a counting or listing question may contain besides its constraints;
+# any other word asks about credential content, which needs retrieval
+LISTING_WORDS = {
+    "list", "show", "enumerate", "give", "me", "how", "many", "count", "number", "which", "what",
+    "all", "every", "each", "any", "of", "my", "the", "i", "do", "does", "have", "had", "own", "hold",
+    "is", "are", "was", "were", "there", "that", "those", "with", "from", "by", "issued", "please",
+    "credential", "credentials", "verifiable", "currently", "still", "valid", "expired", "not", "yet",
+    "unexpired", "total", "in", "a", "an",
+}
+_CAMEL_CASE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _date_range(token: str) -> Tuple[date, date]:
+    """Half-open range covered by a year, year-month or full date."""
+    parts = [int(part) for part in token.split("-")]
+    if len(parts) == 1:
+        return date(parts[0], 1, 1), date(parts[0] + 1, 1, 1)
+    if len(parts) == 2:
+        start = date(parts[0], parts[1], 1)
+        return start, date(parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1)
+    start = date(parts[0], parts[1], parts[2])
+    return start, start + timedelta(days=1)
+
+
+def _bounds(operator: str, token: str) -> Tuple[Optional[date], Optional[date]]:
+    """Date bounds for a constraint; an impossible date such as 2026-02-30 constrains nothing."""
+    try:
+        start, end = _date_range(token)
+    except ValueError:
+        return None, None
+    operator = operator.lower()
+    if operator == "before":
+        return None, start
+    if operator in ("by", "until"):
+        return None, end
+    if operator == "after":
+        return end, None
+    if operator == "since":
+        return start, None
+    return start, end
+
+
+def _type_phrases(type_name: str) -> List[str]:
+    """Ways a question may refer to a type: ``PassportCredential``, ``passport credential``, ``passport``."""
+    words = _CAMEL_CASE.sub(" ", type_name).lower()
+    phrases = [type_name.lower(), words]
+    if words.endswith(" credential"):
+        phrases.append(words[:-len(" credential")])
+    return phrases
+
+
+def extract_filter(question: str, index: MetadataIndex, today: Optional[date] = None) -> MetadataFilter:
+    """Turn issuer, type and date constraints mentioned in a question into a filter.
+
+    Issuers and types are matched against the values present in the index,
+    so only constraints that can actually be resolved are extracted.
+    """
+    today = today or date.today()
+    lowered = question.lower()
+    query = MetadataFilter()
+
+    for issuer in sorted(index.issuers, key=len, reverse=True):
+        if issuer and issuer.lower() in lowered:
+            query.issuer = issuer
+            break
+
+    for type_name in index.types:
+        if type_name == BASE_TYPE:
+            continue
+        if any(re.search(r"\b" + re.escape(phrase) + r"s?\b", lowered) for phrase in _type_phrases(type_name)):
+            query.types.append(type_name)
+
+    expiry = _EXPIRY_PATTERN.search(question)
+    if expiry:
+        query.expires_from, query.expires_until = _bounds(*expiry.groups())
+    elif _STILL_VALID_PATTERN.search(question):
+        query.expires_from = today
+    elif _EXPIRED_PATTERN.search(question):
+        query.expires_until = today
+
+    issuance = _ISSUANCE_PATTERN.search(question)
+    if issuance:
+        query.issued_from, query.issued_until = _bounds(*issuance.groups())
+    return query
+
+
+def _only_asks_for_listing(question: str, query: MetadataFilter) -> bool:
+    """Whether the question says nothing beyond its list intent and metadata constraints."""
+    lowered = question.lower()
+    for pattern in (_EXPIRY_PATTERN, _ISSUANCE_PATTERN):
+        lowered = pattern.sub(" ", lowered)
+    if query.issuer:
+        lowered = lowered.replace(query.issuer.lower(), " ")
+    for type_name in query.types:
+        for phrase in _type_phrases(type_name):
+            lowered = re.sub(r"\b" + re.escape(phrase) + r"s?\b", " ", lowered)
+    return all(word in LISTING_WORDS for word in _WORD.findall(lowered))
+
+
+def listing_kind(question: str, query: MetadataFilter) -> Optional[str]:
+    """``"count"`` or ``"list"`` for questions answerable from metadata alone, else None.
+
+    A question that also asks about credential content, such as "show me what
+    my credentials say about my nationality", is left to retrieval.
+    """
+    if not _only_asks_for_listing(question, query):
+        return None
+    if _COUNT_PATTERN.search(question) and ("credential" in question.lower() or query.types):
+        return "count"
+    if _LIST_PATTERN.search(question):
+        return "list"
+    # "Which credentials ..." is only a listing when it carries an issuer or date constraint
+    constrained = query.issuer or query.issued_from or query.issued_until or query.expires_from or query.expires_until
+    if constrained and _WHICH_PATTERN.search(question):
+        return "list"
+    return None
+
+
+def listing_answer(index: MetadataIndex, query: MetadataFilter, kind: str) -> Tuple[str, str]:
+    """Answer text and a context listing for a count or list question."""
+    doc_ids = index.match(query)
+    scope = f" ({query.describe()})" if not query.is_empty() else ""
+    rows = index.describe_rows(doc_ids[:MAX_LISTED])
+    lines = []
+    for row in rows:
+        types = ", ".join(name for name in row["types"] if name != BASE_TYPE) or BASE_TYPE
+        details = [f"issued by {row['issuer']}"] if row["issuer"] else []
+        if row["issuance_date"]:
+            details.append(f"issued {row['issuance_date']}")
+        if row["expiration_date"]:
+            details.append(f"expires {row['expiration_date']}")
+        lines.append(f"- {row['id']}: {types}" + (f" ({', '.join(details)})" if details else ""))
+    if len(doc_ids) > MAX_LISTED:
+        lines.append(f"- ... and {len(doc_ids) - MAX_LISTED} more")
+    context = "\n".join(lines)
+
+    noun = "credential" if len(doc_ids) == 1 else "credentials"
+    if kind == "count" or not doc_ids:
+        answer = f"You have {len(doc_ids)} matching {noun}{scope}."
+    else:
+        answer = f"You have {len(doc_ids)} matching {noun}{scope}:\n{context}"
+    return answer, context
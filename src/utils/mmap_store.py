@@ -0,0 +1,347 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from utils.embedding_cache import DTYPES
+from utils.vector_search import ScoredDocument, matches_where
+
+MANIFEST = "index.json"
+# Matrix elements scored per block, bounding the float32 scratch space of a search
+BLOCK_ELEMENTS = 1 << 22
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class MmapVectorStore(VectorStore):
+    """Read-mostly vector store backed by memory-mapped NumPy files.
+
+    Unit-normalized vectors live in one ``float32`` or ``float16`` matrix and
+    are scored with a blocked matrix product and ``argpartition`` top-k;
+    distances are cosine distances (lower is closer). ``float16`` halves
+    memory and disk use, but every search converts the blocks it scores, so
+    it is several times slower than ``float32``. Ids, texts and
+    metadata are JSON records in a byte blob indexed by an offsets array, so
+    opening a store maps three files and parses nothing. Worker processes
+    opening the same directory share the pages through the OS page cache.
+
+    Writes are appended in memory and deletes are tombstoned until ``save``
+    compacts everything into a new file generation and swaps the manifest
+    atomically; processes still mapping the old generation keep working.
+    Unlike Chroma, nothing reaches disk until ``save`` is called:
+    ``BulkIngestor`` and ``IncrementalSync`` call it after every ingest and
+    delete, other writers must call it themselves. Without ``path`` the
+    store is purely in memory.
+    """
+
+    def __init__(self, embedding: Embeddings, path: Optional[str] = None, dtype: str = "float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}; use one of {sorted(DTYPES)}")
+        self._embedding = embedding
+        self.path = Path(path) if path else None
+        self.dtype = DTYPES[dtype]
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._blob: Any = b""
+        self._extra_vectors: List[np.ndarray] = []
+        self._extra_records: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._extra_block: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._deleted = 0
+        self._rows: Optional[Dict[str, int]] = None
+        self._metadatas: Optional[List[Dict[str, Any]]] = None
+        if self.path is not None and (self.path / MANIFEST).exists():
+            self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def dim(self) -> Optional[int]:
+        if self._matrix is not None and self._matrix.shape[1]:
+            return self._matrix.shape[1]
+        return self._extra_vectors[0].shape[0] if self._extra_vectors else None
+
+    @property
+    def _persisted(self) -> int:
+        return 0 if self._matrix is None else self._matrix.shape[0]
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def _files(self, generation: int) -> Tuple[Path, Path, Path]:
+        return (
+            self.path / f"vectors-{generation}.npy",
+            self.path / f"offsets-{generation}.npy",
+            self.path / f"records-{generation}.bin"
+        )
+
+    def _load(self) -> None:
+        manifest = json.loads((self.path / MANIFEST).read_text(encoding="utf-8"))
+        self._generation = manifest["generation"]
+        self.dtype = DTYPES[manifest["dtype"]]
+        vectors, offsets, records = self._files(self._generation)
+        self._matrix = np.load(vectors, mmap_mode="r")
+        self._offsets = np.load(offsets, mmap_mode="r")
+        self._blob = np.memmap(records, dtype=np.uint8, mode="r") if records.stat().st_size else b""
+        self._alive = np.ones(self._matrix.shape[0], dtype=bool)
+        self._deleted = 0
+
+    def _encoded(self, row: int) -> bytes:
+        if row >= self._persisted:
+            return json.dumps(self._extra_records[row - self._persisted], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return bytes(self._blob[int(self._offsets[row]):int(self._offsets[row + 1])])
+
+    def _record(self, row: int) -> Tuple[str, str, Dict[str, Any]]:
+        if row >= self._persisted:
+            return self._extra_records[row - self._persisted]
+        doc_id, text, metadata = json.loads(self._encoded(row))
+        return doc_id, text, metadata
+
+    def _row_index(self) -> Dict[str, int]:
+        """Row of every live id, decoded on the first write or delete."""
+        if self._rows is None:
+            self._rows = {
+                self._record(row)[0]: row for row in range(len(self._alive)) if self._alive[row]
+            }
+        return self._rows
+
+    def _metadata(self) -> List[Dict[str, Any]]:
+        """Metadata of every row, decoded on the first filtered search."""
+        if self._metadatas is None:
+            self._metadatas = [self._record(row)[2] for row in range(len(self._alive))]
+        return self._metadatas
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Add precomputed embeddings; an existing id is replaced."""
+        pairs = list(text_embeddings)
+        if not pairs:
+            return []
+        metadatas = metadatas or [{} for _ in pairs]
+        ids = [str(doc_id) for doc_id in ids] if ids else [str(uuid.uuid4()) for _ in pairs]
+        # The last occurrence of an id repeated within one call wins
+        keep = sorted({doc_id: i for i, doc_id in enumerate(ids)}.values())
+        if len(keep) < len(ids):
+            pairs, metadatas, ids = [pairs[i] for i in keep], [metadatas[i] for i in keep], [ids[i] for i in keep]
+        vectors = _normalized(np.asarray([vector for _, vector in pairs], dtype=np.float32)).astype(self.dtype)
+        with self._lock:
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+            rows = self._row_index()
+            self.delete([doc_id for doc_id in ids if doc_id in rows])
+            start = len(self._alive)
+            for offset, ((text, _), metadata, doc_id, vector) in enumerate(zip(pairs, metadatas, ids, vectors)):
+                self._extra_vectors.append(vector)
+                self._extra_records.append((doc_id, text, dict(metadata or {})))
+                rows[doc_id] = start + offset
+                if self._metadatas is not None:
+                    self._metadatas.append(dict(metadata or {}))
+            self._alive = np.concatenate([self._alive, np.ones(len(pairs), dtype=bool)])
+            self._extra_block = None
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts) if texts else []
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            rows = self._row_index()
+            for doc_id in ids or []:
+                row = rows.pop(str(doc_id), None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._deleted += 1
+        return True
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """``(first_row, vectors)`` blocks over the mapped matrix and the unsaved rows."""
+        rows = max(1, BLOCK_ELEMENTS // (self.dim or 1))
+        for start in range(0, self._persisted, rows):
+            yield start, self._matrix[start:start + rows]
+        if self._extra_vectors:
+            if self._extra_block is None:
+                self._extra_block = np.stack(self._extra_vectors)
+            yield self._persisted, self._extra_block
+
+    def _search(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Rows and cosine distances of the ``k`` nearest live rows for each query vector."""
+        with self._lock:
+            if self.dim is None or not embeddings or k <= 0:
+                return [[] for _ in embeddings]
+            queries = _normalized(np.asarray(embeddings, dtype=np.float32))
+            # Without deletes or a filter every row is a candidate
+            mask = self._alive if self._deleted else None
+            if filter:
+                mask = self._alive
+                metadata = self._metadata()
+                mask = mask & np.fromiter((matches_where(item, filter) for item in metadata), dtype=bool, count=len(metadata))
+            best_scores = np.empty((len(queries), 0), dtype=np.float32)
+            best_rows = np.empty((len(queries), 0), dtype=np.int64)
+            for start, block in self._blocks():
+                scores = queries @ np.asarray(block, dtype=np.float32).T
+                if mask is not None:
+                    scores[:, ~mask[start:start + len(block)]] = -np.inf
+                rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+                if scores.shape[1] > k:
+                    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores = np.take_along_axis(scores, keep, axis=1)
+                    rows = np.take_along_axis(rows, keep, axis=1)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, rows], axis=1)
+                if best_scores.shape[1] > k:
+                    keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                    best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append([
+                (int(rows[i]), float(1.0 - scores[i])) for i in order if np.isfinite(scores[i])
+            ])
+        return results
+
+    def _document(self, row: int) -> Document:
+        doc_id, text, metadata = self._record(row)
+        return Document(id=doc_id, page_content=text, metadata=dict(metadata))
+
+    def search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[ScoredDocument]]:
+        """One ``(document, cosine distance)`` list per query vector, scored in a single pass."""
+        return [
+            [(self._document(row), distance) for row, distance in hits]
+            for hits in self._search(embeddings, k, filter)
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[ScoredDocument]:
+        return self.search_by_vectors([self._embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        with self._lock:
+            rows = self._row_index()
+            return [self._document(rows[doc_id]) for doc_id in ids if doc_id in rows]
+
+    def save(self) -> None:
+        """Compact live rows into a new file generation and switch the manifest to it."""
+        if self.path is None:
+            raise ValueError("MmapVectorStore has no path to save to")
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            live = np.flatnonzero(self._alive)
+            generation = self._generation + 1
+            vectors_path, offsets_path, records_path = self._files(generation)
+            matrix = np.lib.format.open_memmap(
+                vectors_path, mode="w+", dtype=self.dtype, shape=(len(live), self.dim or 0)
+            )
+            persisted = live[live < self._persisted]
+            block = max(1, BLOCK_ELEMENTS // (self.dim or 1))
+            for start in range(0, len(persisted), block):
+                chunk = persisted[start:start + block]
+                matrix[start:start + len(chunk)] = self._matrix[chunk]
+            if len(persisted) < len(live):
+                matrix[len(persisted):] = np.stack([self._extra_vectors[row - self._persisted] for row in live[len(persisted):]])
+            offsets = np.zeros(len(live) + 1, dtype=np.int64)
+            with records_path.open("wb") as records:
+                for position, row in enumerate(live):
+                    # Persisted records are copied without decoding
+                    encoded = self._encoded(row)
+                    records.write(encoded)
+                    offsets[position + 1] = offsets[position] + len(encoded)
+            matrix.flush()
+            del matrix
+            np.save(offsets_path, offsets)
+
+            tmp_path = self.path / f"{MANIFEST}.tmp"
+            tmp_path.write_text(
+                json.dumps({"generation": generation, "dtype": np.dtype(self.dtype).name, "count": len(live)}),
+                encoding="utf-8"
+            )
+            os.replace(tmp_path, self.path / MANIFEST)
+
+            previous = self._generation
+            self._extra_vectors, self._extra_records, self._extra_block = [], [], None
+            self._rows, self._metadatas = None, None
+            self._load()
+            if previous:
+                for stale in self._files(previous):
+                    stale.unlink(missing_ok=True)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        path: Optional[str] = None,
+        dtype: str = "float32",
+        **kwargs: Any
+    ) -> "MmapVectorStore":
+        store = cls(embedding, path=path, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if path is not None:
+            store.save()
+        return store
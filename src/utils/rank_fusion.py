@@ -0,0 +1,90 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import numpy as np
+
+DEFAULT_RRF_K = 60
+
+
+def document_key(doc: Any) -> str:
+    """Return a stable key identifying a retrieved document.
+
+    Documents carrying a non-empty ``id`` in their metadata are keyed by it.
+    Anything else is keyed by a hash of its content and metadata, so the same
+    credential returned by different searches always collapses to one entry.
+    """
+    metadata = getattr(doc, "metadata", None) or {}
+    doc_id = metadata.get("id")
+    if doc_id:
+        return str(doc_id)
+
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(getattr(doc, "page_content", str(doc)).encode("utf-8"))
+    for key in sorted(metadata):
+        hasher.update(f"\x1f{key}\x1e{metadata[key]}".encode("utf-8"))
+    return "hash:" + hasher.hexdigest()
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[Sequence[Any]],
+    k: int = DEFAULT_RRF_K,
+    weights: Optional[Sequence[float]] = None,
+    top_n: Optional[int] = None
+) -> List[Tuple[Any, float]]:
+    """Fuse ranked result lists with Reciprocal Rank Fusion.
+
+    Each document scores ``sum(weight_i / (k + rank_i))`` over the lists it
+    appears in, where ``rank_i`` is its 1-based position in list ``i``. List
+    items may be documents or ``(document, score)`` pairs. Ties keep the order
+    in which documents were first seen.
+
+    Returns ``(document, fused_score)`` pairs, best first.
+    """
+    if k < 0:
+        raise ValueError("RRF constant k must be non-negative")
+    if weights is not None and len(weights) != len(result_lists):
+        raise ValueError(
+            f"Expected {len(result_lists)} weights, got {len(weights)}"
+        )
+
+    key_positions: Dict[str, int] = {}
+    documents: List[Any] = []
+    doc_indices: List[int] = []
+    ranks: List[int] = []
+    list_indices: List[int] = []
+
+    # The same document object often appears in several lists; hash it once
+    keys_by_object: Dict[int, str] = {}
+
+    for list_index, result_list in enumerate(result_lists):
+        for rank, item in enumerate(result_list, 1):
+            doc = item[0] if isinstance(item, tuple) else item
+            key = keys_by_object.get(id(doc))
+            if key is None:
+                key = keys_by_object[id(doc)] = document_key(doc)
+            position = key_positions.get(key)
+            if position is None:
+                position = key_positions[key] = len(documents)
+                documents.append(doc)
+            doc_indices.append(position)
+            ranks.append(rank)
+            list_indices.append(list_index)
+
+    if not documents:
+        return []
+
+    list_weights = (
+        np.ones(len(result_lists))
+        if weights is None
+        else np.asarray(weights, dtype=np.float64)
+    )
+    contributions = list_weights[np.asarray(list_indices)] / (k + np.asarray(ranks, dtype=np.float64))
+    scores = np.bincount(
+        np.asarray(doc_indices),
+        weights=contributions,
+        minlength=len(documents)
+    )
+
+    order = np.argsort(-scores, kind="stable")
+    if top_n is not None:
+        order = order[:top_n]
+    return [(documents[i], float(scores[i])) for i in order]
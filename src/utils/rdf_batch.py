@@ -0,0 +1,270 @@
+"""Batch conversion of RDF credential files to text.
+
+A whole Turtle / N-Triples / N-Quads file is parsed once, its triples are
+grouped by subject in a single pass and every credential is rendered from
+those groups. N-Triples and N-Quads can also be streamed line by line
+without building an rdflib ``Graph``.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import re
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.namespace import RDF
+
+CREDENTIAL_TYPE = "VerifiableCredential"
+
+# Prefixes used for compaction in addition to those declared by a parsed file
+DEFAULT_PREFIXES = {
+    "cred": "https://www.w3.org/2018/credentials#",
+    "sec": "https://w3id.org/security#",
+    "schema": "http://schema.org/",
+    "schemas": "https://schema.org/",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "dc": "http://purl.org/dc/terms/",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+}
+
+# Predicate local names mapped to process_vc_data metadata fields
+METADATA_PREDICATES = {
+    "issuer": "issuer",
+    "issuanceDate": "issuanceDate",
+    "validFrom": "issuanceDate",
+    "expirationDate": "expirationDate",
+    "validUntil": "expirationDate",
+}
+
+MAX_NESTING_DEPTH = 4
+
+Triple = Tuple[Any, Any, Any]
+
+
+def local_name(term: Any) -> str:
+    """Last path or fragment segment of an IRI."""
+    value = str(term)
+    return re.split(r"[#/:]", value.rstrip("/#"))[-1] or value
+
+
+class PrefixCompactor:
+    """Rewrites IRIs as ``prefix:local`` using the longest matching namespace."""
+
+    def __init__(self, prefixes: Optional[Dict[str, str]] = None):
+        merged = dict(DEFAULT_PREFIXES)
+        merged.update(prefixes or {})
+        self._namespaces = sorted(
+            ((namespace, prefix) for prefix, namespace in merged.items() if prefix and namespace),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        self._memo: Dict[str, str] = {}
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "PrefixCompactor":
+        return cls({prefix: str(namespace) for prefix, namespace in graph.namespaces()})
+
+    def compact(self, iri: str) -> str:
+        compacted = self._memo.get(iri)
+        if compacted is None:
+            compacted = iri
+            for namespace, prefix in self._namespaces:
+                if iri.startswith(namespace) and len(iri) > len(namespace):
+                    compacted = f"{prefix}:{iri[len(namespace):]}"
+                    break
+            self._memo[iri] = compacted
+        return compacted
+
+    def term(self, term: Any) -> str:
+        if isinstance(term, URIRef):
+            return self.compact(str(term))
+        return str(term)
+
+    def vocabulary_term(self, term: Any) -> str:
+        """Compact a predicate or class IRI, falling back to its local name."""
+        compacted = self.term(term)
+        if compacted == str(term) and isinstance(term, URIRef):
+            return local_name(term)
+        return compacted
+
+
+def group_by_subject(triples: Iterable[Triple]) -> Dict[Any, List[Tuple[Any, Any]]]:
+    """Group triples by subject in one pass, preserving input order."""
+    grouped: Dict[Any, List[Tuple[Any, Any]]] = {}
+    for subject, predicate, obj in triples:
+        properties = grouped.get(subject)
+        if properties is None:
+            properties = grouped[subject] = []
+        properties.append((predicate, obj))
+    return grouped
+
+
+def credential_subjects(grouped: Dict[Any, List[Tuple[Any, Any]]]) -> List[Any]:
+    """Subjects typed as VerifiableCredential, or every root subject if there are none, sorted."""
+    credentials = [
+        subject for subject, properties in grouped.items()
+        if any(p == RDF.type and local_name(o) == CREDENTIAL_TYPE for p, o in properties)
+    ]
+    if not credentials:
+        referenced = {obj for properties in grouped.values() for _, obj in properties}
+        credentials = [subject for subject in grouped if subject not in referenced] or list(grouped)
+    return sorted(credentials, key=str)
+
+
+def render_subject(
+    subject: Any,
+    grouped: Dict[Any, List[Tuple[Any, Any]]],
+    compactor: PrefixCompactor,
+    roots: Set[Any]
+) -> str:
+    """Render one subject and the nodes it references as indented text.
+
+    Type lines come first, then the remaining properties by predicate. Blank
+    nodes and IRIs described in the same file are nested under the property
+    that references them, unless they are credentials of their own.
+    """
+    lines: List[str] = []
+
+    def render(node: Any, indent: str, depth: int, visiting: Set[Any]) -> None:
+        # Sorted so the text (and its content hash) does not depend on parse order
+        properties = sorted(grouped.get(node, ()), key=lambda item: (str(item[0]), str(item[1])))
+        other = []
+        for predicate, obj in properties:
+            if predicate == RDF.type:
+                lines.append(f"{indent}Type: {compactor.vocabulary_term(obj)}")
+            else:
+                other.append((predicate, obj))
+        for predicate, obj in other:
+            label = compactor.vocabulary_term(predicate)
+            nested = (
+                obj in grouped
+                and obj not in roots
+                and obj not in visiting
+                and depth < MAX_NESTING_DEPTH
+            )
+            if not nested:
+                lines.append(f"{indent}{label}: {compactor.term(obj)}")
+            elif isinstance(obj, BNode):
+                lines.append(f"{indent}{label}:")
+                render(obj, indent + "  ", depth + 1, visiting | {obj})
+            else:
+                lines.append(f"{indent}{label}: {compactor.term(obj)}")
+                render(obj, indent + "  ", depth + 1, visiting | {obj})
+
+    render(subject, "", 0, {subject})
+    return "\n".join(lines)
+
+
+def credential_metadata(subject: Any, grouped: Dict[Any, List[Tuple[Any, Any]]]) -> Dict[str, Any]:
+    """Extract the fields ``process_vc_data`` turns into metadata."""
+    metadata: Dict[str, Any] = {
+        "id": "" if isinstance(subject, BNode) else str(subject),
+        "type": [],
+    }
+    for predicate, obj in sorted(grouped.get(subject, ()), key=lambda item: (str(item[0]), str(item[1]))):
+        if predicate == RDF.type:
+            metadata["type"].append(local_name(obj))
+            continue
+        field = METADATA_PREDICATES.get(local_name(predicate))
+        if field is not None and field not in metadata:
+            metadata[field] = str(obj)
+    return metadata
+
+
+def graph_to_text(graph: Graph) -> str:
+    """Render every root subject of a graph, for single-credential documents."""
+    grouped = group_by_subject(graph)
+    compactor = PrefixCompactor.from_graph(graph)
+    roots = credential_subjects(grouped)
+    return "\n".join(render_subject(subject, grouped, compactor, set(roots)) for subject in roots)
+
+
+def records_from_triples(
+    triples: Iterable[Triple],
+    compactor: Optional[PrefixCompactor] = None
+) -> Iterator[Dict[str, Any]]:
+    """Split triples into one ``process_vc_data`` record per credential subject.
+
+    Records carry the rendered ``text`` and the metadata fields, so no RDF
+    needs to be parsed again downstream.
+    """
+    grouped = group_by_subject(triples)
+    compactor = compactor or PrefixCompactor()
+    roots = credential_subjects(grouped)
+    root_set = set(roots)
+    for subject in roots:
+        record = credential_metadata(subject, grouped)
+        record["text"] = render_subject(subject, grouped, compactor, root_set)
+        yield record
+
+
+_TERM = r'(<[^>]*>|_:[A-Za-z0-9_\-.]+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9\-]+|\^\^<[^>]*>)?)'
+_STATEMENT = re.compile(
+    r"^\s*" + _TERM + r"\s+" + _TERM + r"\s+" + _TERM + r"(?:\s+" + _TERM + r")?\s*\.\s*$"
+)
+_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[tbnrf"\'\\])')
+_SIMPLE_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(value: str) -> str:
+    def replace(match: "re.Match") -> str:
+        escape = match.group(1)
+        if escape[0] in "uU":
+            return chr(int(escape[1:], 16))
+        return _SIMPLE_ESCAPES[escape]
+    return _ESCAPE.sub(replace, value) if "\\" in value else value
+
+
+def _parse_term(token: str) -> Any:
+    if token.startswith("<"):
+        return URIRef(token[1:-1])
+    if token.startswith("_:"):
+        return BNode(token[2:])
+    end = token.rindex('"')
+    value = _unescape(token[1:end])
+    suffix = token[end + 1:]
+    if suffix.startswith("@"):
+        return Literal(value, lang=suffix[1:])
+    # Keep typed literals lexical; rendering only needs their text
+    return Literal(value)
+
+
+def iter_ntriples(lines: Iterable[str]) -> Iterator[Triple]:
+    """Parse N-Triples or N-Quads lines without building a Graph; graph labels are dropped."""
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        match = _STATEMENT.match(stripped)
+        if match is None:
+            raise ValueError(f"Invalid N-Triples statement on line {number}: {stripped[:80]}")
+        subject, predicate, obj = match.group(1), match.group(2), match.group(3)
+        yield _parse_term(subject), _parse_term(predicate), _parse_term(obj)
+
+
+def iter_rdf_records(path: str, format: Optional[str] = None, stream: Optional[bool] = None) -> Iterator[Dict[str, Any]]:
+    """Read every credential from an RDF file with a single parse.
+
+    ``format`` defaults from the file extension. N-Triples and N-Quads are
+    streamed line by line unless ``stream`` is False; Turtle is parsed into
+    one Graph for the whole file.
+    """
+    if format is None:
+        format = {"ttl": "turtle", "nt": "nt", "nq": "nquads"}.get(path.rsplit(".", 1)[-1].lower(), "turtle")
+    if stream is None:
+        stream = format in ("nt", "nquads")
+
+    if stream:
+        with open(path, encoding="utf-8") as handle:
+            yield from records_from_triples(iter_ntriples(handle))
+        return
+
+    if format == "nquads":
+        from rdflib import Dataset
+        graph = Dataset()
+        graph.parse(path, format=format)
+        triples = ((s, p, o) for s, p, o, _ in graph.quads((None, None, None, None)))
+    else:
+        graph = Graph()
+        graph.parse(path, format=format)
+        triples = iter(graph)
+    yield from records_from_triples(triples, PrefixCompactor.from_graph(graph))
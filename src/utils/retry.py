@@ -0,0 +1,62 @@
+from typing import Any, Callable, Optional, TypeVar
+import random
+import time
+
+T = TypeVar("T")
+
+# openai / httpx exception names worth retrying
+RETRYABLE_ERRORS = frozenset({
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "ServiceUnavailableError", "TimeoutException", "ConnectError",
+})
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM call failed on a rate limit or a transient server or network error."""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    status = _status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from a ``Retry-After`` header."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_backoff(
+    function: Callable[[], T],
+    max_retries: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    sleep: Callable[[float], Any] = time.sleep
+) -> T:
+    """Call ``function``, retrying retryable errors with exponential backoff and full jitter.
+
+    A server-provided ``Retry-After`` takes precedence over the computed
+    delay. Non-retryable errors and the last failure are raised.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return function()
+        except Exception as error:
+            if attempt == max_retries or not is_retryable(error):
+                raise
+            delay = retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            sleep(min(delay, max_delay))
+    raise AssertionError("unreachable")
@@ -0,0 +1,354 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import copy
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+from models.cache import SemanticCacheConfig
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for exact-match lookups."""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s:/.-]", " ", question.lower())).strip()
+
+
+@dataclass
+class CacheEntry:
+    """A cached answer together with the question embedding it was stored under."""
+    key: str
+    question: str
+    embedding: np.ndarray
+    answer: Dict[str, Any]
+    doc_ids: Tuple[str, ...]
+    created_at: float
+    last_access: float
+    size_bytes: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.size_bytes = (
+            self.embedding.nbytes
+            + len(self.question)
+            + len(json.dumps(self.answer, default=str))
+            + sum(len(doc_id) for doc_id in self.doc_ids)
+        )
+
+
+class InMemoryCacheBackend:
+    """Cache backend that keeps entries only in the current process."""
+
+    def load(self) -> List[CacheEntry]:
+        return []
+
+    def put(self, entry: CacheEntry) -> None:
+        pass
+
+    def touch(self, key: str, last_access: float) -> None:
+        pass
+
+    def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class SQLiteCacheBackend:
+    """Cache backend persisting entries to a SQLite file so they survive restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS semantic_cache (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                doc_ids TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def load(self) -> List[CacheEntry]:
+        rows = self._conn.execute(
+            "SELECT key, question, embedding, answer, doc_ids, created_at, last_access "
+            "FROM semantic_cache ORDER BY last_access"
+        ).fetchall()
+        return [
+            CacheEntry(
+                key=key,
+                question=question,
+                embedding=np.frombuffer(embedding, dtype=np.float32).copy(),
+                answer=json.loads(answer),
+                doc_ids=tuple(json.loads(doc_ids)),
+                created_at=created_at,
+                last_access=last_access
+            )
+            for key, question, embedding, answer, doc_ids, created_at, last_access in rows
+        ]
+
+    def put(self, entry: CacheEntry) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.key,
+                entry.question,
+                entry.embedding.astype(np.float32).tobytes(),
+                json.dumps(entry.answer, default=str),
+                json.dumps(list(entry.doc_ids)),
+                entry.created_at,
+                entry.last_access
+            )
+        )
+        self._conn.commit()
+
+    def touch(self, key: str, last_access: float) -> None:
+        self._conn.execute(
+            "UPDATE semantic_cache SET last_access = ? WHERE key = ?",
+            (last_access, key)
+        )
+        self._conn.commit()
+
+    def delete(self, keys: Iterable[str]) -> None:
+        self._conn.executemany(
+            "DELETE FROM semantic_cache WHERE key = ?",
+            [(key,) for key in keys]
+        )
+        self._conn.commit()
+
+    def clear(self) -> None:
+        self._conn.execute("DELETE FROM semantic_cache")
+        self._conn.commit()
+
+
+class SemanticCache:
+    """Answer cache keyed by question embedding.
+
+    A lookup first tries an exact match on the normalized question, which
+    costs no embedding call, then falls back to the most similar cached
+    question above ``similarity_threshold``. Entries are evicted by LRU order,
+    TTL and an approximate memory bound, and are invalidated when any
+    credential they were answered from is re-ingested.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        config: Optional[SemanticCacheConfig] = None,
+        backend: Optional[Any] = None
+    ):
+        self.embeddings = embeddings
+        self.config = config or SemanticCacheConfig()
+        self.backend = backend or InMemoryCacheBackend()
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._keys_by_doc: Dict[str, set] = {}
+        self._total_bytes = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        # Embeddings computed on a miss, reused when the answer is stored
+        self._pending_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        for entry in self.backend.load():
+            self._add_entry(entry)
+        self._enforce_bounds()
+
+    @staticmethod
+    def _entry_key(question: str) -> str:
+        return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize_vector(embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remember_embedding(self, question: str, embedding: np.ndarray) -> None:
+        self._pending_embeddings[question] = embedding
+        self._pending_embeddings.move_to_end(question)
+        while len(self._pending_embeddings) > 64:
+            self._pending_embeddings.popitem(last=False)
+
+    def embed(self, question: str) -> np.ndarray:
+        """Embed a question with the cache's embedding function."""
+        with self._lock:
+            embedding = self._pending_embeddings.get(question)
+        if embedding is None:
+            embedding = self._normalize_vector(self.embeddings.embed_query(question))
+            with self._lock:
+                self._remember_embedding(question, embedding)
+        return embedding
+
+    async def aembed(self, question: str) -> np.ndarray:
+        """Asynchronously embed a question with the cache's embedding function."""
+        with self._lock:
+            embedding = self._pending_embeddings.get(question)
+        if embedding is None:
+            embedding = self._normalize_vector(await self.embeddings.aembed_query(question))
+            with self._lock:
+                self._remember_embedding(question, embedding)
+        return embedding
+
+    def _add_entry(self, entry: CacheEntry) -> None:
+        if entry.key in self._entries:
+            self._remove_entry(entry.key)
+        self._entries[entry.key] = entry
+        self._total_bytes += entry.size_bytes
+        for doc_id in entry.doc_ids:
+            self._keys_by_doc.setdefault(doc_id, set()).add(entry.key)
+        self._matrix = None
+
+    def _remove_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._total_bytes -= entry.size_bytes
+        for doc_id in entry.doc_ids:
+            keys = self._keys_by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_doc[doc_id]
+        self._matrix = None
+        return entry
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        ttl = self.config.ttl_seconds
+        return ttl is not None and now - entry.created_at > ttl
+
+    def _enforce_bounds(self) -> None:
+        evicted = []
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if self._is_expired(entry, now)]:
+            self._remove_entry(key)
+            evicted.append(key)
+        while self._entries and (
+            len(self._entries) > self.config.max_entries
+            or self._total_bytes > self.config.max_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove_entry(key)
+            evicted.append(key)
+        if evicted:
+            self.evictions += len(evicted)
+            self.backend.delete(evicted)
+
+    def _similarity_matrix(self) -> Tuple[Optional[np.ndarray], List[str]]:
+        if self._matrix is None and self._entries:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.vstack([self._entries[key].embedding for key in self._matrix_keys])
+        return self._matrix, self._matrix_keys
+
+    def _hit(self, entry: CacheEntry, now: float) -> Dict[str, Any]:
+        entry.last_access = now
+        self._entries.move_to_end(entry.key)
+        self.backend.touch(entry.key, now)
+        self.hits += 1
+        return copy.deepcopy(entry.answer)
+
+    def lookup(self, question: str, embedding: Optional[np.ndarray] = None) -> Optional[Dict[str, Any]]:
+        """Return a cached answer for the question, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(self._entry_key(question))
+            if entry is not None and not self._is_expired(entry, now):
+                return self._hit(entry, now)
+
+        if embedding is None:
+            embedding = self.embed(question)
+
+        with self._lock:
+            self._enforce_bounds()
+            matrix, keys = self._similarity_matrix()
+            if matrix is not None:
+                similarities = matrix @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.config.similarity_threshold:
+                    return self._hit(self._entries[keys[best]], now)
+            self.misses += 1
+            return None
+
+    async def alookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Asynchronous variant of ``lookup``."""
+        with self._lock:
+            entry = self._entries.get(self._entry_key(question))
+            if entry is not None and not self._is_expired(entry, time.time()):
+                return self._hit(entry, time.time())
+        return self.lookup(question, embedding=await self.aembed(question))
+
+    def store(
+        self,
+        question: str,
+        answer: Dict[str, Any],
+        doc_ids: Iterable[str] = (),
+        embedding: Optional[np.ndarray] = None
+    ) -> None:
+        """Cache an answer and the ids of the documents it was generated from."""
+        if embedding is None:
+            embedding = self.embed(question)
+        now = time.time()
+        entry = CacheEntry(
+            key=self._entry_key(question),
+            question=question,
+            embedding=self._normalize_vector(embedding),
+            answer=copy.deepcopy(answer),
+            doc_ids=tuple(dict.fromkeys(str(doc_id) for doc_id in doc_ids)),
+            created_at=now,
+            last_access=now
+        )
+        with self._lock:
+            self._pending_embeddings.pop(question, None)
+            self._add_entry(entry)
+            self.backend.put(entry)
+            self._enforce_bounds()
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Drop every entry that depends on any of the given document ids."""
+        with self._lock:
+            keys = set()
+            for doc_id in doc_ids:
+                keys.update(self._keys_by_doc.get(str(doc_id), ()))
+            for key in keys:
+                self._remove_entry(key)
+            if keys:
+                self.backend.delete(keys)
+                self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_doc.clear()
+            self._total_bytes = 0
+            self._matrix = None
+            self.backend.clear()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
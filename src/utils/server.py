@@ -0,0 +1,542 @@
+"""Asyncio HTTP server for the Verifiable Credentials RAG systems.
+
+Usage (from ``src/``):
+
+    python -m utils.server --persist-directory ./data/chroma_db --port 8080
+
+Endpoints take and return JSON; streams are server-sent events whose
+``data`` lines are the systems' stream events:
+
+    GET  /health          load and coalescing counters
+    POST /answer          {"question": ...}                      answer dict
+    POST /answer/stream   {"question": ...}                      event stream
+    POST /conversation    {"question": ..., "session_id": ..., "stream": false}
+    POST /ingest          {"records": [...]}                     ingestion stats
+
+A conversation request without ``session_id`` starts a new session; its id
+is returned in the answer as ``session_id`` so the client can continue it.
+
+Concurrent requests for the same question share one pipeline execution
+(single-flight). Every stage runs at most ``stage_limits`` executions at
+once, at most ``max_pending`` requests are admitted and the rest are
+refused with 429. ``stop`` stops accepting connections, lets admitted
+requests finish for up to ``shutdown_timeout`` and then cancels them.
+Only the standard library is used.
+"""
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import signal
+import uuid
+import weakref
+
+from models.server import ServerConfig
+from utils.semantic_cache import normalize_question
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+    429: "Too Many Requests", 431: "Request Header Fields Too Large", 500: "Internal Server Error",
+    501: "Not Implemented", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Error answered with ``status`` and a JSON ``{"error": message}`` body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    version: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return payload
+
+
+class _Broadcast:
+    """Events of one streamed execution, replayed in full to every subscriber."""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.events) or self.done)
+                events = self.events[index:]
+            index += len(events)
+            for event in events:
+                yield event
+            if not events:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """Runs one execution per key at a time and shares it with every concurrent caller."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._streams: Dict[Hashable, Tuple[_Broadcast, "asyncio.Task[None]"]] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._streams)
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of ``function()``, or of the execution already running for ``key``."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._forget(self._calls, key, done))
+        else:
+            self.shared += 1
+        # One caller going away must not cancel the execution the others wait for
+        return await asyncio.shield(task)
+
+    def stream(self, key: Hashable, events: Callable[[], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Events of ``events()``, or of the stream already running for ``key``, from the start."""
+        entry = self._streams.get(key)
+        if entry is None:
+            broadcast = _Broadcast()
+            task = asyncio.ensure_future(self._produce(broadcast, events))
+            entry = self._streams[key] = (broadcast, task)
+            self.executions += 1
+            task.add_done_callback(lambda done: self._forget(self._streams, key, entry))
+        else:
+            self.shared += 1
+        return entry[0].subscribe()
+
+    @staticmethod
+    async def _produce(broadcast: _Broadcast, events: Callable[[], AsyncIterator[Dict[str, Any]]]) -> None:
+        try:
+            async for event in events():
+                await broadcast.publish(event)
+        except Exception as error:
+            await broadcast.finish(error)
+        else:
+            await broadcast.finish()
+
+    @staticmethod
+    def _forget(calls: Dict[Hashable, Any], key: Hashable, entry: Any) -> None:
+        if calls.get(key) is entry:
+            del calls[key]
+        if isinstance(entry, asyncio.Future) and not entry.cancelled():
+            # Mark a failure as retrieved even if every caller went away
+            entry.exception()
+
+    def cancel_all(self) -> None:
+        for task in list(self._calls.values()):
+            task.cancel()
+        for _, task in list(self._streams.values()):
+            task.cancel()
+
+
+class VCRAGServer:
+    """HTTP front end for a ``VCRAGSystem``, a ``ConversationalVCRAG`` and a ``BulkIngestor``.
+
+    Any of the three may be omitted; its endpoints then answer 404.
+    """
+
+    def __init__(
+        self,
+        system: Optional[Any] = None,
+        conversational: Optional[Any] = None,
+        ingestor: Optional[Any] = None,
+        config: Optional[ServerConfig] = None
+    ):
+        self.system = system
+        self.conversational = conversational
+        self.ingestor = ingestor
+        self.config = config or ServerConfig()
+        self.flights = SingleFlight()
+        self.port: Optional[int] = None
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0}
+        self._routes: Dict[Tuple[str, str], Callable[[Request], Awaitable[Any]]] = {
+            ("GET", "/health"): self._health,
+            ("POST", "/answer"): self._answer,
+            ("POST", "/answer/stream"): self._answer_stream,
+            ("POST", "/conversation"): self._conversation,
+            ("POST", "/ingest"): self._ingest,
+        }
+        self._stage_limits = dict(self.config.stage_limits)
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self._stage_limits.items()}
+        self._active = {stage: 0 for stage in self._stage_limits}
+        self._session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._connections: Dict["asyncio.Task[None]", bool] = {}
+        self._pending = 0
+        self._draining = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    async def start(self) -> "VCRAGServer":
+        """Start listening; ``port`` holds the bound port afterwards."""
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.config.host, self.config.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        """Serve until ``stop`` is called, e.g. from a signal handler."""
+        if self._server is None:
+            await self.start()
+        await self._stopped.wait()
+
+    async def stop(self) -> None:
+        """Stop accepting, let admitted requests finish, then cancel what is left."""
+        if self._server is None or self._draining:
+            return
+        self._draining = True
+        self._server.close()
+        # Idle keep-alive connections have nothing to finish
+        for task, busy in list(self._connections.items()):
+            if not busy:
+                task.cancel()
+        busy_tasks = [task for task, busy in self._connections.items() if busy]
+        if busy_tasks:
+            _, unfinished = await asyncio.wait(busy_tasks, timeout=self.config.shutdown_timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        self.flights.cancel_all()
+        await self._server.wait_closed()
+        self._stopped.set()
+
+    @asynccontextmanager
+    async def _stage(self, stage: str):
+        """Hold one of the stage's concurrency slots."""
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            self._active[stage] += 1
+            try:
+                yield
+            finally:
+                self._active[stage] -= 1
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections[task] = False
+        try:
+            while not self._draining:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.config.read_timeout)
+                except HTTPError as error:
+                    await self._send_json(writer, error.status, {"error": error.message}, keep_alive=False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                self._connections[task] = True
+                keep_alive = await self._respond(request, writer)
+                self._connections[task] = False
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+            with suppress(Exception):
+                await writer.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Parse one request, or return None when the client closed an idle connection."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if not error.partial.strip():
+                return None
+            raise HTTPError(400, "Incomplete request")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HTTPError(501, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > self.config.max_body_bytes:
+            raise HTTPError(413, f"Body exceeds {self.config.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return Request(method.upper(), target.split("?", 1)[0], version.strip(), headers, body)
+
+    async def _respond(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Handle one request; returns whether the connection stays open."""
+        keep_alive = request.keep_alive and not self._draining
+        admitted = False
+        try:
+            handler = self._routes.get((request.method, request.path))
+            if handler is None:
+                if any(path == request.path for _, path in self._routes):
+                    raise HTTPError(405, f"{request.method} not allowed on {request.path}")
+                raise HTTPError(404, f"No endpoint {request.path}")
+            if handler != self._health:
+                if self._draining:
+                    raise HTTPError(503, "Server is shutting down")
+                if self._pending >= self.config.max_pending:
+                    self.stats["rejected"] += 1
+                    raise HTTPError(429, "Too many requests in flight", {"Retry-After": "1"})
+                self._pending += 1
+                admitted = True
+                self.stats["requests"] += 1
+            result = await handler(request)
+            if isinstance(result, dict):
+                await self._send_json(writer, 200, result, keep_alive)
+                return keep_alive
+            await self._send_events(writer, result)
+            return False
+        except HTTPError as error:
+            await self._send_json(writer, error.status, {"error": error.message}, keep_alive, error.headers)
+            return keep_alive
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as error:
+            self.stats["errors"] += 1
+            await self._send_json(writer, 500, {"error": f"{type(error).__name__}: {error}"}, keep_alive=False)
+            return False
+        finally:
+            if admitted:
+                self._pending -= 1
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, Any]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict[str, Any],
+        keep_alive: bool,
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload, default=str).encode("utf-8")
+        writer.write(self._head(status, {
+            "Content-Type": "application/json",
+            "Content-Length": len(body),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(headers or {})
+        }) + body)
+        await writer.drain()
+
+    async def _send_events(self, writer: asyncio.StreamWriter, events: AsyncIterator[Dict[str, Any]]) -> None:
+        """Write a server-sent event stream; the connection closes at its end."""
+        writer.write(self._head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Connection": "close"
+        }))
+        try:
+            async for event in events:
+                writer.write(f"data: {json.dumps(event, default=str)}\n\n".encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as error:
+            # Headers are gone already, so the failure becomes the last event
+            self.stats["errors"] += 1
+            error_event = {"type": "error", "error": f"{type(error).__name__}: {error}"}
+            writer.write(f"data: {json.dumps(error_event)}\n\n".encode("utf-8"))
+            await writer.drain()
+
+    @staticmethod
+    def _question(payload: Dict[str, Any]) -> str:
+        question = payload.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise HTTPError(400, "A non-empty \"question\" is required")
+        return question
+
+    def _require(self, component: Optional[Any], name: str) -> Any:
+        if component is None:
+            raise HTTPError(404, f"No {name} is configured")
+        return component
+
+    async def _health(self, request: Request) -> Dict[str, Any]:
+        return {
+            "status": "draining" if self._draining else "ok",
+            "pending": self._pending,
+            "max_pending": self.config.max_pending,
+            "stages": {
+                stage: {"active": self._active[stage], "limit": limit}
+                for stage, limit in self._stage_limits.items()
+            },
+            "in_flight": len(self.flights),
+            "executions": self.flights.executions,
+            "coalesced": self.flights.shared,
+            **self.stats
+        }
+
+    async def _answer(self, request: Request) -> Dict[str, Any]:
+        system = self._require(self.system, "answer system")
+        question = self._question(request.json())
+
+        async def run() -> Dict[str, Any]:
+            async with self._stage("answer"):
+                return await system.aanswer(question)
+
+        return await self.flights.do(("answer", normalize_question(question)), run)
+
+    async def _answer_stream(self, request: Request) -> AsyncIterator[Dict[str, Any]]:
+        system = self._require(self.system, "answer system")
+        question = self._question(request.json())
+
+        async def events() -> AsyncIterator[Dict[str, Any]]:
+            async with self._stage("stream"):
+                async for event in system.aanswer_stream(question):
+                    yield event
+
+        return self.flights.stream(("stream", normalize_question(question)), events)
+
+    async def _conversation(self, request: Request) -> Any:
+        conversational = self._require(self.conversational, "conversational system")
+        payload = request.json()
+        question = self._question(payload)
+        session_id = payload.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, "\"session_id\" must be a string")
+        # Anonymous clients must not share the system's default session and its history
+        session_id = session_id or uuid.uuid4().hex
+
+        # Turns depend on the session's history, so they are serialized per session, never coalesced
+        async def events() -> AsyncIterator[Dict[str, Any]]:
+            lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+            async with lock, self._stage("conversation"):
+                async for event in conversational.aprocess_query_stream(question, session_id=session_id):
+                    if event["type"] == "final":
+                        event = dict(event, result=dict(event["result"], session_id=session_id))
+                    yield event
+
+        if payload.get("stream"):
+            return events()
+        result: Dict[str, Any] = {}
+        async for event in events():
+            if event["type"] == "final":
+                result = event["result"]
+        return result
+
+    async def _ingest(self, request: Request) -> Dict[str, Any]:
+        ingestor = self._require(self.ingestor, "ingestor")
+        records = request.json().get("records")
+        if not isinstance(records, list):
+            raise HTTPError(400, "\"records\" must be a list of credentials")
+        async with self._stage("ingest"):
+            stats = await asyncio.get_running_loop().run_in_executor(None, ingestor.ingest, records)
+        return stats.as_dict()
+
+
+async def serve(server: VCRAGServer) -> None:
+    """Run ``server`` until SIGINT or SIGTERM, then shut it down gracefully."""
+    await server.start()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(signum, lambda: asyncio.ensure_future(server.stop()))
+    print(f"Serving on http://{server.config.host}:{server.port}", flush=True)
+    await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the Verifiable Credentials RAG systems over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--collection", default="vc_collection")
+    parser.add_argument("--persist-directory", default="./data/chroma_db")
+    parser.add_argument("--max-pending", type=int, default=128, help="Admitted requests before answering 429")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0, help="Seconds in-flight requests get on shutdown")
+    args = parser.parse_args(argv)
+
+    from langchain_community.vectorstores import Chroma
+    from chains.conversational_vc_rag import ConversationalVCRAG
+    from chains.vc_rag_system import VCRAGSystem
+    from models.router import RouterConfig
+    from utils.clients import default_registry
+    from utils.ingestion import BulkIngestor
+
+    vector_store = Chroma(
+        collection_name=args.collection,
+        embedding_function=default_registry().embeddings(),
+        persist_directory=args.persist_directory
+    )
+    server = VCRAGServer(
+        system=VCRAGSystem(vector_store=vector_store, router_config=RouterConfig()),
+        conversational=ConversationalVCRAG(vector_store=vector_store, router_config=RouterConfig()),
+        ingestor=BulkIngestor(vector_store, max_workers=0),
+        config=ServerConfig(
+            host=args.host,
+            port=args.port,
+            max_pending=args.max_pending,
+            shutdown_timeout=args.shutdown_timeout
+        )
+    )
+
+    async def run() -> None:
+        try:
+            await serve(server)
+        finally:
+            await default_registry().aclose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+from langchain_core.messages import BaseMessage, SystemMessage, messages_to_dict
+
+from models.memory import SessionMemoryConfig
+from utils.tokens import count_tokens
+from utils.working_set import WorkingSet
+
+DEFAULT_SESSION = "default"
+
+Summarizer = Callable[[str, str], str]
+AsyncSummarizer = Callable[[str, str], Awaitable[str]]
+
+
+class SessionMemory:
+    """Conversation memory for one session: recent turns verbatim plus a rolling summary.
+
+    Exposes ``chat_memory``, ``save_context`` and ``load_memory_variables``
+    like LangChain's buffer memories.
+    """
+
+    def __init__(self, session_id: str, memory_key: str = "chat_history"):
+        self.session_id = session_id
+        self.memory_key = memory_key
+        # Deferred: langchain_core.chat_history pulls in langsmith at import time
+        from langchain_core.chat_history import InMemoryChatMessageHistory
+
+        self.chat_memory = InMemoryChatMessageHistory()
+        self.summary = ""
+        self.last_documents: List[Any] = []
+        self.working_set: Optional[WorkingSet] = None
+        self.last_access = time.time()
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        self.chat_memory.add_user_message(inputs["question"])
+        self.chat_memory.add_ai_message(outputs["answer"])
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, List[BaseMessage]]:
+        messages = list(self.chat_memory.messages)
+        if self.summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {self.summary}"))
+        return {self.memory_key: messages}
+
+    def token_count(self) -> int:
+        return count_tokens(self.summary) + sum(count_tokens(m.content) for m in self.chat_memory.messages)
+
+    def clear(self) -> None:
+        self.chat_memory.clear()
+        self.summary = ""
+        self.last_documents = []
+
+
+class SQLiteSessionStore:
+    """Persists session summaries and recent turns to a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                messages TEXT NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def load(self, session_id: str, memory_key: str) -> Optional[SessionMemory]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, messages, last_access FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        from langchain_core.messages import messages_from_dict
+
+        memory = SessionMemory(session_id, memory_key)
+        memory.summary = row[0]
+        memory.chat_memory.add_messages(messages_from_dict(json.loads(row[1])))
+        return memory
+
+    def put(self, memory: SessionMemory) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (
+                    memory.session_id,
+                    memory.summary,
+                    json.dumps(messages_to_dict(memory.chat_memory.messages)),
+                    memory.last_access
+                )
+            )
+            self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+
+class SessionMemoryManager:
+    """Keys conversation memories by session id and keeps each within a token budget.
+
+    When a session exceeds ``window_turns`` or ``max_token_limit``, its oldest
+    turns are folded into a rolling summary by ``summarize(summary, new_lines)``.
+    Sessions idle longer than ``idle_ttl_seconds`` or beyond ``max_sessions``
+    (least recently used first) are evicted from memory; with ``store_path``
+    set, every turn is written through to SQLite and evicted sessions are
+    reloaded on their next request. ``on_evict`` is called with the id of
+    every session dropped from memory, by eviction or ``end``.
+    """
+
+    def __init__(
+        self,
+        config: SessionMemoryConfig,
+        summarize: Summarizer,
+        asummarize: Optional[AsyncSummarizer] = None,
+        memory_key: str = "chat_history",
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.config = config
+        self.summarize = summarize
+        self.asummarize = asummarize
+        self.memory_key = memory_key
+        self.on_evict = on_evict
+        self.store = SQLiteSessionStore(config.store_path) if config.store_path else None
+        self._sessions: "OrderedDict[str, SessionMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.summarizations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float) -> List[str]:
+        """Drop idle and least recently used sessions and return their ids."""
+        evicted: List[str] = []
+        ttl = self.config.idle_ttl_seconds
+        if ttl is not None:
+            evicted = [key for key, memory in self._sessions.items() if now - memory.last_access > ttl]
+            for key in evicted:
+                del self._sessions[key]
+        while len(self._sessions) > self.config.max_sessions:
+            evicted.append(self._sessions.popitem(last=False)[0])
+        self.evictions += len(evicted)
+        return evicted
+
+    def _notify_evicted(self, session_ids: List[str]) -> None:
+        if self.on_evict is not None:
+            for session_id in session_ids:
+                self.on_evict(session_id)
+
+    def get(self, session_id: Optional[str] = None) -> SessionMemory:
+        """Return the memory for a session, loading or creating it as needed."""
+        session_id = session_id or DEFAULT_SESSION
+        now = time.time()
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = self.store.load(session_id, self.memory_key) if self.store is not None else None
+                memory = memory or SessionMemory(session_id, self.memory_key)
+                self._sessions[session_id] = memory
+            else:
+                self._sessions.move_to_end(session_id)
+            memory.last_access = now
+            # The requested session is most recently used, so eviction never drops it
+            evicted = self._evict(now)
+        self._notify_evicted(evicted)
+        return memory
+
+    def end(self, session_id: Optional[str] = None) -> None:
+        """Forget a session, including its persisted copy."""
+        session_id = session_id or DEFAULT_SESSION
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.store is not None:
+            self.store.delete(session_id)
+        self._notify_evicted([session_id])
+
+    def _overflow(self, memory: SessionMemory) -> str:
+        """Remove the oldest turns beyond the window or token budget and render them as text."""
+        messages = memory.chat_memory.messages
+        max_messages = 2 * max(1, self.config.window_turns)
+        removed: List[BaseMessage] = []
+        # Always keep the latest turn verbatim
+        while len(messages) - len(removed) > 2 and (
+            len(messages) - len(removed) > max_messages
+            or memory.token_count() - sum(count_tokens(m.content) for m in removed) > self.config.max_token_limit
+        ):
+            removed.extend(messages[len(removed):len(removed) + 2])
+        if not removed:
+            return ""
+        memory.chat_memory.messages = messages[len(removed):]
+        return "\n".join(
+            f"{'Human' if message.type == 'human' else 'AI'}: {message.content}" for message in removed
+        )
+
+    def save_turn(self, memory: SessionMemory, question: str, answer: str) -> None:
+        """Record a turn, summarize overflowing history and persist the session."""
+        memory.save_context({"question": question}, {"answer": answer})
+        new_lines = self._overflow(memory)
+        if new_lines:
+            memory.summary = self.summarize(memory.summary, new_lines)
+            self.summarizations += 1
+        if self.store is not None:
+            self.store.put(memory)
+
+    async def asave_turn(self, memory: SessionMemory, question: str, answer: str) -> None:
+        """Asynchronous variant of ``save_turn``."""
+        memory.save_context({"question": question}, {"answer": answer})
+        new_lines = self._overflow(memory)
+        if new_lines:
+            if self.asummarize is not None:
+                memory.summary = await self.asummarize(memory.summary, new_lines)
+            else:
+                memory.summary = self.summarize(memory.summary, new_lines)
+            self.summarizations += 1
+        if self.store is not None:
+            self.store.put(memory)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "evictions": self.evictions,
+            "summarizations": self.summarizations
+        }
@@ -0,0 +1,459 @@
+"""Vector stores partitioned into shards and searched scatter-gather.
+
+A ``ShardedVectorStore`` spreads credentials over several underlying stores
+(Chroma collections, ``MmapVectorStore`` directories, ...) chosen by a
+partitioner: ``HashPartitioner`` spreads ids evenly, ``MetadataPartitioner``
+groups credentials by the issuer or type that ``process_vc_data`` puts in
+their metadata. Queries fan out to the shards in parallel, each shard returns
+its local top-k and the lists are merged into the global top-k. A filter that
+pins the partition key skips the shards it cannot match.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import hashlib
+import heapq
+import re
+import threading
+import uuid
+import zlib
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from utils.mmap_store import MANIFEST, MmapVectorStore
+from utils.vector_search import ScoredDocument, batch_similarity_search_by_vectors, upsert_embeddings
+
+_SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+
+
+def filter_values(where: Optional[Dict[str, Any]], key: str) -> Optional[Set[Any]]:
+    """Values of ``key`` a Chroma-style ``where`` clause can match; None if unconstrained.
+
+    Only equality and ``$in`` constrain the key; other operators are treated
+    as matching any value, so the result never excludes a matching record.
+    """
+    if not where:
+        return None
+    allowed: Optional[Set[Any]] = None
+
+    def narrow(values: Optional[Set[Any]]) -> None:
+        nonlocal allowed
+        if values is not None:
+            allowed = values if allowed is None else allowed & values
+
+    for field, condition in where.items():
+        if field == "$and":
+            for clause in condition:
+                narrow(filter_values(clause, key))
+        elif field == "$or":
+            branches = [filter_values(clause, key) for clause in condition]
+            if branches and all(branch is not None for branch in branches):
+                narrow(set().union(*branches))
+        elif field == key:
+            if not isinstance(condition, dict):
+                narrow({condition})
+                continue
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    narrow({operand})
+                elif operator == "$in":
+                    narrow(set(operand))
+    return allowed
+
+
+class HashPartitioner:
+    """Spreads documents over a fixed number of shards by a stable hash of their id.
+
+    A document never moves between shards, and filters on the ``id``
+    metadata key (such as the id pushdown of ``MetadataIndex.where_clause``)
+    prune to the shards holding those ids, since ``BulkIngestor`` stores
+    credentials under their ``id``.
+    """
+    key = "id"
+    id_stable = True
+
+    def __init__(self, shards: int = 8):
+        if shards < 1:
+            raise ValueError("HashPartitioner needs at least one shard")
+        self.shards = shards
+
+    def names(self) -> List[str]:
+        return [f"shard-{index:03d}" for index in range(self.shards)]
+
+    def shard_for_value(self, value: Any) -> str:
+        return f"shard-{zlib.crc32(str(value).encode('utf-8')) % self.shards:03d}"
+
+    def shard_for(self, doc_id: str, metadata: Dict[str, Any]) -> str:
+        return self.shard_for_value(doc_id)
+
+
+class MetadataPartitioner:
+    """One shard per distinct value of a metadata key such as ``issuer`` or ``type``.
+
+    Shard names are a readable slug of the value plus a short digest, so
+    values that differ only in punctuation get separate shards. Records
+    without the key go to a ``<key>-none`` shard.
+    """
+    id_stable = False
+
+    def __init__(self, key: str = "issuer"):
+        self.key = key
+
+    def names(self) -> Optional[List[str]]:
+        """Shards are created as values appear, so none are known up front."""
+        return None
+
+    def shard_for_value(self, value: Any) -> str:
+        if value is None or value == "":
+            return f"{self.key}-none"
+        text = str(value)
+        slug = _SLUG_PATTERN.sub("-", text.lower()).strip("-")[:40]
+        return f"{self.key}-{slug}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]}"
+
+    def shard_for(self, doc_id: str, metadata: Dict[str, Any]) -> str:
+        return self.shard_for_value((metadata or {}).get(self.key))
+
+
+def make_partitioner(shard_by: str, shards: int = 8) -> Any:
+    """Partitioner for ``hash`` or a metadata key such as ``issuer`` or ``type``."""
+    if shard_by == "hash":
+        return HashPartitioner(shards)
+    return MetadataPartitioner(shard_by)
+
+
+def _is_empty(store: VectorStore) -> bool:
+    """Whether a shard store is known to hold no documents."""
+    collection = getattr(store, "_collection", None)
+    if collection is not None:
+        return collection.count() == 0
+    try:
+        return len(store) == 0
+    except TypeError:
+        return False
+
+
+def _distance(scored: ScoredDocument) -> float:
+    return float("inf") if scored[1] is None else scored[1]
+
+
+class ShardedVectorStore(VectorStore):
+    """Vector store that partitions documents across independent shard stores.
+
+    ``shard_factory`` opens the store for a shard name and is called the
+    first time a shard is needed; ``shards`` names shards that already exist.
+    Searches run on a thread pool, one task per shard; NumPy and Chroma
+    release the GIL while scoring, so shards are searched on several cores
+    at once. Every shard must use the same embeddings and distance, since
+    their scores are merged directly (lower is closer).
+
+    Writes are grouped by shard and upserted in parallel. With a partitioner
+    whose shard depends on metadata, an upsert also deletes an id from the
+    shard that held it before, so a credential whose issuer changed does not
+    linger in its old shard. The store remembers which shard each id written
+    through it lives in; ids it has not seen are looked up with
+    ``get_by_ids`` in the shards that were not empty when opened.
+    ``write_shards`` restricts writes to some shards and
+    skips records routed elsewhere, which lets one shard be rebuilt from the
+    full input while the others stay untouched. File-backed shards reach disk
+    on ``save``, which ``BulkIngestor`` calls after every ingest and delete.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        shard_factory: Optional[Callable[[str], VectorStore]] = None,
+        partitioner: Optional[Any] = None,
+        shards: Optional[Iterable[str]] = None,
+        write_shards: Optional[Iterable[str]] = None,
+        max_workers: Optional[int] = None
+    ):
+        self._embedding = embedding
+        self.shard_factory = shard_factory or (lambda name: MmapVectorStore(embedding))
+        self.partitioner = partitioner or HashPartitioner()
+        self.write_shards = set(write_shards) if write_shards is not None else None
+        self.max_workers = max_workers
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._shards: Dict[str, VectorStore] = {}
+        self._locations: Dict[str, str] = {}
+        self._tracked: Set[str] = set()
+        for name in list(shards or []) + list(self.partitioner.names() or []):
+            self.shard(name)
+        self.stats = {"searches": 0, "shard_searches": 0, "pruned": 0, "skipped": 0}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def shard_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._shards)
+
+    def shard(self, name: str) -> VectorStore:
+        """The store for a shard, opened through ``shard_factory`` on first use."""
+        with self._lock:
+            store = self._shards.get(name)
+            if store is None:
+                store = self._shards[name] = self.shard_factory(name)
+                self._track(name, store)
+            return store
+
+    def replace_shard(self, name: str, store: VectorStore) -> None:
+        """Swap in a rebuilt store for one shard; searches already running finish on the old one."""
+        with self._lock:
+            self._shards[name] = store
+            self._locations = {doc_id: shard for doc_id, shard in self._locations.items() if shard != name}
+            self._track(name, store)
+
+    def _track(self, name: str, store: VectorStore) -> None:
+        """Mark a shard as fully known to ``_locations`` when it starts out empty."""
+        if _is_empty(store):
+            self._tracked.add(name)
+        else:
+            self._tracked.discard(name)
+
+    def _previous_shards(self, ids: List[str], routes: List[str], shards: Set[str]) -> Dict[str, List[str]]:
+        """Ids held by one of ``shards`` other than the one they now route to."""
+        stale: Dict[str, List[str]] = {}
+        unknown: List[str] = []
+        with self._lock:
+            for doc_id, name in zip(ids, routes):
+                previous = self._locations.get(doc_id)
+                if previous is None:
+                    unknown.append(doc_id)
+                elif previous != name and previous in shards:
+                    stale.setdefault(previous, []).append(doc_id)
+            untracked = self._stores(shards - self._tracked)
+        if unknown and untracked:
+            route_of = dict(zip(ids, routes))
+            items = list(untracked.items())
+            for (name, _), documents in zip(items, self._map(lambda item: item[1].get_by_ids(unknown), items)):
+                moved = [doc.id for doc in documents if route_of.get(doc.id) != name]
+                if moved:
+                    stale.setdefault(name, []).extend(moved)
+        return stale
+
+    def route(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> List[str]:
+        """Shard each document is written to."""
+        return [self.partitioner.shard_for(doc_id, metadata) for doc_id, metadata in zip(ids, metadatas)]
+
+    def _stores(self, names: Optional[Iterable[str]] = None) -> Dict[str, VectorStore]:
+        with self._lock:
+            if names is None:
+                return dict(self._shards)
+            return {name: self._shards[name] for name in names if name in self._shards}
+
+    def _map(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """Run ``fn`` on every item, in parallel when there is more than one."""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="shard")
+            executor = self._executor
+        return list(executor.map(fn, items))
+
+    def search_targets(self, filter: Optional[Dict[str, Any]] = None) -> Dict[str, VectorStore]:
+        """Shards a search with ``filter`` has to visit."""
+        values = filter_values(filter, self.partitioner.key)
+        if values is None:
+            return self._stores()
+        return self._stores({self.partitioner.shard_for_value(value) for value in values})
+
+    def search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[ScoredDocument]]:
+        """One ``(document, distance)`` list per query vector, merged from every matching shard."""
+        if not embeddings:
+            return []
+        targets = self.search_targets(filter)
+        self.stats["searches"] += 1
+        self.stats["shard_searches"] += len(targets)
+        self.stats["pruned"] += len(self._shards) - len(targets)
+        per_shard = self._map(
+            lambda store: batch_similarity_search_by_vectors(store, embeddings, k, filter),
+            list(targets.values())
+        )
+        return [
+            heapq.nsmallest(k, (scored for results in per_shard for scored in results[query]), key=_distance)
+            for query in range(len(embeddings))
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[ScoredDocument]:
+        return self.search_by_vectors([self._embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Upsert precomputed embeddings into the shard each document routes to."""
+        pairs = list(text_embeddings)
+        if not pairs:
+            return []
+        metadatas = [dict(metadata or {}) for metadata in metadatas] if metadatas else [{} for _ in pairs]
+        ids = [str(doc_id) for doc_id in ids] if ids else [str(uuid.uuid4()) for _ in pairs]
+        groups: Dict[str, List[int]] = {}
+        for position, name in enumerate(self.route(ids, metadatas)):
+            if self.write_shards is not None and name not in self.write_shards:
+                self.stats["skipped"] += 1
+                continue
+            groups.setdefault(name, []).append(position)
+        stale: Dict[str, List[str]] = {}
+        if not self.partitioner.id_stable:
+            shards = set(self.shard_names)
+            if self.write_shards is not None:
+                shards &= self.write_shards
+            stale = self._previous_shards(ids, self.route(ids, metadatas), shards)
+
+        def write(name: str) -> None:
+            store = self.shard(name)
+            positions = groups.get(name, [])
+            if stale.get(name):
+                store.delete(ids=stale[name])
+            if positions:
+                upsert_embeddings(
+                    store,
+                    ids=[ids[i] for i in positions],
+                    texts=[pairs[i][0] for i in positions],
+                    embeddings=[list(pairs[i][1]) for i in positions],
+                    metadatas=[metadatas[i] for i in positions]
+                )
+
+        self._map(write, sorted(set(groups) | set(stale)))
+        if not self.partitioner.id_stable:
+            with self._lock:
+                for name, moved in stale.items():
+                    for doc_id in moved:
+                        if self._locations.get(doc_id) == name:
+                            del self._locations[doc_id]
+                for name, positions in groups.items():
+                    for i in positions:
+                        self._locations[ids[i]] = name
+        return [ids[i] for positions in groups.values() for i in positions]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self._embedding.embed_documents(texts) if texts else []
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete ids from the shards that can hold them."""
+        ids = [str(doc_id) for doc_id in ids or []]
+        if not ids:
+            return True
+        if self.partitioner.id_stable:
+            groups: Dict[str, List[str]] = {}
+            for doc_id in ids:
+                groups.setdefault(self.partitioner.shard_for(doc_id, {}), []).append(doc_id)
+            self._map(lambda item: item[1].delete(ids=groups[item[0]]), list(self._stores(groups).items()))
+        else:
+            groups = {}
+            with self._lock:
+                unknown = [doc_id for doc_id in ids if doc_id not in self._locations]
+                for doc_id in ids:
+                    if doc_id in self._locations:
+                        groups.setdefault(self._locations.pop(doc_id), []).append(doc_id)
+                if unknown:
+                    for name in set(self._shards) - self._tracked:
+                        groups.setdefault(name, []).extend(unknown)
+            self._map(lambda item: item[1].delete(ids=groups[item[0]]), list(self._stores(groups).items()))
+        return True
+
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        found: Dict[str, Document] = {}
+        for documents in self._map(lambda store: store.get_by_ids(ids), list(self._stores().values())):
+            for doc in documents:
+                found[doc.id] = doc
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def save(self) -> None:
+        """Save every shard that is backed by files, in parallel."""
+        self._map(
+            lambda store: store.save(),
+            [store for store in self._stores().values() if getattr(store, "path", None) is not None]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @classmethod
+    def from_directory(
+        cls,
+        embedding: Embeddings,
+        root: str,
+        partitioner: Optional[Any] = None,
+        dtype: str = "float32",
+        **kwargs: Any
+    ) -> "ShardedVectorStore":
+        """Open ``MmapVectorStore`` shards kept in subdirectories of ``root``, one per shard."""
+        root_path = Path(root)
+        existing = sorted(
+            path.name for path in root_path.iterdir() if (path / MANIFEST).exists()
+        ) if root_path.is_dir() else []
+        return cls(
+            embedding,
+            shard_factory=lambda name: MmapVectorStore(embedding, path=str(root_path / name), dtype=dtype),
+            partitioner=partitioner,
+            shards=existing,
+            **kwargs
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None,
+        shard_factory: Optional[Callable[[str], VectorStore]] = None,
+        partitioner: Optional[Any] = None,
+        **kwargs: Any
+    ) -> "ShardedVectorStore":
+        store = cls(embedding, shard_factory=shard_factory, partitioner=partitioner)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
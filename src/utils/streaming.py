@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional
+import time
+
+
+class GenerationTimer:
+    """Records time-to-first-token and total generation time for one streamed answer."""
+
+    def __init__(self):
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+
+    def mark_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Seconds from generation start to the first token and to completion."""
+        if self.started_at is None:
+            return {"time_to_first_token": None, "generation_time": None}
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return {
+            "time_to_first_token": (
+                self.first_token_at - self.started_at if self.first_token_at is not None else None
+            ),
+            "generation_time": end - self.started_at
+        }
+
+
+def chunk_text(chunk: Any) -> str:
+    """Extract the text of a streamed LLM chunk."""
+    content = getattr(chunk, "content", chunk)
+    return content if isinstance(content, str) else str(content)
+
+
+def route_event(route_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream event carrying the routing decision."""
+    return {"type": "route", **route_result}
+
+
+def context_event(documents: List[Any], context: str) -> Dict[str, Any]:
+    """Stream event carrying the retrieved documents' metadata."""
+    return {
+        "type": "context",
+        "documents": [dict(getattr(doc, "metadata", None) or {}) for doc in documents],
+        "context": context
+    }
+
+
+def token_event(text: str) -> Dict[str, Any]:
+    """Stream event carrying one piece of answer text."""
+    return {"type": "token", "content": text}
+
+
+def final_event(result: Dict[str, Any], timer: Optional[GenerationTimer] = None) -> Dict[str, Any]:
+    """Stream event carrying the complete answer dict and generation timings."""
+    return {
+        "type": "final",
+        "result": result,
+        "timings": timer.timings if timer is not None else GenerationTimer().timings
+    }
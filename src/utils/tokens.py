@@ -0,0 +1,21 @@
+import re
+
+# Runs of up to four word characters, or single punctuation marks, roughly
+# match how BPE tokenizers split English text and identifiers.
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of LLM tokens in ``text`` without a tokenizer download."""
+    return len(_TOKEN_PATTERN.findall(text)) if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "…") -> str:
+    """Cut ``text`` after ``max_tokens`` approximate tokens, appending ``marker`` if anything was cut."""
+    if max_tokens <= 0:
+        return ""
+    for count, match in enumerate(_TOKEN_PATTERN.finditer(text), 1):
+        if count == max_tokens:
+            rest = text[match.end():]
+            return text[:match.end()] + marker if rest.strip() else text
+    return text
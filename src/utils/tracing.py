@@ -0,0 +1,319 @@
+"""Per-stage timing spans and metrics for the RAG pipeline.
+
+Components take a ``tracer`` and wrap each stage (routing, query
+generation, searches, fusion, packing, generation) in a span. Spans opened
+inside ``Tracer.request`` share its request id and add up to a ``timings``
+breakdown. Finished spans go to pluggable sinks: an in-memory ring buffer,
+JSON lines, or Prometheus text exposition. ``NULL_TRACER``, the default,
+records nothing and costs a method call per stage.
+"""
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import IO, Any, Deque, Dict, Iterable, List, Optional, Tuple, Union
+import json
+import re
+import threading
+import time
+import uuid
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class Span:
+    """One timed stage of a request."""
+    name: str
+    request_id: Optional[str]
+    started_at: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    recording = True
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration * 1000,
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class _NullSpan:
+    """Span stand-in that ignores everything; also its own context manager."""
+
+    recording = False
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class RequestTrace:
+    """Spans recorded while handling one request."""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def timings(self) -> Dict[str, float]:
+        """Milliseconds per stage name, summed over repeated stages.
+
+        Nested stages overlap their parent (``similarity_search`` inside
+        ``search``), so the values do not add up to the request total.
+        """
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration * 1000
+        return totals
+
+
+_current_request: ContextVar[Optional[RequestTrace]] = ContextVar("vc_rag_request", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    request = _current_request.get()
+    return request.request_id if request is not None else None
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "span", "_started")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.span = Span(name, current_request_id(), time.time(), attributes=attributes)
+        self._started = 0.0
+
+    def __enter__(self) -> Span:
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.span.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.tracer.record(self.span)
+        return False
+
+
+class _ActiveRequest:
+    __slots__ = ("tracer", "name", "attributes", "request_id", "trace", "_token", "_span")
+
+    def __init__(self, tracer: "Tracer", name: str, request_id: Optional[str], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.request_id = request_id
+        self.trace: Optional[RequestTrace] = None
+        self._token = None
+        self._span: Optional[_ActiveSpan] = None
+
+    def __enter__(self) -> RequestTrace:
+        # A request opened inside another one is recorded as a stage of the outer request
+        self.trace = _current_request.get()
+        if self.trace is None:
+            self.trace = RequestTrace(self.request_id or uuid.uuid4().hex)
+            self._token = _current_request.set(self.trace)
+        self._span = _ActiveSpan(self.tracer, self.name, self.attributes)
+        self._span.__enter__()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._span.__exit__(exc_type, exc, tb)
+        if self._token is not None:
+            try:
+                _current_request.reset(self._token)
+            except ValueError:
+                # Generators may be finished from a different context than they started in
+                _current_request.set(None)
+        return False
+
+
+class _NullRequest:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NULL_REQUEST = _NullRequest()
+
+
+class RingBufferSink:
+    """Keeps the most recent ``capacity`` spans in memory."""
+
+    def __init__(self, capacity: int = 1024):
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, request_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        if request_id is not None:
+            spans = [span for span in spans if span.request_id == request_id]
+        return spans
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JSONLinesSink:
+    """Writes every span as one JSON object per line to a file path or text stream."""
+
+    def __init__(self, target: Union[str, IO[str]]):
+        self._owns_stream = isinstance(target, str)
+        self._stream = open(target, "a", encoding="utf-8") if self._owns_stream else target
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(span.as_dict(), default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def close(self) -> None:
+        if self._owns_stream:
+            self._stream.close()
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class PrometheusSink:
+    """Aggregates spans into Prometheus metrics, rendered with ``render``.
+
+    Each stage gets a duration histogram and an error counter; numeric and
+    boolean span attributes (tokens, document counts, cache hits) are summed
+    into ``<namespace>_stage_<attribute>_total`` counters.
+    """
+
+    def __init__(self, namespace: str = "vc_rag", buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.namespace = _metric_name(namespace)
+        self.buckets = tuple(sorted(buckets))
+        self._histograms: Dict[str, Tuple[List[int], List[float]]] = {}
+        self._errors: Dict[str, int] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            counts, totals = self._histograms.setdefault(span.name, ([0] * (len(self.buckets) + 1), [0.0, 0.0]))
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            totals[0] += span.duration
+            totals[1] += 1
+            if span.error is not None:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key, value in span.attributes.items():
+                if isinstance(value, (bool, int, float)):
+                    counter = (_metric_name(key), span.name)
+                    self._counters[counter] = self._counters.get(counter, 0.0) + float(value)
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        prefix = f"{self.namespace}_stage"
+        lines = [
+            f"# HELP {prefix}_duration_seconds Time spent in each pipeline stage.",
+            f"# TYPE {prefix}_duration_seconds histogram"
+        ]
+        with self._lock:
+            for stage, (counts, (total, count)) in sorted(self._histograms.items()):
+                label = f'stage="{_label(stage)}"'
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="{bound}"}} {bucket_count}')
+                lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="+Inf"}} {counts[-1]}')
+                lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {total}")
+                lines.append(f"{prefix}_duration_seconds_count{{{label}}} {int(count)}")
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+            for stage, errors in sorted(self._errors.items()):
+                lines.append(f'{prefix}_errors_total{{stage="{_label(stage)}"}} {errors}')
+            for attribute in sorted({attribute for attribute, _ in self._counters}):
+                lines.append(f"# TYPE {prefix}_{attribute}_total counter")
+                for (name, stage), value in sorted(self._counters.items()):
+                    if name == attribute:
+                        lines.append(f'{prefix}_{attribute}_total{{stage="{_label(stage)}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """Records spans for pipeline stages and passes them to every sink."""
+
+    enabled = True
+
+    def __init__(self, sinks: Optional[Iterable[Any]] = None):
+        self.sinks = list(sinks) if sinks is not None else [RingBufferSink()]
+
+    def span(self, name: str, **attributes: Any) -> _ActiveSpan:
+        """Context manager timing one stage; yields the ``Span`` for adding attributes."""
+        return _ActiveSpan(self, name, attributes)
+
+    def request(self, name: str = "request", request_id: Optional[str] = None, **attributes: Any) -> _ActiveRequest:
+        """Context manager grouping the spans of one request; yields its ``RequestTrace``."""
+        return _ActiveRequest(self, name, request_id, attributes)
+
+    def record(self, span: Span) -> None:
+        request = _current_request.get()
+        if request is not None and span.request_id == request.request_id:
+            request.add(span)
+        for sink in self.sinks:
+            sink.emit(span)
+
+
+class NullTracer:
+    """Tracer that records nothing."""
+
+    enabled = False
+    sinks: List[Any] = []
+
+    def span(self, name: str, **attributes: Any) -> _NullSpan:
+        return NULL_SPAN
+
+    def request(self, name: str = "request", request_id: Optional[str] = None, **attributes: Any) -> _NullRequest:
+        return _NULL_REQUEST
+
+    def record(self, span: Span) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
+
+
+def with_timings(result: Dict[str, Any], trace: Optional[RequestTrace]) -> Dict[str, Any]:
+    """Copy of an answer dict carrying the request's ``timings`` in milliseconds, if it was traced."""
+    if trace is None:
+        return result
+    return {**result, "request_id": trace.request_id, "timings": trace.timings()}
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+ScoredDocument = Tuple[Document, Optional[float]]
+
+
+def get_embedding_function(vector_store: Any) -> Any:
+    """Return the embedding function a vector store was built with."""
+    embeddings = getattr(vector_store, "embeddings", None)
+    if embeddings is None:
+        embeddings = getattr(vector_store, "_embedding_function", None)
+    if embeddings is None:
+        raise ValueError("Vector store does not expose an embedding function")
+    return embeddings
+
+
+_COMPARISONS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style ``where`` clause against one metadata dict.
+
+    Lets local indexes apply the same filters that are pushed down to Chroma.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _COMPARISONS[operator](value, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _chroma_results_to_lists(results: Dict[str, Any]) -> List[List[ScoredDocument]]:
+    """Convert a multi-embedding Chroma query result into one scored list per query."""
+    scored_lists = []
+    for documents, metadatas, distances in zip(
+        results["documents"],
+        results["metadatas"],
+        results["distances"]
+    ):
+        scored_lists.append([
+            (Document(page_content=text, metadata=metadata or {}), distance)
+            for text, metadata, distance in zip(documents, metadatas, distances)
+        ])
+    return scored_lists
+
+
+def batch_similarity_search_by_vectors(
+    vector_store: Any,
+    embeddings: List[List[float]],
+    k: int,
+    filter: Optional[Dict[str, Any]] = None
+) -> List[List[ScoredDocument]]:
+    """Search the vector store for several query embeddings at once.
+
+    Chroma collections accept a list of query embeddings, so all queries are
+    answered in a single round trip, as are stores with a ``search_by_vectors``
+    batch method such as ``MmapVectorStore``. Scores are the store's native distances
+    (lower is closer). Stores without a batch query path are searched one
+    vector at a time; their relevance scores (higher is closer) are turned
+    into distances as ``1 - relevance``.
+    """
+    if not embeddings:
+        return []
+
+    collection = getattr(vector_store, "_collection", None)
+    if collection is not None:
+        results = collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=filter,
+            include=["documents", "metadatas", "distances"]
+        )
+        return _chroma_results_to_lists(results)
+
+    if hasattr(vector_store, "search_by_vectors"):
+        return vector_store.search_by_vectors(embeddings, k=k, filter=filter)
+
+    scored_lists = []
+    for embedding in embeddings:
+        if hasattr(vector_store, "similarity_search_by_vector_with_relevance_scores"):
+            results = vector_store.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, filter=filter
+            )
+            scored_lists.append([
+                (doc, None if relevance is None else 1.0 - relevance)
+                for doc, relevance in results
+            ])
+        else:
+            documents = vector_store.similarity_search_by_vector(embedding, k=k, filter=filter)
+            scored_lists.append([(doc, None) for doc in documents])
+    return scored_lists
+
+
+def upsert_embeddings(
+    vector_store: Any,
+    ids: List[str],
+    texts: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]]
+) -> None:
+    """Write precomputed embeddings to the vector store, replacing existing ids.
+
+    Chroma collections take the vectors directly so nothing is re-embedded.
+    Other stores receive the texts through ``add_texts``.
+    """
+    if not ids:
+        return
+
+    collection = getattr(vector_store, "_collection", None)
+    if collection is not None:
+        collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=texts
+        )
+        return
+
+    if hasattr(vector_store, "add_embeddings"):
+        vector_store.add_embeddings(list(zip(texts, embeddings)), metadatas=metadatas, ids=ids)
+    else:
+        vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+
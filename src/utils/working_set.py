@@ -0,0 +1,95 @@
+"""Shortcuts for conversational turns.
+
+``is_standalone_question`` is a cheap check for questions that can be
+answered without condensing them against the chat history. A
+``WorkingSet`` holds the credentials a session retrieved recently, so a
+follow-up on the same topic can reuse them instead of searching again.
+"""
+from typing import Any, List, Optional, Sequence
+import re
+
+import numpy as np
+
+from utils.rank_fusion import document_key
+
+# Openers that continue the previous turn ("and when...", "what about...")
+FOLLOW_UP_OPENERS = (
+    "and", "but", "also", "or", "so", "then", "what about", "how about", "same for", "same with",
+)
+
+# Words that only make sense with an antecedent from earlier turns
+REFERRING_WORDS = {
+    "it", "its", "it's", "itself", "they", "them", "their", "theirs", "that", "this", "those",
+    "these", "he", "she", "him", "her", "his", "hers", "one", "ones", "former", "latter",
+    "same", "there", "else", "more", "other", "another", "again", "previous", "above",
+}
+
+# Kinds of credential that name a question's subject on their own
+CREDENTIAL_KINDS = {
+    "passport", "passports", "diploma", "diplomas", "degree", "degrees", "license", "licenses",
+    "licence", "licences", "membership", "memberships", "ticket", "tickets", "insurance",
+    "vaccination", "vaccinations", "badge", "badges", "employment", "transcript", "transcripts",
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+# PassportCredential, did:example:gov, urn:uuid:..., https://...
+_NAMED_PATTERN = re.compile(r"\b\w+Credential\b|\b(?:did|urn):\S+|https?://\S+")
+
+
+def is_standalone_question(question: str, min_words: int = 3) -> bool:
+    """Whether a question reads as self-contained, i.e. needs no chat history to be understood.
+
+    Errs on the side of condensing: a question counts as standalone only if
+    it has at least ``min_words`` words, does not open like a continuation
+    and contains no referring words such as "it" or "those". A definite
+    reference ("the expiration date", "the credential") also counts as
+    referring unless the question names a credential, by kind, type or id.
+    """
+    words = _WORD_PATTERN.findall(question.lower())
+    if len(words) < min_words:
+        return False
+    opening = " ".join(words[:2])
+    if any(opening == opener or opening.startswith(opener + " ") for opener in FOLLOW_UP_OPENERS):
+        return False
+    if any(word in REFERRING_WORDS for word in words):
+        return False
+    if "the" in words:
+        return any(word in CREDENTIAL_KINDS for word in words) or bool(_NAMED_PATTERN.search(question))
+    return True
+
+
+def _unit(vector: Any) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class WorkingSet:
+    """Credentials retrieved over a session's recent turns, newest first.
+
+    ``anchor`` is the embedding of the question whose search last added to
+    the set; questions close to it are answered from the set.
+    """
+
+    def __init__(self, capacity: int = 10):
+        self.capacity = capacity
+        self.documents: List[Any] = []
+        self.anchor: Optional[np.ndarray] = None
+
+    def similarity(self, embedding: Any) -> float:
+        """Cosine similarity of ``embedding`` to the anchor; -1 for an empty set."""
+        if self.anchor is None or not self.documents:
+            return -1.0
+        return float(np.dot(self.anchor, _unit(embedding)))
+
+    def update(self, embedding: Any, documents: Sequence) -> None:
+        """Re-anchor on a new search and put its documents in front of the older ones."""
+        self.anchor = _unit(embedding)
+        merged: List[Any] = []
+        seen = set()
+        for doc in list(documents) + self.documents:
+            key = document_key(doc)
+            if key not in seen:
+                seen.add(key)
+                merged.append(doc)
+        self.documents = merged[:self.capacity]
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+# Modules under src import each other as top-level packages (``from utils.x import ...``),
+# while tests import them through the repository root (``from src.utils.x import ...``)
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT / "src", ROOT):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
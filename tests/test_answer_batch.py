@@ -0,0 +1,92 @@
+from langchain_community.vectorstores import Chroma
+
+from benchmarks.bench_pipeline import HashingEmbeddings, SyntheticChatModel
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import RouterConfig
+from src.utils.retry import call_with_backoff, is_retryable
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyChatModel(SyntheticChatModel):
+    failures: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if "Answer:" in str(messages[-1].content) and self.failures > 0:
+            self.failures -= 1
+            raise RateLimitError("slow down")
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def _system(name, llm):
+    embeddings = HashingEmbeddings(size=64)
+    store = Chroma(collection_name=name, embedding_function=embeddings)
+    store.add_texts(
+        [
+            "Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01",
+            "Types: VerifiableCredential, UniversityDegreeCredential\nIssued on: 2020-06-01",
+        ],
+        metadatas=[{"id": "passport"}, {"id": "degree"}],
+        ids=["passport", "degree"]
+    )
+    embeddings.calls = 0
+    system = VCRAGSystem(vector_store=store, router_config=RouterConfig(local_routing=False), llm=llm)
+    return system, embeddings
+
+
+def test_batch_deduplicates_and_batches_routing_and_embedding():
+    llm = SyntheticChatModel(answer_words=12)
+    system, embeddings = _system("answer_batch", llm)
+    questions = [
+        "When does my passport expire?",
+        "What degree do I hold?",
+        "when does my passport   expire",
+        "When does my passport expire?",
+    ]
+
+    results = list(system.answer_batch(questions, max_concurrency=2))
+
+    assert [index for index, _ in results] == [0, 1, 2, 3]
+    assert results[0][1]["answer"].startswith("According to the credentials, When does my passport expire?")
+    assert results[2][1] == results[0][1] and results[2][1] is not results[0][1]
+    assert "degree" in results[1][1]["answer"]
+    # Two distinct questions: two routing, two query generation and two answer calls
+    assert llm.calls == 6
+    assert embeddings.calls == 1
+
+
+def test_unordered_batch_yields_every_index_once():
+    system, _ = _system("answer_batch_unordered", SyntheticChatModel(answer_words=4))
+    questions = [f"What does credential {i} say about my passport?" for i in range(7)]
+
+    results = dict(system.answer_batch(questions, ordered=False, window_size=3))
+
+    assert sorted(results) == list(range(7))
+    assert all(result["source"] == "vc_knowledge_base" for result in results.values())
+
+
+def test_rate_limited_generation_is_retried():
+    system, _ = _system("answer_batch_retry", FlakyChatModel(answer_words=4, failures=2))
+    delays = []
+
+    assert call_with_backoff(lambda: 1, sleep=delays.append) == 1
+    assert is_retryable(RateLimitError()) and not is_retryable(ValueError())
+    flaky = iter([RateLimitError(), RateLimitError(), "ok"])
+
+    def call():
+        item = next(flaky)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    assert call_with_backoff(call, base_delay=0.01, sleep=delays.append) == "ok"
+    assert len(delays) == 2
+
+    result = dict(system.answer_batch(["When does my passport expire?"], max_retries=3))[0]
+    assert result["source"] == "vc_knowledge_base"
+
+    failing = _system("answer_batch_failing", FlakyChatModel(failures=10))[0]
+    result = dict(failing.answer_batch(["When does my passport expire?"], max_retries=1))[0]
+    assert result["source"] == "error"
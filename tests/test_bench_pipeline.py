@@ -0,0 +1,42 @@
+from benchmarks.bench_pipeline import make_corpus, run_benchmark, summarize
+from src.utils.ingestion import process_records
+
+
+def test_synthetic_corpus_converts_json_and_turtle():
+    records = make_corpus(40, issuers=5, types=4, turtle_fraction=0.5, seed=1)
+    processed, errors = process_records(records)
+
+    assert not errors
+    assert len(processed) == 40
+    assert any("rdf" in record for record in records)
+    assert any("credentialSubject" in record for record in records)
+    assert len({item["metadata"]["issuer"] for item in processed}) == 5
+    assert make_corpus(40, issuers=5, types=4, turtle_fraction=0.5, seed=1) == records
+
+
+def test_summary_uses_nearest_rank_percentiles():
+    summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, peak_memory=None)
+
+    assert summary["count"] == 100
+    assert summary["throughput_per_second"] == 50.0
+    assert round(summary["latency_ms"]["p50"], 6) == 50.0
+    assert round(summary["latency_ms"]["p99"], 6) == 99.0
+
+
+def test_benchmark_runs_offline_with_injected_latency():
+    report = run_benchmark(
+        credentials=30,
+        questions=4,
+        sessions=2,
+        turns=2,
+        llm_latency_ms=2,
+        trace_memory=True
+    )
+
+    stages = report["stages"]
+    assert set(stages) == {"process", "ingest", "retrieve", "answer", "conversation"}
+    assert stages["process"]["count"] == 30
+    assert stages["conversation"]["count"] == 4
+    assert stages["conversation"]["latency_ms"]["p50"] >= 2
+    assert stages["answer"]["peak_memory_bytes"] > 0
+    assert report["backend_calls"]["llm"] > 0
@@ -0,0 +1,150 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import Chroma
+
+from src.chains.rag_fusion import RAGFusion
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import DataSource, RouterConfig
+from src.utils.bm25_index import BM25Index, identifier_terms, tokenize
+from src.utils.ingestion import BulkIngestor
+from src.utils.manifest import IncrementalSync, IngestionManifest
+
+TEXTS = {
+    "passport": "Types: VerifiableCredential, PassportCredential\nIssuer: did:example:gov\nExpires on: 2028-01-01",
+    "degree": "Types: VerifiableCredential, UniversityDegreeCredential\nIssuer: did:example:uni\nIssued on: 2020-06-01",
+    "gym": "Types: VerifiableCredential, GymMembershipCredential\nIssuer: did:example:gym\nmembershipType: Gold",
+}
+
+
+def _index(path=None):
+    index = BM25Index(path)
+    for doc_id, text in TEXTS.items():
+        index.upsert(doc_id, text, {"id": doc_id})
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    terms = tokenize("Is did:example:gov the issuer of my PassportCredential from 2028-01-01?")
+
+    assert identifier_terms("did:example:gov issued a PassportCredential.") == ["did:example:gov", "passportcredential"]
+    for term in ("did:example:gov", "passportcredential", "passport", "credential", "2028-01-01", "2028"):
+        assert term in terms
+
+
+def test_bm25_search_update_and_persistence(tmp_path):
+    path = tmp_path / "bm25.json"
+    index = _index(str(path))
+
+    results = index.search("university degree", k=2)
+    assert results[0][0].metadata["id"] == "degree"
+    assert results[0][1] > 0
+
+    index.upsert("degree", "Types: VerifiableCredential, DriverLicenseCredential", {"id": "degree"})
+    index.remove(["gym"])
+    assert index.search("university degree") == []
+    assert index.search("gold membership") == []
+    index.save()
+
+    reloaded = BM25Index(str(path))
+    assert len(reloaded) == 2
+    assert reloaded.search("driver license")[0][0].metadata["id"] == "degree"
+    assert [doc.metadata["id"] for doc, _ in reloaded.search("passport")] == ["passport"]
+
+
+def test_identifier_match_requires_every_identifier():
+    index = _index()
+
+    assert index.identifier_match("Which credential did did:example:uni issue?")[0][0].metadata["id"] == "degree"
+    assert index.identifier_match("Did did:example:uni issue a PassportCredential?") is None
+    assert index.identifier_match("what degree do I have") is None
+
+
+def test_common_terms_and_plain_camel_case_words_are_not_identifiers():
+    index = BM25Index()
+    for i in range(20):
+        index.upsert(f"doc-{i}", f"Types: VerifiableCredential\nIssuer: did:example:issuer{i}\nemployeeNumber: {1000 + i}", {"id": f"doc-{i}"})
+    index.upsert("gym", TEXTS["gym"], {"id": "gym"})
+
+    assert identifier_terms("What is my EmployeeNumber on the GymMembershipCredential?") == ["gymmembershipcredential"]
+    assert index.identifier_match("What is my EmployeeNumber?") is None
+    assert index.search("credential issuer types") == []
+    assert [doc.metadata["id"] for doc, _ in index.search("credential gold", k=2)] == ["gym"]
+
+
+def _make_store(name):
+    store = Chroma(collection_name=name, embedding_function=DeterministicFakeEmbedding(size=16))
+    store.add_texts(list(TEXTS.values()), metadatas=[{"id": doc_id} for doc_id in TEXTS], ids=list(TEXTS))
+    return store
+
+
+def test_rag_fusion_shortcut_skips_query_generation_and_vector_search():
+    store = Mock(wraps=_make_store("bm25_shortcut"))
+    rag_fusion = RAGFusion(vector_store=store, llm=Mock(), top_k=2, lexical_index=_index())
+    rag_fusion.generate_queries = Mock()
+    rag_fusion.agenerate_queries = AsyncMock()
+
+    documents = rag_fusion.retrieve("When does the credential from did:example:gov expire?")
+    async_documents = asyncio.run(rag_fusion.aretrieve("When does the credential from did:example:gov expire?"))
+
+    assert documents[0].metadata["id"] == "passport"
+    assert [doc.metadata["id"] for doc in async_documents] == [doc.metadata["id"] for doc in documents]
+    rag_fusion.generate_queries.assert_not_called()
+    rag_fusion.agenerate_queries.assert_not_called()
+    store.similarity_search.assert_not_called()
+    store.asimilarity_search.assert_not_called()
+
+
+def test_async_answer_runs_the_shortcut_once():
+    index = _index()
+    index.identifier_match = Mock(wraps=index.identifier_match)
+    system = VCRAGSystem(vector_store=_make_store("bm25_async_answer"), router_config=RouterConfig(), lexical_index=index, llm=Mock())
+    system.router.aroute = AsyncMock(return_value={"datasource": DataSource.VC_KNOWLEDGE_BASE, "reasoning": "Passport"})
+    system.generation_chain = Mock(ainvoke=AsyncMock(return_value=Mock(content="2028-01-01")))
+
+    for question in ("When does the credential from did:example:gov expire?", "When does my Gold membership end?"):
+        index.identifier_match.reset_mock()
+        system.rag_fusion.agenerate_queries = AsyncMock(return_value=["gym membership"])
+        result = asyncio.run(system.aanswer(question))
+        assert result["source"] == "vc_knowledge_base"
+        assert index.identifier_match.call_count == 1
+    assert "membershipType: Gold" in result["context"]
+
+
+def test_rag_fusion_fuses_lexical_results():
+    rag_fusion = RAGFusion(vector_store=_make_store("bm25_fusion"), llm=Mock(), top_k=3, lexical_index=_index())
+
+    documents = rag_fusion.retrieve("my gym membership", queries=["gym membership level"])
+
+    # The lexical list ranks the gym credential first and is fused with the vector list
+    assert "gym" in [doc.metadata["id"] for doc in documents]
+    assert len({doc.metadata["id"] for doc in documents}) == len(documents)
+
+
+def _credential(i):
+    return {
+        "id": f"urn:uuid:{i}",
+        "type": ["VerifiableCredential", "PassportCredential"],
+        "issuer": {"id": f"did:example:issuer{i}"},
+        "issuanceDate": "2023-01-01",
+        "credentialSubject": {"name": f"Holder {i}"}
+    }
+
+
+def test_ingestion_keeps_lexical_index_in_sync(tmp_path):
+    store = Chroma(collection_name="bm25_ingest", embedding_function=DeterministicFakeEmbedding(size=8))
+    index_path = str(tmp_path / "bm25.json")
+    ingestor = BulkIngestor(store, batch_size=4, max_workers=0, lexical_index=BM25Index(index_path))
+    records = [_credential(i) for i in range(5)]
+
+    IncrementalSync(ingestor, IngestionManifest(str(tmp_path / "manifest.json"))).sync(records)
+    assert len(BM25Index(index_path)) == 5
+
+    records = records[:4]
+    records[0]["credentialSubject"]["name"] = "Renamed Holder"
+    IncrementalSync(ingestor, IngestionManifest(str(tmp_path / "manifest.json"))).sync(records)
+
+    reloaded = BM25Index(index_path)
+    assert len(reloaded) == 4
+    assert reloaded.identifier_match("did:example:issuer4") is None
+    assert reloaded.search("renamed")[0][0].metadata["id"] == "urn:uuid:0"
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import RouterConfig
+from src.utils.clients import ClientRegistry
+from src.utils.mmap_store import MmapVectorStore
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def test_registry_shares_clients_and_connection_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    registry = ClientRegistry(max_connections=8)
+
+    router = registry.chat_model("gpt-4", 0.0, max_tokens=100)
+    same = registry.chat_model("gpt-4", 0.0, max_tokens=100)
+    generation = registry.chat_model("gpt-4", 0.7)
+    embeddings = registry.embeddings()
+
+    assert router is same
+    assert generation is not router
+    assert len(registry) == 3
+    http_client, http_async_client = registry.http_clients()
+    assert router.http_client is generation.http_client is embeddings.http_client is http_client
+    assert router.http_async_client is http_async_client
+
+    registry.close()
+    assert len(registry) == 0
+    assert http_client.is_closed and http_async_client.is_closed
+    assert registry.http_clients()[0] is not http_client
+
+
+def test_registry_closes_the_async_pool_inside_an_event_loop():
+    registry = ClientRegistry()
+
+    async def close_both():
+        first = registry.http_clients()[1]
+        await registry.aclose()
+        second = registry.http_clients()[1]
+        registry.close()
+        await asyncio.sleep(0)
+        return first, second
+
+    first, second = asyncio.run(close_both())
+    assert first.is_closed and second.is_closed
+
+
+def test_system_builds_model_clients_on_first_use(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    system = VCRAGSystem(
+        vector_store=MmapVectorStore(DeterministicFakeEmbedding(size=8)),
+        router_config=RouterConfig()
+    )
+
+    assert "generation_llm" not in vars(system)
+    assert "llm" not in vars(system.rag_fusion)
+    assert system.rag_fusion.llm is system.generation_llm
+
+
+def test_importing_chains_skips_heavy_dependencies():
+    code = (
+        "import sys\n"
+        "import chains.vc_rag_system, chains.conversational_vc_rag, utils.ingestion\n"
+        "print(sorted(m for m in ('langchain_openai', 'langchain', 'langsmith', 'rdflib') if m in sys.modules))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    output = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True).stdout
+
+    assert output.strip() == "[]"
@@ -0,0 +1,81 @@
+from langchain_core.documents import Document
+
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+from src.utils.context_packer import ContextPacker, shorten_low_value_fields
+from src.utils.tokens import count_tokens, truncate_to_tokens
+
+PASSPORT = "Types: VerifiableCredential, PassportCredential\nIssuer: did:example:gov\nExpires on: 2028-01-01\nCredential Subject:\n  name: Jane Doe\n  nationality: NL"
+SIGNED = PASSPORT + "\nsec:proofValue: z" + "4sXq9" * 40 + "\nsec:verificationMethod: did:example:gov#key-1"
+
+
+def test_token_counting_and_truncation():
+    assert count_tokens("") == 0
+    assert count_tokens("did:example:123") == 6
+    truncated = truncate_to_tokens("one two three four", 2)
+    assert truncated == "one two…"
+    assert truncate_to_tokens("one two", 5) == "one two"
+
+
+def test_exact_and_near_duplicates_are_removed():
+    documents = [
+        Document(page_content=PASSPORT, metadata={"id": "urn:passport"}),
+        Document(page_content=PASSPORT, metadata={"id": "urn:passport"}),
+        Document(page_content=PASSPORT.replace("\n", "  \n"), metadata={"id": "urn:passport-copy"}),
+        Document(page_content=PASSPORT.replace("nationality: NL", "nationality: NL\n  height: 170"), metadata={"source": "scan"}),
+        Document(page_content="Types: VerifiableCredential, UniversityDegreeCredential", metadata={"id": "urn:degree"}),
+    ]
+
+    packed = ContextPacker(near_duplicate_threshold=0.8).pack(documents)
+
+    assert [doc.metadata["id"] for doc in packed.documents] == ["urn:passport", "urn:degree"]
+    assert packed.duplicates == 2
+    assert packed.near_duplicates == 1
+    assert packed.tokens_saved > 0
+    assert packed.documents[0] is documents[0]
+
+
+def test_credentials_with_different_ids_are_never_near_duplicates():
+    renewed = PASSPORT.replace("2028-01-01", "2033-01-01")
+    documents = [
+        Document(page_content=PASSPORT, metadata={"id": "urn:passport-2018"}),
+        Document(page_content=renewed, metadata={"id": "urn:passport-2023"}),
+    ]
+
+    packed = ContextPacker(near_duplicate_threshold=0.5).pack(documents)
+
+    assert [doc.metadata["id"] for doc in packed.documents] == ["urn:passport-2018", "urn:passport-2023"]
+    assert packed.near_duplicates == 0
+
+
+def test_budget_shortens_low_value_fields_before_truncating():
+    assert "4sXq9" * 5 not in shorten_low_value_fields(SIGNED)
+    assert "name: Jane Doe" in shorten_low_value_fields(SIGNED)
+
+    documents = [
+        (Document(page_content="Types: VerifiableCredential, GymMembershipCredential " * 20, metadata={"id": "gym"}), 0.1),
+        (Document(page_content=SIGNED, metadata={"id": "signed"}), 0.9),
+    ]
+    budget = count_tokens(shorten_low_value_fields(SIGNED)) + 60
+    packer = ContextPacker(max_tokens=budget, min_document_tokens=10)
+    packed = packer.pack(documents)
+
+    # Ordered by fused score; the best document loses only its proof value
+    assert [doc.metadata["id"] for doc in packed.documents] == ["signed", "gym"]
+    assert packed.documents[0].page_content == shorten_low_value_fields(SIGNED)
+    assert packed.documents[1].page_content.endswith("…")
+    assert packed.tokens <= budget
+    assert packed.truncated == 2
+    assert packer.stats["tokens_saved"] == packed.tokens_saved
+
+    tight = ContextPacker(max_tokens=budget - 55, min_document_tokens=10).pack(documents)
+    assert [doc.metadata["id"] for doc in tight.documents] == ["signed"]
+    assert tight.dropped == 1
+
+
+def test_conversational_context_keeps_documents_without_credential_type():
+    documents = [Document(page_content=PASSPORT, metadata={"id": "urn:passport", "type": "VerifiableCredential, PassportCredential"})]
+
+    context = ConversationalVCRAG._format_context(ConversationalVCRAG.__new__(ConversationalVCRAG), documents)
+
+    assert "Credential Type: VerifiableCredential, PassportCredential" in context
+    assert "name: Jane Doe" in context
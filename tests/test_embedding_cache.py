@@ -0,0 +1,72 @@
+import asyncio
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import Chroma
+
+from src.utils.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    batches: list = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return super().embed_documents(texts)
+
+
+def test_misses_are_batched_and_hits_skip_upstream():
+    upstream = CountingEmbeddings(size=8, batches=[])
+    cached = CachedEmbeddings(upstream, model_name="fake")
+
+    first = cached.embed_documents(["a", "b", "a"])
+    second = cached.embed_documents(["b", "c", "a"])
+
+    assert upstream.batches == [["a", "b"], ["c"]]
+    assert first[0] == first[2]
+    np.testing.assert_allclose(second[0], first[1], rtol=1e-6)
+    np.testing.assert_allclose(cached.embed_query("c"), upstream.embed_query("c"), rtol=1e-6)
+    assert asyncio.run(cached.aembed_documents(["a", "d"]))[0] == cached.embed_documents(["a"])[0]
+    assert cached.stats["hits"] == 5
+    assert cached.stats["misses"] == 5
+    assert cached.stats["upstream_calls"] == 3
+
+
+def test_cache_persists_and_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    upstream = CountingEmbeddings(size=8, batches=[])
+    CachedEmbeddings(upstream, path=path, model_name="fake", dtype="float16").embed_documents(["x", "y"])
+
+    reopened = CachedEmbeddings(upstream, path=path, model_name="fake", dtype="float16")
+    vectors = reopened.embed_documents(["x", "y"])
+    other_model = CachedEmbeddings(upstream, path=path, model_name="other")
+    other_model.embed_documents(["x"])
+
+    assert reopened.stats["hit_rate"] == 1.0
+    np.testing.assert_allclose(vectors[0], upstream.embed_query("x"), atol=1e-2)
+    assert other_model.stats["misses"] == 1
+    assert other_model.stats["entries"] == 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cached = CachedEmbeddings(CountingEmbeddings(size=4, batches=[]), max_entries=3)
+    cached.embed_documents(["a", "b", "c"])
+    cached.embed_documents(["a"])
+    cached.embed_documents(["d"])
+
+    assert cached.stats["entries"] == 3
+    assert cached.stats["evictions"] == 1
+    cached.embed_documents(["a", "c", "d"])
+    assert cached.stats["misses"] == 4
+
+
+def test_wraps_embeddings_passed_to_chroma():
+    upstream = CountingEmbeddings(size=8, batches=[])
+    cached = CachedEmbeddings(upstream)
+    store = Chroma(collection_name="embedding_cache_test", embedding_function=cached)
+    store.add_texts(["PassportCredential", "UniversityDegreeCredential"], ids=["passport", "degree"])
+
+    store.add_texts(["PassportCredential"], ids=["passport"])
+    results = store.similarity_search("PassportCredential", k=1)
+
+    assert results[0].page_content == "PassportCredential"
+    assert upstream.batches == [["PassportCredential", "UniversityDegreeCredential"]]
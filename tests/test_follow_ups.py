@@ -0,0 +1,174 @@
+import threading
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+from src.models.memory import SessionMemoryConfig
+from src.models.router import RouterConfig
+from src.utils.follow_ups import FollowUpCache
+from src.utils.mmap_store import MmapVectorStore
+
+
+class GatedChatModel(BaseChatModel):
+    """Answers immediately; follow-up suggestions wait for ``gate``."""
+    gate: Any = None
+    follow_up_calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "gated"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if "follow-up questions" in messages[-1].content:
+            self.follow_up_calls += 1
+            if self.gate is not None:
+                self.gate.wait(5)
+            content = "Who issued it?\nIs it valid?\nWhen was it issued?\nAnything else?"
+        else:
+            content = "It expires on 2028-01-01."
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+def _documents(*ids: str) -> List[Document]:
+    return [Document(page_content=f"Credential {doc_id}", metadata={"id": doc_id}) for doc_id in ids]
+
+
+def test_suggestions_are_generated_alongside_the_answer_and_shared():
+    store = MmapVectorStore(DeterministicFakeEmbedding(size=16))
+    store.add_texts(["Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01"], metadatas=[{"id": "urn:passport"}])
+    gate = threading.Event()
+    rag = ConversationalVCRAG(
+        vector_store=store,
+        router_config=RouterConfig(),
+        llm=GatedChatModel(gate=gate),
+        speculative_follow_ups=True
+    )
+
+    # The answer does not wait for the suggestions
+    result = rag.process_query("When does my passport expire?", session_id="alice")
+    assert result["answer"] == "It expires on 2028-01-01."
+    assert rag.follow_ups.stats["started"] == 1
+
+    gate.set()
+    suggestions = rag.get_follow_up_suggestions("alice")
+    rag.process_query("When does my passport expire?", session_id="bob")
+
+    assert suggestions == ["Who issued it?", "Is it valid?", "When was it issued?"]
+    assert rag.get_follow_up_suggestions("bob") == suggestions
+    assert rag.llm.follow_up_calls == 1
+    rag.follow_ups.close()
+
+
+def test_next_query_cancels_unfinished_suggestions():
+    gate = threading.Event()
+    calls = []
+
+    def generate(documents, cancelled):
+        calls.append([doc.metadata["id"] for doc in documents])
+        if cancelled is not None:
+            gate.wait(5)
+            if cancelled.is_set():
+                return None
+        return [f"About {documents[0].metadata['id']}?"]
+
+    cache = FollowUpCache(generate, max_workers=1)
+    cache.start("alice", _documents("passport"))
+    cache.start("alice", _documents("degree"))
+
+    # The second task is queued behind the first, so the caller times out
+    assert cache.get(_documents("degree"), timeout=0.05) == []
+    assert cache.stats["cancelled"] == 1
+    assert cache.stats["timeouts"] == 1
+
+    gate.set()
+    assert cache.get(_documents("degree"), timeout=5) == ["About degree?"]
+    # The cancelled task's result was discarded, so its documents are generated afresh
+    assert cache.get(_documents("passport")) == ["About passport?"]
+    assert calls == [["passport"], ["degree"], ["passport"]]
+    cache.close()
+
+
+def test_failed_speculative_generation_falls_back_to_generating_now():
+    calls = []
+
+    def generate(documents, cancelled):
+        calls.append(cancelled is not None)
+        if cancelled is not None:
+            raise RuntimeError("rate limited")
+        return ["Who issued it?"]
+
+    cache = FollowUpCache(generate)
+    cache.start("alice", _documents("passport"))
+
+    assert cache.get(_documents("passport"), timeout=5) == ["Who issued it?"]
+    assert calls == [True, False]
+    assert cache.stats["failed"] == 1 and cache.stats["misses"] == 1
+    assert cache.get(_documents("passport")) == ["Who issued it?"]
+    assert cache.stats["hits"] == 1
+    cache.close()
+
+
+def test_a_task_still_wanted_by_another_session_is_kept():
+    cache = FollowUpCache(lambda documents, cancelled: ["Next?"])
+    cache.start("alice", _documents("passport"))
+    cache.start("bob", _documents("passport"))
+    cache.cancel("alice")
+
+    assert cache.get(_documents("passport"), timeout=5) == ["Next?"]
+    assert cache.stats["cancelled"] == 0
+    cache.close()
+
+
+def test_finished_and_evicted_sessions_leave_no_pending_entries():
+    gate = threading.Event()
+    cache = FollowUpCache(lambda documents, cancelled: ["Next?"])
+    cache.start("alice", _documents("passport"))
+    assert cache.get(_documents("passport"), timeout=5) == ["Next?"]
+    assert cache._pending == {} and cache._waiting == {}
+
+    store = MmapVectorStore(DeterministicFakeEmbedding(size=16))
+    store.add_texts(["Types: VerifiableCredential, PassportCredential"], metadatas=[{"id": "urn:passport"}])
+    rag = ConversationalVCRAG(
+        vector_store=store,
+        router_config=RouterConfig(),
+        llm=GatedChatModel(gate=gate),
+        memory_config=SessionMemoryConfig(max_sessions=1),
+        speculative_follow_ups=True
+    )
+    rag.process_query("When does my passport expire?", session_id="alice")
+    assert set(rag.follow_ups._pending) == {"alice"}
+
+    # A new session evicts alice, whose unfinished task is cancelled
+    rag.sessions.get("bob")
+    assert rag.follow_ups._pending == {}
+    assert rag.follow_ups.stats["cancelled"] == 1
+    gate.set()
+    rag.follow_ups.close()
+
+
+def test_next_query_cancels_before_retrieval():
+    gate = threading.Event()
+    store = MmapVectorStore(DeterministicFakeEmbedding(size=16))
+    store.add_texts(["Types: VerifiableCredential, PassportCredential"], metadatas=[{"id": "urn:passport"}])
+    rag = ConversationalVCRAG(vector_store=store, router_config=RouterConfig(), llm=GatedChatModel(gate=gate), speculative_follow_ups=True)
+    rag.process_query("When does my passport expire?", session_id="alice")
+    cancelled = []
+
+    def prepare_turn(question, session):
+        cancelled.append(rag.follow_ups.stats["cancelled"])
+        raise RuntimeError("stop after cancellation")
+
+    rag._prepare_turn = prepare_turn
+    try:
+        rag.process_query("Who issued my passport?", session_id="alice")
+    except RuntimeError:
+        pass
+
+    assert cancelled == [1]
+    gate.set()
+    rag.follow_ups.close()
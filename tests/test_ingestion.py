@@ -0,0 +1,191 @@
+import io
+import json
+from unittest.mock import Mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import Chroma
+
+from src.utils.ingestion import BulkIngestor, IngestionStats, _iter_json_values, iter_vc_records
+from src.utils.manifest import IncrementalSync, IngestionManifest
+from src.utils.mmap_store import MmapVectorStore
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return super().embed_documents(texts)
+
+
+def _credential(i):
+    return {
+        "id": f"urn:uuid:{i}",
+        "type": ["VerifiableCredential", "PassportCredential"],
+        "issuer": {"id": f"did:example:issuer{i % 3}"},
+        "issuanceDate": "2023-01-01",
+        "credentialSubject": {"id": f"did:example:holder{i}", "name": f"Holder {i}"}
+    }
+
+
+def _write_corpus(tmp_path):
+    with open(tmp_path / "credentials.jsonl", "w") as handle:
+        for i in range(25):
+            handle.write(json.dumps(_credential(i)) + "\n")
+    (tmp_path / "more.json").write_text(json.dumps([_credential(i) for i in range(25, 30)] + [{"id": "broken", "rdf": "not turtle ::"}]))
+    (tmp_path / "degree.ttl").write_text(
+        "@prefix ex: <http://example.org/> .\n"
+        "ex:degree a ex:UniversityDegreeCredential ; ex:name \"Bachelor of Science\" .\n"
+    )
+
+
+def test_bulk_ingestion_batches_and_upserts(tmp_path):
+    _write_corpus(tmp_path)
+    embeddings = CountingEmbeddings(size=8)
+    store = Chroma(collection_name="bulk_ingest", embedding_function=embeddings)
+    cache = Mock()
+    
+    ingestor = BulkIngestor(store, batch_size=10, upsert_size=16, max_workers=0, process_chunk_size=7, answer_cache=cache)
+    stats = ingestor.ingest_paths([str(tmp_path)])
+    
+    assert stats.records == 32
+    assert stats.documents == 31
+    assert stats.error_count == 1
+    assert stats.errors[0].startswith("broken:")
+    assert embeddings.calls == stats.embedding_batches == 4
+    assert stats.upserts >= 2
+    assert store._collection.count() == stats.documents
+    
+    stored = store.get(ids=["urn:uuid:3"])
+    assert stored["metadatas"][0]["issuer"] == "did:example:issuer0"
+    assert "PassportCredential" in stored["documents"][0]
+    assert cache.invalidate_documents.call_count == stats.upserts
+
+
+def test_json_arrays_are_read_element_by_element(tmp_path):
+    credentials = [_credential(i) for i in range(20)] + [12345, "text", None]
+    document = json.dumps(credentials, indent=2)
+    
+    assert list(_iter_json_values(io.StringIO(document), read_size=7)) == credentials
+    assert list(_iter_json_values(io.StringIO("  []"), read_size=1)) == []
+    assert list(_iter_json_values(io.StringIO(json.dumps(_credential(1))), read_size=5)) == [_credential(1)]
+    
+    _write_corpus(tmp_path)
+    records = list(iter_vc_records([str(tmp_path)]))
+    assert len(records) == 25 + 1 + 6
+    assert records[25] == {"rdf_file": str(tmp_path / "degree.ttl"), "format": "turtle"}
+
+
+def test_rdf_files_are_converted_in_slices(tmp_path):
+    path = tmp_path / "degrees.ttl"
+    path.write_text("@prefix ex: <http://example.org/> .\n" + "".join(
+        f"ex:degree{i} a ex:UniversityDegreeCredential ; ex:name \"Degree {i}\" .\n" for i in range(10)
+    ))
+    records = [_credential(1), {"rdf_file": str(path), "format": "turtle"}, _credential(2)]
+    
+    for workers in (0, 1):
+        ingestor = BulkIngestor(Mock(), embeddings=Mock(), max_workers=workers, process_chunk_size=4)
+        stats = IngestionStats()
+        chunks = list(ingestor.processed_chunks(records, stats))
+        assert [len(chunk) for chunk in chunks] == [1, 4, 4, 2, 1]
+        assert stats.records == 12 and stats.error_count == 0
+    
+    broken = tmp_path / "broken.ttl"
+    broken.write_text("not turtle ::")
+    stats = IngestionStats()
+    chunks = list(BulkIngestor(Mock(), embeddings=Mock(), max_workers=1).processed_chunks([{"rdf_file": str(broken)}], stats))
+    assert chunks == [[]] and stats.errors[0].startswith(str(broken))
+
+
+def test_bulk_ingestion_with_process_pool_is_idempotent(tmp_path):
+    _write_corpus(tmp_path)
+    store = Chroma(collection_name="bulk_ingest_pool", embedding_function=DeterministicFakeEmbedding(size=8))
+    ingestor = BulkIngestor(store, batch_size=8, max_workers=2, process_chunk_size=5)
+    
+    first = ingestor.ingest(iter_vc_records([str(tmp_path)]))
+    second = ingestor.ingest(iter_vc_records([str(tmp_path)]))
+    
+    assert first.documents == second.documents
+    assert store._collection.count() == first.documents
+    assert first.docs_per_second > 0
+
+
+def test_incremental_sync_only_embeds_changes(tmp_path):
+    embeddings = CountingEmbeddings(size=8)
+    store = Chroma(collection_name="incremental_sync", embedding_function=embeddings)
+    manifest_path = str(tmp_path / "manifest.json")
+    ingestor = BulkIngestor(store, batch_size=4, max_workers=0)
+    records = [_credential(i) for i in range(10)]
+    
+    plan = IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync(records)
+    assert plan.summary() == {"added": 10, "changed": 0, "removed": 0, "unchanged": 0}
+    assert store._collection.count() == 10
+    
+    embeddings.calls = 0
+    plan = IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync(records)
+    assert plan.summary() == {"added": 0, "changed": 0, "removed": 0, "unchanged": 10}
+    assert embeddings.calls == 0
+    
+    records[3]["credentialSubject"]["name"] = "Renamed Holder"
+    records = records[:9] + [_credential(42)]
+    
+    dry_plan = IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync(records, dry_run=True)
+    assert dry_plan.summary() == {"added": 1, "changed": 1, "removed": 1, "unchanged": 8}
+    assert "- urn:uuid:9" in dry_plan.describe()
+    assert embeddings.calls == 0
+    assert store._collection.count() == 10
+    
+    plan = IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync(records)
+    assert plan.added == ["urn:uuid:42"]
+    assert plan.changed == ["urn:uuid:3"]
+    assert plan.removed == ["urn:uuid:9"]
+    assert embeddings.calls == 1
+    assert store._collection.count() == 10
+    assert "Renamed Holder" in store.get(ids=["urn:uuid:3"])["documents"][0]
+    assert store.get(ids=["urn:uuid:9"])["ids"] == []
+    assert "urn:uuid:9" not in IngestionManifest(manifest_path).entries
+
+
+def test_incremental_sync_prunes_expired(tmp_path):
+    store = Chroma(collection_name="incremental_prune", embedding_function=DeterministicFakeEmbedding(size=8))
+    ingestor = BulkIngestor(store, max_workers=0)
+    records = [_credential(1), dict(_credential(2), expirationDate="2001-01-01")]
+    
+    plan = IncrementalSync(ingestor, IngestionManifest(str(tmp_path / "m.json")), prune_expired=True).sync(records)
+    
+    assert plan.added == ["urn:uuid:1"]
+    assert store._collection.count() == 1
+
+
+def test_incremental_sync_keeps_credentials_that_fail_conversion(tmp_path):
+    store = Chroma(collection_name="incremental_failed", embedding_function=DeterministicFakeEmbedding(size=8))
+    ingestor = BulkIngestor(store, max_workers=0)
+    manifest_path = str(tmp_path / "m.json")
+    IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync([_credential(1), _credential(2)])
+    
+    broken = dict(_credential(1), credentialSubject=None)
+    sync = IncrementalSync(ingestor, IngestionManifest(manifest_path))
+    plan = sync.sync([broken, _credential(2)])
+    
+    assert sync.stats.error_count == 1
+    assert plan.removed == []
+    assert store._collection.count() == 2
+    assert "urn:uuid:1" in IngestionManifest(manifest_path).entries
+    
+    unnamed = {key: value for key, value in broken.items() if key != "id"}
+    plan = IncrementalSync(ingestor, IngestionManifest(manifest_path)).sync([unnamed])
+    assert plan.removed == []
+    assert store._collection.count() == 2
+
+
+def test_incremental_sync_persists_mmap_stores(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    store_path, manifest_path = str(tmp_path / "store"), str(tmp_path / "m.json")
+    records = [_credential(i) for i in range(3)]
+    IncrementalSync(BulkIngestor(MmapVectorStore(embeddings, path=store_path), max_workers=0), IngestionManifest(manifest_path)).sync(records)
+    
+    reopened = MmapVectorStore(embeddings, path=store_path)
+    assert len(reopened) == 3
+    
+    plan = IncrementalSync(BulkIngestor(reopened, max_workers=0), IngestionManifest(manifest_path)).sync(records[:2])
+    assert plan.removed == ["urn:uuid:2"]
+    assert len(MmapVectorStore(embeddings, path=store_path)) == 2
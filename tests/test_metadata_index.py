@@ -0,0 +1,175 @@
+import asyncio
+from datetime import date
+from unittest.mock import Mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import Chroma
+
+from src.chains.rag_fusion import RAGFusion
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import RouterConfig
+from src.utils.bm25_index import BM25Index
+from src.utils import metadata_index
+from src.utils.metadata_index import MetadataFilter, MetadataIndex, extract_filter, listing_kind
+
+CREDENTIALS = [
+    ("passport", "VerifiableCredential, PassportCredential", "did:example:gov", "2021-03-01", "2025-06-30"),
+    ("license", "VerifiableCredential, DriverLicenseCredential", "did:example:gov", "2022-01-15", "2027-01-15"),
+    ("degree", "VerifiableCredential, UniversityDegreeCredential", "did:example:uni", "2020-06-01", ""),
+    ("gym", "VerifiableCredential, GymMembershipCredential", "did:example:gym", "2024-02-01T10:00:00Z", "2025-02-01"),
+]
+TODAY = date(2025, 1, 1)
+
+
+def _metadata(doc_id, types, issuer, issued, expires):
+    return {"id": doc_id, "type": types, "issuer": issuer, "issuance_date": issued, "expiration_date": expires}
+
+
+def _index(path=None):
+    index = MetadataIndex(path, capacity=2)
+    for credential in CREDENTIALS:
+        index.upsert(credential[0], _metadata(*credential))
+    return index
+
+
+def test_metadata_index_match_update_and_persistence(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    index = _index(path)
+
+    assert index.match(MetadataFilter(issuer="did:example:gov")) == ["passport", "license"]
+    assert index.match(MetadataFilter(expires_until=date(2026, 1, 1))) == ["passport", "gym"]
+    assert index.match(MetadataFilter(types=["UniversityDegreeCredential", "GymMembershipCredential"])) == ["degree", "gym"]
+    assert index.count(MetadataFilter(issued_from=date(2024, 2, 1))) == 1
+
+    index.upsert("passport", _metadata("passport", "VerifiableCredential, PassportCredential", "did:example:gov", "2021-03-01", "2030-06-30"))
+    index.remove(["gym"])
+    assert index.match(MetadataFilter(expires_until=date(2026, 1, 1))) == []
+    index.save()
+
+    reloaded = MetadataIndex(path)
+    assert len(reloaded) == 3
+    assert reloaded.match(MetadataFilter(issuer="did:example:gov", expires_from=date(2030, 1, 1))) == ["passport"]
+    assert reloaded.describe_rows(["degree"])[0]["types"] == ["VerifiableCredential", "UniversityDegreeCredential"]
+
+
+def test_extract_filter_from_question():
+    index = _index()
+
+    query = extract_filter("Which of my credentials from did:example:gov expire before 2026?", index, today=TODAY)
+    assert query.issuer == "did:example:gov"
+    assert query.expires_until == date(2026, 1, 1)
+    assert query.expires_from is None
+    assert listing_kind("Which of my credentials from did:example:gov expire before 2026?", query) == "list"
+
+    query = extract_filter("How many university degrees were issued in 2020?", index, today=TODAY)
+    assert query.types == ["UniversityDegreeCredential"]
+    assert (query.issued_from, query.issued_until) == (date(2020, 1, 1), date(2021, 1, 1))
+    assert listing_kind("How many university degrees were issued in 2020?", query) == "count"
+
+    query = extract_filter("Show me my credentials that are not expired", index, today=TODAY)
+    assert query.expires_from == TODAY
+
+    query = extract_filter("When does my passport expire?", index, today=TODAY)
+    assert query.types == ["PassportCredential"]
+    assert listing_kind("When does my passport expire?", query) is None
+    assert listing_kind("What credentials are needed to rent a car?", MetadataFilter()) is None
+
+    query = extract_filter("Show me what my credentials say about my nationality", index, today=TODAY)
+    assert listing_kind("Show me what my credentials say about my nationality", query) is None
+    query = extract_filter("List my passport credentials from did:example:gov", index, today=TODAY)
+    assert listing_kind("List my passport credentials from did:example:gov", query) == "list"
+
+    for question in ("Which credentials expire before 2026-02-30?", "Which credentials expire before 2026-13?"):
+        query = extract_filter(question, index, today=TODAY)
+        assert (query.expires_from, query.expires_until) == (None, None)
+
+
+def _make_store(name):
+    store = Chroma(collection_name=name, embedding_function=DeterministicFakeEmbedding(size=16))
+    store.add_texts(
+        [f"Types: {types}\nIssuer: {issuer}" for _, types, issuer, _, _ in CREDENTIALS],
+        metadatas=[_metadata(*credential) for credential in CREDENTIALS],
+        ids=[credential[0] for credential in CREDENTIALS]
+    )
+    return store
+
+
+def test_filter_is_pushed_down_to_every_search():
+    store = _make_store("metadata_pushdown")
+    lexical_index = BM25Index()
+    for doc_id, types, issuer, _, _ in CREDENTIALS:
+        lexical_index.upsert(doc_id, f"Types: {types}\nIssuer: {issuer}", {"id": doc_id})
+    index = _index()
+    where = index.where_clause(MetadataFilter(issuer="did:example:gov"))
+    assert where == {"id": {"$in": ["passport", "license"]}}
+
+    for batch_queries in (False, True):
+        rag_fusion = RAGFusion(vector_store=store, llm=Mock(), top_k=4, batch_queries=batch_queries, lexical_index=lexical_index)
+        documents = rag_fusion.retrieve("my credentials", queries=["credential", "university degree"], filter=where)
+        async_documents = asyncio.run(rag_fusion.aretrieve("my credentials", queries=["credential"], filter=where))
+        assert {doc.metadata["id"] for doc in documents} == {"passport", "license"}
+        assert {doc.metadata["id"] for doc in async_documents} == {"passport", "license"}
+
+
+def test_listing_question_answered_from_index():
+    system = VCRAGSystem(
+        vector_store=_make_store("metadata_listing"),
+        router_config=RouterConfig(model_name="gpt-4", temperature=0.0, max_tokens=150),
+        metadata_index=_index()
+    )
+    system.router = Mock()
+    system.rag_fusion = Mock()
+    system.generation_chain = Mock()
+
+    result = system.answer("Which of my credentials from did:example:gov expire before 2026?")
+    count = asyncio.run(system.aanswer("How many credentials were issued by did:example:gov?"))
+
+    assert result["source"] == "metadata_index"
+    assert result["answer"].startswith("You have 1 matching credential")
+    assert "passport: PassportCredential" in result["context"]
+    assert count["answer"].startswith("You have 2 matching credentials")
+    system.router.route.assert_not_called()
+    system.rag_fusion.retrieve.assert_not_called()
+    system.generation_chain.invoke.assert_not_called()
+
+
+def test_unsatisfiable_constraints_skip_unfiltered_retrieval():
+    system = VCRAGSystem(
+        vector_store=_make_store("metadata_unmatched"),
+        router_config=RouterConfig(model_name="gpt-4", temperature=0.0, max_tokens=150),
+        metadata_index=_index()
+    )
+    system.router = Mock()
+    system.rag_fusion = Mock()
+
+    result = system.answer("When does my passport from did:example:gov that expired before 2020 say I was born?")
+
+    assert result["source"] == "metadata_index"
+    assert result["answer"].startswith("You have 0 matching credentials")
+    system.rag_fusion.retrieve.assert_not_called()
+
+
+def test_constraints_that_cannot_be_pushed_down_are_answered_from_index(monkeypatch):
+    index = _index()
+    gov = MetadataFilter(issuer="did:example:gov")
+    monkeypatch.setattr(metadata_index, "MAX_PUSHDOWN_IDS", 2)
+    assert index.where_clause(MetadataFilter(expires_from=date(2025, 1, 1))) == {"id": {"$nin": ["degree"]}}
+    monkeypatch.setattr(metadata_index, "MAX_PUSHDOWN_IDS", 1)
+    assert index.where_clause(gov) is None
+    assert index.where_clause(MetadataFilter(types=["VerifiableCredential"])) is None
+
+    index.upsert("passport", dict(_metadata(*CREDENTIALS[0]), id=""))
+    system = VCRAGSystem(
+        vector_store=_make_store("metadata_no_pushdown"),
+        router_config=RouterConfig(model_name="gpt-4", temperature=0.0, max_tokens=150),
+        metadata_index=index
+    )
+    system.router = Mock()
+    system.rag_fusion = Mock()
+    monkeypatch.setattr(metadata_index, "MAX_PUSHDOWN_IDS", 5000)
+
+    result = system.answer("What does my passport from did:example:gov say about my nationality?")
+
+    assert index.where_clause(gov) is None
+    assert result["source"] == "metadata_index"
+    assert result["answer"].startswith("You have 1 matching credential")
+    system.rag_fusion.retrieve.assert_not_called()
@@ -0,0 +1,91 @@
+import numpy as np
+from unittest.mock import Mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.bench_pipeline import make_corpus
+from src.chains.rag_fusion import RAGFusion
+from src.utils.ingestion import BulkIngestor
+from src.utils.mmap_store import MmapVectorStore
+
+TEXTS = [
+    "Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01",
+    "Types: VerifiableCredential, UniversityDegreeCredential\nIssued on: 2020-06-01",
+    "Types: VerifiableCredential, GymMembershipCredential\nmembershipType: Gold",
+    "Types: VerifiableCredential, DriverLicenseCredential\nIssuer: did:example:dmv",
+]
+IDS = ["passport", "degree", "gym", "license"]
+METADATAS = [{"id": doc_id, "issuer": "did:example:gov" if i % 2 == 0 else "did:example:edu"} for i, doc_id in enumerate(IDS)]
+
+
+def _store(**kwargs):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    store = MmapVectorStore(embeddings, **kwargs)
+    store.add_texts(TEXTS, metadatas=METADATAS, ids=IDS)
+    return store, embeddings
+
+
+def test_top_k_matches_brute_force_cosine():
+    store, embeddings = _store(dtype="float32")
+    query = embeddings.embed_query("When does my passport expire?")
+    matrix = np.asarray(embeddings.embed_documents(TEXTS))
+    cosine = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+
+    scored = store.search_by_vectors([query, query], k=3)
+
+    assert [doc.metadata["id"] for doc, _ in scored[0]] == [IDS[i] for i in np.argsort(-cosine)[:3]]
+    np.testing.assert_allclose([distance for _, distance in scored[0]], 1 - np.sort(cosine)[::-1][:3], atol=1e-5)
+    assert scored[1] == scored[0]
+    filtered = store.similarity_search_by_vector(query, k=4, filter={"issuer": "did:example:edu"})
+    assert {doc.metadata["id"] for doc in filtered} == {"degree", "license"}
+
+
+def test_upsert_delete_and_reopen(tmp_path):
+    store, embeddings = _store(path=str(tmp_path / "store"), dtype="float16")
+    store.add_texts(["Types: VerifiableCredential, PassportCredential\nExpires on: 2030-01-01"], metadatas=[{"id": "passport"}], ids=["passport"])
+    store.delete(["gym"])
+    assert len(store) == 3
+
+    store.save()
+    reopened = MmapVectorStore(embeddings, path=str(tmp_path / "store"))
+
+    assert isinstance(reopened._matrix, np.memmap)
+    assert reopened._matrix.dtype == np.float16
+    assert len(reopened) == 3
+    assert reopened.get_by_ids(["passport"])[0].page_content.endswith("2030-01-01")
+    assert reopened.get_by_ids(["gym"]) == []
+    query = embeddings.embed_query(TEXTS[1])
+    assert reopened.similarity_search_by_vector(query, k=1)[0].metadata["id"] == "degree"
+
+    reopened.add_texts(["Types: VerifiableCredential, LibraryCardCredential"], ids=["library"])
+    reopened.save()
+    assert sorted(path.name for path in (tmp_path / "store").iterdir()) == [
+        "index.json", "offsets-2.npy", "records-2.bin", "vectors-2.npy"
+    ]
+    assert len(MmapVectorStore(embeddings, path=str(tmp_path / "store"))) == 4
+
+
+def test_bulk_ingestion_saves_the_store(tmp_path):
+    embeddings = DeterministicFakeEmbedding(size=32)
+    ingestor = BulkIngestor(MmapVectorStore(embeddings, path=str(tmp_path / "store")), max_workers=0)
+
+    stats = ingestor.ingest(make_corpus(12, issuers=2, types=2, seed=1))
+    assert stats.documents == 12
+    assert len(MmapVectorStore(embeddings, path=str(tmp_path / "store"))) == 12
+
+    removed = ingestor.vector_store.similarity_search("credential", k=1)[0].id
+    ingestor.delete([removed])
+    reopened = MmapVectorStore(embeddings, path=str(tmp_path / "store"))
+    assert len(reopened) == 11 and reopened.get_by_ids([removed]) == []
+
+
+def test_drop_in_for_rag_fusion_and_retrievers():
+    store, _ = _store()
+    for batch_queries in (False, True):
+        rag_fusion = RAGFusion(vector_store=store, llm=Mock(), top_k=2, batch_queries=batch_queries)
+        documents = rag_fusion.retrieve(TEXTS[2], queries=[TEXTS[2], "gold membership"])
+        assert documents[0].metadata["id"] == "gym"
+
+    retrieved = store.as_retriever(search_kwargs={"k": 1}).invoke(TEXTS[0])
+    assert retrieved[0].metadata["id"] == "passport"
+    relevance = store.similarity_search_with_relevance_scores(TEXTS[0], k=1)
+    assert relevance[0][1] > 0.99
@@ -0,0 +1,112 @@
+import pytest
+from unittest.mock import Mock
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import Chroma
+
+from src.chains.rag_fusion import RAGFusion
+from src.utils.rank_fusion import document_key, reciprocal_rank_fusion
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    embed_documents_calls: int = 0
+    embed_query_calls: int = 0
+
+    def embed_documents(self, texts):
+        self.embed_documents_calls += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embed_query_calls += 1
+        return super().embed_query(text)
+
+
+def _make_store(name):
+    embeddings = CountingEmbeddings(size=16)
+    store = Chroma(collection_name=name, embedding_function=embeddings)
+    store.add_texts(
+        [
+            "Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01",
+            "Types: VerifiableCredential, UniversityDegreeCredential\nIssued on: 2020-06-01",
+            "Types: VerifiableCredential, GymMembershipCredential\nmembershipType: Gold",
+        ],
+        metadatas=[{"id": "passport"}, {"id": "degree"}, {"id": "gym"}],
+        ids=["passport", "degree", "gym"]
+    )
+    embeddings.embed_documents_calls = 0
+    return store, embeddings
+
+
+def test_batched_retrieval_uses_single_embedding_call():
+    store, embeddings = _make_store("batched_retrieval")
+    rag_fusion = RAGFusion(vector_store=store, llm=Mock(), top_k=2, batch_queries=True)
+    queries = ["passport expiry", "degree issuance", "gym membership"]
+    
+    scored_lists = rag_fusion.search_batch("When does my passport expire?", queries)
+    
+    assert embeddings.embed_documents_calls == 1
+    assert embeddings.embed_query_calls == 0
+    assert len(scored_lists) == len(queries) + 1
+    for scored_list in scored_lists:
+        assert len(scored_list) == 2
+        distances = [score for _, score in scored_list]
+        assert distances == sorted(distances)
+    
+    documents = rag_fusion.retrieve("When does my passport expire?", queries=queries)
+    assert len(documents) == 2
+    assert embeddings.embed_documents_calls == 2
+
+
+def test_batched_retrieval_matches_per_query_search():
+    store, _ = _make_store("batched_matches_loop")
+    queries = ["passport expiry", "gym membership"]
+    
+    batched = RAGFusion(vector_store=store, llm=Mock(), top_k=3, batch_queries=True)
+    scored_lists = batched.search_batch("passport", queries)
+    
+    for query, scored_list in zip(["passport"] + queries, scored_lists):
+        expected = store.similarity_search(query, k=3)
+        assert [doc.metadata["id"] for doc, _ in scored_list] == [doc.metadata["id"] for doc in expected]
+
+
+def _doc(doc_id, content=None):
+    return Document(page_content=content or f"credential {doc_id}", metadata={"id": doc_id})
+
+
+def test_reciprocal_rank_fusion_uses_positional_ranks():
+    results = [
+        [_doc("a"), _doc("b"), _doc("c")],
+        [_doc("c"), _doc("a"), _doc("d")],
+    ]
+    
+    fused = reciprocal_rank_fusion(results, k=60)
+    
+    assert [doc.metadata["id"] for doc, _ in fused] == ["a", "c", "b", "d"]
+    scores = dict((doc.metadata["id"], score) for doc, score in fused)
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["d"] == pytest.approx(1 / 63)
+
+
+def test_reciprocal_rank_fusion_weights_and_content_keys():
+    untagged = Document(page_content="Issuer: did:example:gov", metadata={})
+    results = [
+        [_doc("a"), untagged],
+        [Document(page_content="Issuer: did:example:gov", metadata={}), _doc("a")],
+    ]
+    
+    fused = reciprocal_rank_fusion(results, k=0, weights=[1.0, 3.0])
+    
+    assert len(fused) == 2
+    assert fused[0][0].page_content == "Issuer: did:example:gov"
+    assert fused[0][1] == pytest.approx(1 / 2 + 3 / 1)
+    assert document_key(untagged) == document_key(results[1][0])
+    
+    with pytest.raises(ValueError):
+        reciprocal_rank_fusion(results, weights=[1.0])
+
+
+def test_rag_fusion_query_weights_pad_extra_lists():
+    rag_fusion = RAGFusion(vector_store=Mock(), llm=Mock(), rrf_k=1, query_weights=[2.0])
+    results = [[(_doc("a"), 0.1)], [(_doc("b"), 0.2)]]
+    
+    assert [doc.metadata["id"] for doc in rag_fusion.reciprocal_rank_fusion(results)] == ["a", "b"]
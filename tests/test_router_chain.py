@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+from src.models.router import DataSource, RouterConfig, RouteTier
+from src.chains.router_chain import RouterChain
+
+
+def _llm_response(content):
+    return Mock(invoke=Mock(return_value=Mock(content=content)), ainvoke=AsyncMock(return_value=Mock(content=content)))
+
+
+def _vector_store(relevance):
+    store = Mock()
+    store.similarity_search_with_relevance_scores = Mock(return_value=[(Mock(), relevance)])
+    return store
+
+
+def test_local_tier_skips_llm_for_clear_questions():
+    router = RouterChain(RouterConfig(), vector_store=_vector_store(0.9))
+    router.router_chain = _llm_response('{"datasource": "not_found", "reasoning": "llm"}')
+    
+    result = router.route("When does my passport credential expire?")
+    
+    assert result["datasource"] == DataSource.VC_KNOWLEDGE_BASE
+    assert result["decided_by"] == RouteTier.LOCAL
+    router.router_chain.invoke.assert_not_called()
+    
+    router.local_classifier.vector_store = _vector_store(0.05)
+    result = router.route("What is the weather like today?")
+    assert result["datasource"] == DataSource.NOT_FOUND
+    assert result["decided_by"] == RouteTier.LLM
+
+
+def test_ambiguous_questions_go_to_llm_then_cache():
+    router = RouterChain(RouterConfig(), vector_store=_vector_store(0.6))
+    router.router_chain = _llm_response(
+        '```json\n{"datasource": "vc_knowledge_base", "reasoning": "About an event ticket"}\n```'
+    )
+    
+    result = router.route("What is the event name and date?")
+    assert result == {
+        "datasource": DataSource.VC_KNOWLEDGE_BASE,
+        "reasoning": "About an event ticket",
+        "decided_by": RouteTier.LLM
+    }
+    
+    cached = router.route("  what is the EVENT name and date ")
+    assert cached["decided_by"] == RouteTier.CACHE
+    assert cached["datasource"] == DataSource.VC_KNOWLEDGE_BASE
+    assert router.router_chain.invoke.call_count == 1
+    assert router.stats["decisions"] == {"cache": 1, "local": 0, "llm": 1}
+    assert router.stats["llm_avoided_rate"] == 0.5
+
+
+def test_malformed_llm_output_falls_back_to_local_guess():
+    router = RouterChain(RouterConfig(), vector_store=_vector_store(0.3))
+    router.router_chain = _llm_response("I think this is about credentials")
+    
+    result = router.route("Who issued my ticket credential?")
+    
+    assert result["datasource"] == DataSource.VC_KNOWLEDGE_BASE
+    assert result["decided_by"] == RouteTier.LOCAL
+    assert "LLM router unavailable" in result["reasoning"]
+    # Fallback decisions are not cached, the LLM is retried next time
+    router.route("Who issued my ticket credential?")
+    assert router.router_chain.invoke.call_count == 2
+
+
+def test_generic_words_alone_do_not_route_locally():
+    router = RouterChain(RouterConfig())
+    router.router_chain = _llm_response('{"datasource": "not_found", "reasoning": "Sports question"}')
+    
+    result = router.route("What's the score of the game? Who is a member of the team, and is my ticket still valid?")
+    
+    assert result["decided_by"] == RouteTier.LLM
+    assert result["datasource"] == DataSource.NOT_FOUND
+    assert router.local_classifier.lexicon_score("Which credentials has my university issued?") == 1.0
+
+def test_local_tier_never_rejects_in_domain_questions_without_llm():
+    router = RouterChain(RouterConfig(), vector_store=_vector_store(0.4))
+    router.router_chain = _llm_response('{"datasource": "vc_knowledge_base", "reasoning": "Employment credential"}')
+    
+    result = router.route("What is my employee number?")
+    
+    assert router.local_classifier.classify("What is my employee number?")["confidence"] >= RouterConfig().local_confidence_threshold
+    assert result["datasource"] == DataSource.VC_KNOWLEDGE_BASE
+    assert result["decided_by"] == RouteTier.LLM
+
+
+def test_llm_only_router_keeps_not_found_default():
+    router = RouterChain(RouterConfig(local_routing=False))
+    router.router_chain = _llm_response("not json")
+    
+    result = asyncio.run(router.aroute("When does my passport expire?"))
+    
+    assert result["datasource"] == DataSource.NOT_FOUND
+    assert result["reasoning"].startswith("Error parsing router response")
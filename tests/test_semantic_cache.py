@@ -0,0 +1,109 @@
+import time
+import zlib
+import numpy as np
+from unittest.mock import Mock
+
+from src.models.cache import SemanticCacheConfig
+from src.utils.semantic_cache import SemanticCache, SQLiteCacheBackend
+
+
+class BagOfWordsEmbeddings:
+    """Deterministic embeddings where shared words mean similar vectors."""
+
+    def __init__(self, size=64):
+        self.size = size
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        vector = np.zeros(self.size)
+        for word in text.lower().replace("?", "").split():
+            vector[zlib.crc32(word.encode()) % self.size] += 1.0
+        return vector.tolist()
+
+
+ANSWER = {"answer": "It expires on 2028-01-01.", "reasoning": "r", "source": "vc_knowledge_base", "context": "c"}
+
+
+def test_semantic_cache_hits_similar_questions():
+    embeddings = BagOfWordsEmbeddings()
+    cache = SemanticCache(embeddings, SemanticCacheConfig(similarity_threshold=0.8))
+    
+    assert cache.lookup("when does my passport credential expire") is None
+    cache.store("when does my passport credential expire", ANSWER, ["urn:passport"])
+    # The miss embedding is reused by store()
+    assert embeddings.calls == 1
+    
+    # Exact normalized match needs no embedding call
+    assert cache.lookup("When does my passport credential expire?") == ANSWER
+    assert embeddings.calls == 1
+    
+    assert cache.lookup("when does my passport credential expire please") == ANSWER
+    assert cache.lookup("what is my gym membership level") is None
+    assert cache.stats["hits"] == 2
+    assert cache.stats["misses"] == 2
+
+
+def test_semantic_cache_lru_ttl_and_invalidation():
+    cache = SemanticCache(
+        BagOfWordsEmbeddings(),
+        SemanticCacheConfig(similarity_threshold=0.99, max_entries=2, ttl_seconds=60)
+    )
+    cache.store("passport expiry", ANSWER, ["urn:passport"])
+    cache.store("degree issuer", ANSWER, ["urn:degree"])
+    assert cache.lookup("passport expiry") is not None
+    cache.store("gym membership", ANSWER, ["urn:gym"])
+    
+    # "degree issuer" was least recently used
+    assert cache.lookup("degree issuer") is None
+    assert cache.stats["evictions"] == 1
+    
+    assert cache.invalidate_documents(["urn:passport"]) == 1
+    assert cache.lookup("passport expiry") is None
+    
+    cache.config.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.lookup("gym membership") is None
+    assert cache.stats["entries"] == 0
+
+
+def test_semantic_cache_memory_bound():
+    cache = SemanticCache(BagOfWordsEmbeddings(), SemanticCacheConfig(max_bytes=2000))
+    for i in range(10):
+        cache.store(f"question number {i}", ANSWER, [f"urn:{i}"])
+    assert cache.stats["bytes"] <= 2000
+    assert 0 < cache.stats["entries"] < 10
+
+
+def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SemanticCache(BagOfWordsEmbeddings(), backend=SQLiteCacheBackend(path))
+    cache.store("passport expiry", ANSWER, ["urn:passport"])
+    cache.store("degree issuer", ANSWER, ["urn:degree"])
+    cache.invalidate_documents(["urn:degree"])
+    
+    restarted = SemanticCache(BagOfWordsEmbeddings(), backend=SQLiteCacheBackend(path))
+    assert restarted.stats["entries"] == 1
+    assert restarted.lookup("passport expiry") == ANSWER
+    assert restarted.lookup("degree issuer") is None
+
+
+def test_vc_rag_system_uses_answer_cache():
+    from src.chains.vc_rag_system import VCRAGSystem
+    from src.models.router import DataSource, RouterConfig
+    
+    cache = SemanticCache(BagOfWordsEmbeddings())
+    system = VCRAGSystem(vector_store=Mock(), router_config=RouterConfig(), answer_cache=cache)
+    system.router.route = Mock(return_value={"datasource": DataSource.VC_KNOWLEDGE_BASE, "reasoning": "r"})
+    system.rag_fusion.retrieve = Mock(return_value=[Mock(page_content="Expires on: 2028-01-01", metadata={"id": "urn:passport"})])
+    system.generation_chain = Mock(invoke=Mock(return_value=Mock(content="2028-01-01")))
+    
+    first = system.answer("When does my passport expire?")
+    second = system.answer("When does my passport expire?")
+    
+    assert first == second
+    assert system.router.route.call_count == 1
+    
+    cache.invalidate_documents(["urn:passport"])
+    system.answer("When does my passport expire?")
+    assert system.router.route.call_count == 2
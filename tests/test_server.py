@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.bench_pipeline import HashingEmbeddings, SyntheticChatModel, make_corpus
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import RouterConfig
+from src.models.server import ServerConfig
+from src.utils.ingestion import BulkIngestor
+from src.utils.mmap_store import MmapVectorStore
+from src.utils.server import VCRAGServer
+
+QUESTION = "When does my DriverLicenseCredential expire?"
+
+
+def _server(latency=0.05, **config):
+    store = MmapVectorStore(HashingEmbeddings())
+    ingestor = BulkIngestor(store, max_workers=0)
+    ingestor.ingest(make_corpus(20, issuers=3, types=4, seed=2))
+    llm = SyntheticChatModel(latency=latency, answer_words=12)
+    return VCRAGServer(
+        system=VCRAGSystem(vector_store=store, router_config=RouterConfig(), llm=llm),
+        conversational=ConversationalVCRAG(vector_store=store, router_config=RouterConfig(), llm=llm),
+        ingestor=ingestor,
+        config=ServerConfig(port=0, **config)
+    )
+
+
+async def _request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    if headers.get("Content-Type") == "text/event-stream":
+        events = [json.loads(line[len("data: "):]) for line in body.decode().split("\n\n") if line]
+        return int(lines[0].split()[1]), headers, events
+    return int(lines[0].split()[1]), headers, json.loads(body)
+
+
+def test_identical_questions_share_one_execution():
+    async def scenario():
+        server = await _server().start()
+        variants = [QUESTION, QUESTION.lower(), f"  {QUESTION} ", QUESTION, QUESTION.upper()]
+        responses = await asyncio.gather(*(_request(server.port, "POST", "/answer", {"question": q}) for q in variants))
+        streams = await asyncio.gather(*(_request(server.port, "POST", "/answer/stream", {"question": QUESTION}) for _ in range(3)))
+        _, _, health = await _request(server.port, "GET", "/health")
+        await server.stop()
+        return responses, streams, health
+
+    responses, streams, health = asyncio.run(scenario())
+
+    assert {status for status, _, _ in responses} == {200}
+    assert len({body["answer"] for _, _, body in responses}) == 1
+    assert responses[0][2]["source"] == "vc_knowledge_base"
+    for status, headers, events in streams:
+        assert status == 200
+        assert events[-1]["type"] == "final"
+        assert events == streams[0][2]
+    assert health["executions"] == 2
+    assert health["coalesced"] == 6
+    assert health["pending"] == 0
+
+
+def test_conversation_and_ingest_endpoints():
+    async def scenario():
+        server = await _server(latency=0).start()
+        first = await _request(server.port, "POST", "/conversation", {"question": QUESTION, "session_id": "alice"})
+        streamed = await _request(server.port, "POST", "/conversation", {"question": "And who issued it?", "session_id": "alice", "stream": True})
+        anonymous = [await _request(server.port, "POST", "/conversation", {"question": QUESTION}) for _ in range(2)]
+        ingested = await _request(server.port, "POST", "/ingest", {"records": make_corpus(3, seed=9)})
+        invalid = await _request(server.port, "POST", "/answer", {"question": ""})
+        missing = await _request(server.port, "GET", "/nothing")
+        await server.stop()
+        return first, streamed, anonymous, ingested, invalid, missing, server.conversational
+
+    first, streamed, anonymous, ingested, invalid, missing, conversational = asyncio.run(scenario())
+
+    assert first[0] == 200
+    assert set(first[2]) == {"answer", "reasoning", "source", "context", "source_data", "generated_question", "session_id"}
+    assert first[2]["session_id"] == "alice"
+    assert [event["type"] for event in streamed[2]][-1] == "final"
+    assert streamed[2][-1]["result"]["session_id"] == "alice"
+    sessions = [body["session_id"] for _, _, body in anonymous]
+    assert len(set(sessions)) == 2 and "alice" not in sessions
+    assert all(len(conversational.sessions.get(session).chat_memory.messages) == 2 for session in sessions)
+    assert len(streamed[2][-1]["result"]["answer"]) > 0
+    assert ingested[0] == 200 and ingested[2]["documents"] == 3
+    assert invalid[0] == 400
+    assert missing[0] == 404
+
+
+def test_overload_is_refused_with_429():
+    async def scenario():
+        server = await _server(latency=0.2, max_pending=1).start()
+        slow = asyncio.ensure_future(_request(server.port, "POST", "/answer", {"question": QUESTION}))
+        await asyncio.sleep(0.05)
+        refused = await _request(server.port, "POST", "/answer", {"question": "Tell me about the credential issued by did:example:gov"})
+        completed = await slow
+        await server.stop()
+        return refused, completed, server.stats
+
+    refused, completed, stats = asyncio.run(scenario())
+
+    assert refused[0] == 429
+    assert refused[1]["Retry-After"] == "1"
+    assert completed[0] == 200
+    assert stats["rejected"] == 1
+
+
+def test_shutdown_lets_admitted_requests_finish():
+    async def scenario():
+        server = await _server(latency=0.1).start()
+        port = server.port
+        in_flight = asyncio.ensure_future(_request(port, "POST", "/answer", {"question": QUESTION}))
+        await asyncio.sleep(0.05)
+        await server.stop()
+        finished = await in_flight
+        with pytest.raises(OSError):
+            await _request(port, "GET", "/health")
+        return finished
+
+    status, _, body = asyncio.run(scenario())
+
+    assert status == 200
+    assert body["answer"]
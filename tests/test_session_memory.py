@@ -0,0 +1,97 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_community.vectorstores import Chroma
+
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+from src.models.memory import SessionMemoryConfig
+from src.models.router import RouterConfig
+from src.utils.session_memory import SessionMemoryManager
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, summary, new_lines):
+        self.calls.append((summary, new_lines))
+        return f"{summary} | {new_lines.splitlines()[0]}".strip(" |")
+
+
+def test_history_beyond_window_is_summarized():
+    summarize = RecordingSummarizer()
+    manager = SessionMemoryManager(SessionMemoryConfig(window_turns=2), summarize=summarize)
+    memory = manager.get("alice")
+
+    for i in range(4):
+        manager.save_turn(memory, f"question {i}", f"answer {i}")
+
+    assert len(memory.chat_memory.messages) == 4
+    assert [call[1] for call in summarize.calls] == ["Human: question 0\nAI: answer 0", "Human: question 1\nAI: answer 1"]
+    assert memory.summary == "Human: question 0 | Human: question 1"
+    history = memory.load_memory_variables({})["chat_history"]
+    assert history[0].content.startswith("Summary of the earlier conversation")
+
+
+def test_token_budget_keeps_latest_turn():
+    summarize = RecordingSummarizer()
+    manager = SessionMemoryManager(SessionMemoryConfig(max_token_limit=20), summarize=summarize)
+    memory = manager.get("bob")
+
+    manager.save_turn(memory, "short", "reply")
+    manager.save_turn(memory, "a much longer question " * 5, "a much longer answer " * 5)
+
+    assert len(summarize.calls) == 1
+    assert [message.content for message in memory.chat_memory.messages][0].startswith("a much longer question")
+
+
+def test_sessions_are_evicted_and_restored_from_store(tmp_path):
+    config = SessionMemoryConfig(max_sessions=2, store_path=str(tmp_path / "sessions.db"))
+    manager = SessionMemoryManager(config, summarize=RecordingSummarizer())
+    for session_id in ("a", "b", "c"):
+        manager.save_turn(manager.get(session_id), f"hello from {session_id}", "hi")
+
+    assert len(manager) == 2
+    assert manager.stats["evictions"] == 1
+
+    restored = manager.get("a")
+    assert restored.chat_memory.messages[0].content == "hello from a"
+
+    # A new process sees the persisted sessions; ended sessions are gone
+    manager.end("b")
+    reloaded = SessionMemoryManager(config, summarize=RecordingSummarizer())
+    assert reloaded.get("c").chat_memory.messages[1].content == "hi"
+    assert reloaded.get("b").chat_memory.messages == []
+
+
+def test_idle_sessions_expire():
+    manager = SessionMemoryManager(SessionMemoryConfig(idle_ttl_seconds=60), summarize=RecordingSummarizer())
+    manager.save_turn(manager.get("idle"), "q", "a")
+    manager.get("idle").last_access -= 120
+
+    manager.get("active")
+
+    assert manager.stats == {"sessions": 1, "evictions": 1, "summarizations": 0}
+    assert manager.get("idle").chat_memory.messages == []
+
+
+def test_conversational_rag_keeps_sessions_apart():
+    vector_store = Chroma(collection_name="session_memory_test", embedding_function=DeterministicFakeEmbedding(size=16))
+    vector_store.add_texts(["Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01"], metadatas=[{"id": "urn:passport"}])
+    rag = ConversationalVCRAG(vector_store=vector_store, router_config=RouterConfig())
+    rag.llm = FakeListChatModel(responses=["It expires on 2028-01-01.", "It expires on 2028-01-01.", "Passport issuance", "In 2018."])
+    rag.qa_chain = rag._create_qa_chain()
+
+    first = rag.process_query("When does my passport expire?", session_id="alice")
+    other = rag.process_query("When does my passport expire?", session_id="bob")
+    follow_up = rag.process_query("And when was it issued?", session_id="alice")
+
+    assert first["answer"] == other["answer"] == "It expires on 2028-01-01."
+    assert other["generated_question"] == "When does my passport expire?"
+    assert follow_up["generated_question"] == "Passport issuance"
+    assert follow_up["answer"] == "In 2018."
+    assert len(rag.sessions.get("alice").chat_memory.messages) == 4
+    assert len(rag.sessions.get("bob").chat_memory.messages) == 2
+    assert rag.memory.chat_memory.messages == []
+
+    rag.end_session("alice")
+    assert rag.sessions.get("alice").chat_memory.messages == []
@@ -0,0 +1,161 @@
+from unittest.mock import Mock
+
+import numpy as np
+from langchain_core.documents import Document
+
+from benchmarks.bench_pipeline import HashingEmbeddings, make_corpus
+from src.chains.rag_fusion import RAGFusion
+from src.utils.ingestion import BulkIngestor, process_records
+from src.utils.mmap_store import MmapVectorStore
+from src.utils.sharded_store import (
+    HashPartitioner,
+    MetadataPartitioner,
+    ShardedVectorStore,
+    filter_values,
+)
+from src.utils.vector_search import batch_similarity_search_by_vectors
+
+
+def _ingest(store, count=60):
+    BulkIngestor(store, max_workers=0).ingest(make_corpus(count, issuers=4, types=3, seed=5))
+    return store
+
+
+def test_scatter_gather_matches_a_single_store():
+    embeddings = HashingEmbeddings()
+    single = _ingest(MmapVectorStore(embeddings))
+    sharded = _ingest(ShardedVectorStore(embeddings, partitioner=HashPartitioner(shards=4), max_workers=4))
+    dim = len(embeddings.embed_query("credential"))
+    queries = np.random.default_rng(0).normal(size=(2, dim)).tolist()
+
+    expected = single.search_by_vectors(queries, k=5)
+    merged = batch_similarity_search_by_vectors(sharded, queries, k=5)
+
+    for want, got in zip(expected, merged):
+        assert [doc.id for doc, _ in got] == [doc.id for doc, _ in want]
+        np.testing.assert_allclose([d for _, d in got], [d for _, d in want], atol=1e-6)
+    assert sharded.shard_names == ["shard-000", "shard-001", "shard-002", "shard-003"]
+    assert sharded.stats["shard_searches"] == 4
+    sharded.close()
+
+
+def test_filters_prune_shards_they_cannot_match():
+    embeddings = HashingEmbeddings()
+    sharded = _ingest(ShardedVectorStore(embeddings, partitioner=MetadataPartitioner("issuer")))
+    issuers = sorted({item["metadata"]["issuer"] for item in process_records(make_corpus(60, issuers=4, types=3, seed=5))[0]})
+    query = embeddings.embed_query("credential")
+
+    hits = sharded.similarity_search_by_vector(query, k=50, filter={"issuer": issuers[0]})
+    either = sharded.search_by_vectors([query], k=50, filter={"$or": [{"issuer": issuers[0]}, {"issuer": {"$in": issuers[1:2]}}]})
+    unconstrained = sharded.search_by_vectors([query], k=50, filter={"issuer": {"$ne": issuers[0]}})
+
+    assert len(sharded.shard_names) == 4
+    assert hits and {doc.metadata["issuer"] for doc in hits} == {issuers[0]}
+    assert {doc.metadata["issuer"] for doc, _ in either[0]} == set(issuers[:2])
+    assert {doc.metadata["issuer"] for doc, _ in unconstrained[0]} == set(issuers[1:])
+    assert sharded.stats == {"searches": 3, "shard_searches": 1 + 2 + 4, "pruned": 3 + 2, "skipped": 0}
+    assert filter_values({"$and": [{"issuer": {"$in": ["a", "b"]}}, {"type": "x"}]}, "issuer") == {"a", "b"}
+    assert filter_values({"$or": [{"issuer": "a"}, {"type": "x"}]}, "issuer") is None
+
+
+def test_upserts_move_records_and_shards_rebuild_independently(tmp_path):
+    embeddings = HashingEmbeddings()
+    sharded = ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=MetadataPartitioner("issuer"))
+    sharded.add_texts(["passport", "degree"], metadatas=[{"issuer": "gov"}, {"issuer": "edu"}], ids=["p", "d"])
+    sharded.add_texts(["passport renewed"], metadatas=[{"issuer": "edu"}], ids=["p"])
+    gov, edu = MetadataPartitioner("issuer").shard_for_value("gov"), MetadataPartitioner("issuer").shard_for_value("edu")
+
+    assert len(sharded.shard(gov)) == 0 and len(sharded.shard(edu)) == 2
+    assert [doc.page_content for doc in sharded.get_by_ids(["p", "d"])] == ["passport renewed", "degree"]
+    sharded.save()
+
+    rebuilt = ShardedVectorStore.from_directory(
+        embeddings, str(tmp_path), partitioner=MetadataPartitioner("issuer"), write_shards=[gov]
+    )
+    rebuilt.replace_shard(gov, MmapVectorStore(embeddings, path=str(tmp_path / gov)))
+    rebuilt.add_texts(["passport", "degree"], metadatas=[{"issuer": "gov"}, {"issuer": "edu"}], ids=["p2", "d"])
+    rebuilt.save()
+    reopened = ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=MetadataPartitioner("issuer"))
+
+    assert rebuilt.stats["skipped"] == 1
+    assert sorted(reopened.shard_names) == sorted([gov, edu])
+    assert [doc.id for doc in reopened.get_by_ids(["p", "p2", "d"])] == ["p", "p2", "d"]
+    assert reopened.get_by_ids(["d"])[0].page_content == "degree"
+    reopened.delete(["p"])
+    assert [doc.id for doc in reopened.get_by_ids(["p", "p2"])] == ["p2"]
+
+
+def test_upserts_delete_only_from_the_previous_shard(tmp_path):
+    embeddings = HashingEmbeddings()
+    partitioner = MetadataPartitioner("issuer")
+    gov, edu = partitioner.shard_for_value("gov"), partitioner.shard_for_value("edu")
+    sharded = ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=partitioner)
+    sharded.add_texts(["passport", "degree", "account"], metadatas=[{"issuer": issuer} for issuer in ("gov", "edu", "bank")], ids=["p", "d", "a"])
+    sharded.save()
+    reopened = ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=partitioner)
+    deletes = {}
+    for store in (sharded, reopened):
+        for name in store.shard_names:
+            shard = store.shard(name)
+            shard.delete = Mock(side_effect=shard.delete)
+            deletes[store, name] = shard.delete
+
+    def moved(store):
+        # Upserts inside a shard call delete positionally; moves pass ids=
+        return sorted(
+            (name, call.kwargs["ids"]) for (owner, name), delete in deletes.items() if owner is store
+            for call in delete.call_args_list if "ids" in call.kwargs
+        )
+
+    for store in (sharded, reopened):
+        store.add_texts(["passport renewed", "degree"], metadatas=[{"issuer": "edu"}, {"issuer": "edu"}], ids=["p", "d"])
+
+        assert moved(store) == [(gov, ["p"])]
+        assert len(store.shard(gov)) == 0 and len(store.shard(edu)) == 2
+    reopened.add_texts(["passport"], metadatas=[{"issuer": "gov"}], ids=["p"])
+    assert moved(reopened) == sorted([(gov, ["p"]), (edu, ["p"])])
+    assert len(reopened.shard(edu)) == 1
+
+
+def test_bulk_ingestion_saves_every_shard(tmp_path):
+    embeddings = HashingEmbeddings()
+    partitioner = MetadataPartitioner("issuer")
+    ingestor = BulkIngestor(ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=partitioner), max_workers=0)
+    ingestor.ingest(make_corpus(20, issuers=3, types=2, seed=2))
+    removed = ingestor.vector_store.similarity_search("credential", k=1)[0].id
+    ingestor.delete([removed])
+
+    reopened = ShardedVectorStore.from_directory(embeddings, str(tmp_path), partitioner=partitioner)
+
+    assert len(reopened.shard_names) == 3
+    assert sum(len(reopened.shard(name)) for name in reopened.shard_names) == 19
+    assert reopened.get_by_ids([removed]) == []
+
+
+def test_rag_fusion_retrieves_from_shards():
+    embeddings = HashingEmbeddings()
+    sharded = _ingest(ShardedVectorStore(embeddings, partitioner=HashPartitioner(shards=3)), count=20)
+    wanted = sharded.shard("shard-000").similarity_search("credential", k=1)[0].id
+    rag_fusion = RAGFusion(vector_store=sharded, llm=Mock(), batch_queries=True)
+
+    documents = rag_fusion.retrieve("credential", queries=["passport", "degree"], filter={"id": {"$in": [wanted]}})
+
+    assert [doc.metadata["id"] for doc in documents] == [wanted]
+    assert sharded.stats["pruned"] == 2
+
+
+def test_relevance_scores_are_returned_as_distances():
+    class RelevanceStore:
+        def __init__(self, scored):
+            self.scored = scored
+
+        def similarity_search_by_vector_with_relevance_scores(self, embedding, k, filter=None):
+            return self.scored[:k]
+
+    near, far = Document(page_content="near", metadata={"id": "near"}), Document(page_content="far", metadata={"id": "far"})
+    store = RelevanceStore([(near, 0.9), (far, 0.2)])
+
+    results = batch_similarity_search_by_vectors(store, [[1.0, 0.0]], k=2)
+
+    assert [doc.page_content for doc, _ in results[0]] == ["near", "far"]
+    np.testing.assert_allclose([distance for _, distance in results[0]], [0.1, 0.8])
@@ -0,0 +1,73 @@
+import asyncio
+from unittest.mock import Mock
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_community.vectorstores import Chroma
+
+from src.models.router import DataSource, RouterConfig
+from src.chains.vc_rag_system import VCRAGSystem
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+
+
+def _collect(events):
+    return [event["type"] for event in events], events[-1]
+
+
+def _vc_rag_system():
+    system = VCRAGSystem(vector_store=Mock(), router_config=RouterConfig())
+    route_result = {"datasource": DataSource.VC_KNOWLEDGE_BASE, "reasoning": "About a passport"}
+    system.router.route = Mock(return_value=route_result)
+    system.rag_fusion.retrieve = Mock(return_value=[
+        Mock(page_content="Passport expires on 2028-01-01", metadata={"id": "urn:passport"})
+    ])
+    system.generation_chain = system.generation_prompt | FakeListChatModel(
+        responses=["It expires on 2028-01-01."] * 2
+    )
+    return system
+
+
+def test_answer_stream_yields_route_context_tokens_and_final():
+    system = _vc_rag_system()
+    
+    types, final = _collect(list(system.answer_stream("When does my passport expire?")))
+    
+    assert types[:2] == ["route", "context"]
+    assert types[-1] == "final"
+    assert types.count("token") > 1
+    assert final["result"] == system.answer("When does my passport expire?")
+    assert final["timings"]["time_to_first_token"] <= final["timings"]["generation_time"]
+
+
+def test_answer_stream_not_found_skips_generation():
+    system = _vc_rag_system()
+    system.router.route = Mock(return_value={"datasource": DataSource.NOT_FOUND, "reasoning": "Weather"})
+    
+    types, final = _collect(list(system.answer_stream("What is the weather like?")))
+    
+    assert types == ["route", "final"]
+    assert final["result"]["source"] == "not_found"
+    system.rag_fusion.retrieve.assert_not_called()
+
+
+def test_conversational_stream_matches_process_query_shape():
+    vector_store = Chroma(collection_name="streaming_test", embedding_function=DeterministicFakeEmbedding(size=16))
+    vector_store.add_texts(["Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01"], metadatas=[{"id": "urn:passport"}])
+    rag = ConversationalVCRAG(vector_store=vector_store, router_config=RouterConfig())
+    rag.llm = FakeListChatModel(responses=["It expires on 2028-01-01.", "Passport expiry", "It was issued in 2018."])
+    rag.qa_chain = rag._create_qa_chain()
+    
+    types, final = _collect(list(rag.process_query_stream("When does my passport expire?")))
+    assert types[0] == "context"
+    assert types[-1] == "final"
+    assert final["result"]["answer"] == "It expires on 2028-01-01."
+    assert final["result"]["generated_question"] == "When does my passport expire?"
+    assert final["timings"]["time_to_first_token"] is not None
+    
+    async def follow_up():
+        return [event async for event in rag.aprocess_query_stream("And when was it issued?")]
+    
+    types, final = _collect(asyncio.run(follow_up()))
+    # The second turn condenses the question using chat history
+    assert final["result"]["generated_question"] == "Passport expiry"
+    assert set(final["result"]) == {"answer", "reasoning", "source", "context", "source_data", "generated_question"}
+    assert len(rag.memory.chat_memory.messages) == 4
@@ -0,0 +1,92 @@
+import asyncio
+import io
+import json
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+from src.chains.vc_rag_system import VCRAGSystem
+from src.models.router import RouterConfig
+from src.utils.tracing import (
+    NULL_TRACER,
+    JSONLinesSink,
+    PrometheusSink,
+    RingBufferSink,
+    Tracer,
+    with_timings
+)
+
+ROUTE = '{"datasource": "vc_knowledge_base", "reasoning": "About a credential"}'
+
+
+def _system(tracer, name):
+    store = Chroma(collection_name=name, embedding_function=DeterministicFakeEmbedding(size=16))
+    store.add_texts(
+        ["Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01"],
+        metadatas=[{"id": "passport"}],
+        ids=["passport"]
+    )
+    llm = FakeListChatModel(responses=[ROUTE, "passport expiry\nexpiration date", "It expires on 2028-01-01."])
+    return VCRAGSystem(
+        vector_store=store,
+        router_config=RouterConfig(local_routing=False),
+        llm=llm,
+        tracer=tracer
+    )
+
+
+def test_spans_share_request_and_feed_every_sink():
+    buffer, stream, prometheus = RingBufferSink(capacity=2), io.StringIO(), PrometheusSink()
+    tracer = Tracer([buffer, JSONLinesSink(stream), prometheus])
+
+    with tracer.request("answer", request_id="req-1") as trace:
+        with tracer.span("route") as span:
+            span.set(cache_hit=True, tokens_in=12)
+        with tracer.span("generate", tokens_out=5):
+            pass
+
+    assert [span.name for span in buffer.spans()] == ["generate", "answer"]
+    assert {span.request_id for span in buffer.spans()} == {"req-1"}
+    assert set(trace.timings()) == {"route", "generate", "answer"}
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert lines[0]["name"] == "route" and lines[0]["attributes"]["tokens_in"] == 12
+    metrics = prometheus.render()
+    assert 'vc_rag_stage_duration_seconds_count{stage="route"} 1' in metrics
+    assert 'vc_rag_stage_cache_hit_total{stage="route"} 1' in metrics
+    assert 'vc_rag_stage_tokens_out_total{stage="generate"} 5' in metrics
+
+
+def test_null_tracer_records_nothing():
+    with NULL_TRACER.request("answer") as trace:
+        with NULL_TRACER.span("route") as span:
+            span.set(cache_hit=True)
+
+    assert trace is None
+    assert not span.recording
+    assert with_timings({"answer": "x"}, trace) == {"answer": "x"}
+
+
+def test_answer_carries_stage_timings():
+    buffer = RingBufferSink()
+    system = _system(Tracer([buffer]), "tracing_answer")
+
+    result = system.answer("When does my passport expire?")
+
+    assert result["answer"] == "It expires on 2028-01-01."
+    assert {"answer", "route", "generate_queries", "search", "similarity_search", "fuse", "pack", "generate"} <= set(result["timings"])
+    spans = {span.name: span for span in buffer.spans(result["request_id"])}
+    assert spans["route"].attributes["decided_by"] == "llm"
+    assert spans["generate_queries"].attributes["queries"] == 2
+    assert spans["search"].attributes["retrieved"] == 2
+    assert spans["generate"].attributes["tokens_out"] > 0
+
+
+def test_async_answer_traces_concurrent_searches():
+    buffer = RingBufferSink()
+    system = _system(Tracer([buffer]), "tracing_aanswer")
+
+    result = asyncio.run(system.aanswer("When does my passport expire?"))
+
+    searches = [span for span in buffer.spans(result["request_id"]) if span.name == "similarity_search"]
+    assert len(searches) == 2
+    assert "timings" not in _system(None, "tracing_untraced").answer("When does my passport expire?")
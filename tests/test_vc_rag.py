@@ -1,5 +1,6 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 from langchain.vectorstores import Chroma
 from langchain_openai import ChatOpenAI
 
@@ -50,10 +51,10 @@ def test_vc_data_processor_json():
 
 def test_vc_rag_system_not_found(vc_rag_system):
     # Mock the router to return not_found
-    vc_rag_system.router.route = Mock(return_value=Mock(
-        datasource=DataSource.NOT_FOUND,
-        reasoning="Question is not related to VCs"
-    ))
+    vc_rag_system.router.route = Mock(return_value={
+        "datasource": DataSource.NOT_FOUND,
+        "reasoning": "Question is not related to VCs"
+    })
     
     result = vc_rag_system.answer("What is the weather like?")
     
@@ -63,10 +64,10 @@ def test_vc_rag_system_not_found(vc_rag_system):
 
 def test_vc_rag_system_vc_knowledge_base(vc_rag_system):
     # Mock the router to return vc_knowledge_base
-    vc_rag_system.router.route = Mock(return_value=Mock(
-        datasource=DataSource.VC_KNOWLEDGE_BASE,
-        reasoning="Question is about a VC"
-    ))
+    vc_rag_system.router.route = Mock(return_value={
+        "datasource": DataSource.VC_KNOWLEDGE_BASE,
+        "reasoning": "Question is about a VC"
+    })
     
     # Mock the RAG-Fusion retrieval
     mock_docs = [
@@ -76,11 +77,106 @@ def test_vc_rag_system_vc_knowledge_base(vc_rag_system):
     vc_rag_system.rag_fusion.retrieve = Mock(return_value=mock_docs)
     
     # Mock the generation chain
-    vc_rag_system.generation_chain.run = Mock(return_value="The passport expires on January 1, 2028.")
+    vc_rag_system.generation_chain = Mock(invoke=Mock(return_value=Mock(content="The passport expires on January 1, 2028.")))
     
     result = vc_rag_system.answer("When does the passport expire?")
     
     assert result["source"] == "vc_knowledge_base"
     assert "passport expires" in result["answer"].lower()
     assert result["reasoning"] == "Question is about a VC"
-    assert "Passport expires on 2028-01-01" in result["context"] 
\ No newline at end of file
+    assert "Passport expires on 2028-01-01" in result["context"] 
+def test_vc_rag_system_aanswer_matches_answer(vc_rag_system):
+    route_result = {
+        "datasource": DataSource.VC_KNOWLEDGE_BASE,
+        "reasoning": "Question is about a VC"
+    }
+    vc_rag_system.router.route = Mock(return_value=route_result)
+    vc_rag_system.router.aroute = AsyncMock(return_value=route_result)
+    
+    queries = ["passport expiry", "when does the passport expire"]
+    vc_rag_system.rag_fusion.generate_queries = Mock(return_value=queries)
+    vc_rag_system.rag_fusion.agenerate_queries = AsyncMock(return_value=queries)
+    
+    mock_docs = [
+        Mock(page_content="Passport expires on 2028-01-01", metadata={"id": "1"}),
+        Mock(page_content="Issued by Example Issuer", metadata={"id": "2"})
+    ]
+    vc_rag_system.vector_store.similarity_search = Mock(return_value=mock_docs)
+    vc_rag_system.vector_store.asimilarity_search = AsyncMock(return_value=mock_docs)
+    
+    response = Mock(content="The passport expires on January 1, 2028.")
+    vc_rag_system.generation_chain = Mock(
+        invoke=Mock(return_value=response),
+        ainvoke=AsyncMock(return_value=response)
+    )
+    
+    sync_result = vc_rag_system.answer("When does the passport expire?")
+    async_result = asyncio.run(vc_rag_system.aanswer("When does the passport expire?"))
+    
+    assert async_result == sync_result
+    assert vc_rag_system.vector_store.asimilarity_search.await_count == len(queries)
+
+def test_vc_rag_system_aanswer_not_found_cancels_query_generation(vc_rag_system):
+    vc_rag_system.router.aroute = AsyncMock(return_value={
+        "datasource": DataSource.NOT_FOUND,
+        "reasoning": "Question is not related to VCs"
+    })
+    
+    async def slow_queries(question):
+        await asyncio.sleep(10)
+        return []
+    vc_rag_system.rag_fusion.agenerate_queries = slow_queries
+    
+    result = asyncio.run(vc_rag_system.aanswer("What is the weather like?"))
+    
+    assert result["source"] == "not_found"
+    assert result["reasoning"] == "Question is not related to VCs"
+
+RDF_CREDENTIALS = """@prefix cred: <https://www.w3.org/2018/credentials#> .
+@prefix ex: <http://example.org/vocab#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+<urn:uuid:passport> a cred:VerifiableCredential, ex:PassportCredential ;
+    cred:issuer <did:example:gov> ;
+    cred:expirationDate "2028-01-01"^^xsd:date ;
+    cred:credentialSubject [ ex:name "John Doe" ; ex:nationality "US" ] .
+
+_:gym a cred:VerifiableCredential, ex:GymMembershipCredential ;
+    cred:issuer <did:example:gym> ;
+    cred:credentialSubject <did:example:holder> .
+
+<did:example:holder> ex:membershipType "Gold" .
+"""
+
+def test_vc_data_processor_rdf_groups_and_compacts():
+    text = VCDataProcessor.rdf_to_text(RDF_CREDENTIALS.split("_:gym")[0])
+    
+    assert "Type: ex:PassportCredential" in text
+    assert "cred:issuer: did:example:gov" in text
+    assert "cred:credentialSubject:\n  ex:name: John Doe\n  ex:nationality: US" in text
+    assert "http://example.org/vocab#" not in text
+
+def test_vc_data_processor_rdf_batch_matches_streamed(tmp_path):
+    from rdflib import Graph
+    turtle_path = tmp_path / "credentials.ttl"
+    turtle_path.write_text(RDF_CREDENTIALS)
+    nt_path = tmp_path / "credentials.nt"
+    Graph().parse(turtle_path, format="turtle").serialize(nt_path, format="nt", encoding="utf-8")
+    
+    batch = list(VCDataProcessor.iter_rdf_credentials(str(turtle_path)))
+    streamed = list(VCDataProcessor.iter_rdf_credentials(str(nt_path)))
+    
+    assert len(batch) == len(streamed) == 2
+    gym, passport = batch
+    assert passport["id"] == "urn:uuid:passport"
+    assert passport["issuer"] == "did:example:gov"
+    assert passport["expirationDate"] == "2028-01-01"
+    assert gym["id"] == ""
+    assert "cred:credentialSubject: did:example:holder\n  ex:membershipType: Gold" in gym["text"]
+    # Without declared prefixes the stream falls back to local names for vocabulary terms
+    assert "  membershipType: Gold" in streamed[0]["text"]
+    assert [r["type"] for r in streamed] == [r["type"] for r in batch]
+    
+    processed = VCDataProcessor.process_vc_data(passport)
+    assert processed["text"] == passport["text"]
+    assert processed["metadata"]["type"] == "PassportCredential, VerifiableCredential"
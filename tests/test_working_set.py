@@ -0,0 +1,73 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import FakeListChatModel
+
+from src.chains.conversational_vc_rag import ConversationalVCRAG
+from src.models.memory import SessionMemoryConfig
+from src.models.router import RouterConfig
+from src.utils.mmap_store import MmapVectorStore
+from src.utils.working_set import WorkingSet, is_standalone_question
+
+
+class TopicEmbeddings(Embeddings):
+    """Embeds texts by the credential they mention, so questions on one topic coincide."""
+
+    def _embed(self, text: str) -> List[float]:
+        text = text.lower()
+        return [float("passport" in text), float("degree" in text), 0.1]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def test_standalone_check():
+    assert is_standalone_question("Who issued my passport?")
+    assert is_standalone_question("When does my university degree expire?")
+    assert not is_standalone_question("And when was it issued?")
+    assert not is_standalone_question("What about the degree?")
+    assert not is_standalone_question("Which one?")
+    assert not is_standalone_question("When do those expire?")
+    assert not is_standalone_question("What is the expiration date?")
+    assert not is_standalone_question("Who issued the credential?")
+    assert not is_standalone_question("Is the credential still valid?")
+    assert is_standalone_question("What is the expiration date of my passport?")
+    assert is_standalone_question("Who issued the DriverLicenseCredential?")
+
+
+def test_working_set_keeps_recent_documents_first():
+    working_set = WorkingSet(capacity=3)
+    assert working_set.similarity([1.0, 0.0]) == -1.0
+
+    working_set.update([1.0, 0.0], [Document(page_content=text, metadata={"id": text}) for text in "ab"])
+    working_set.update([0.0, 2.0], [Document(page_content=text, metadata={"id": text}) for text in "cb"])
+
+    assert [doc.metadata["id"] for doc in working_set.documents] == ["c", "b", "a"]
+    assert working_set.similarity([0.0, 1.0]) == 1.0
+    assert working_set.similarity([1.0, 0.0]) == 0.0
+
+
+def test_follow_ups_skip_condensation_and_reuse_retrieval():
+    store = MmapVectorStore(TopicEmbeddings())
+    store.add_texts(
+        ["Types: VerifiableCredential, PassportCredential\nExpires on: 2028-01-01", "Types: VerifiableCredential, UniversityDegreeCredential"],
+        metadatas=[{"id": "urn:passport"}, {"id": "urn:degree"}]
+    )
+    rag = ConversationalVCRAG(vector_store=store, router_config=RouterConfig(), memory_config=SessionMemoryConfig())
+    rag.llm = FakeListChatModel(responses=["In 2028.", "The passport office.", "When was the degree awarded?", "In 2020."])
+
+    first = rag.process_query("When does my passport expire?")
+    standalone = rag.process_query("Who issued my passport?")
+    follow_up = rag.process_query("And what about the degree?")
+
+    assert standalone["answer"] == "The passport office."
+    assert standalone["generated_question"] == "Who issued my passport?"
+    assert standalone["source_data"] == first["source_data"]
+    assert follow_up["generated_question"] == "When was the degree awarded?"
+    assert follow_up["answer"] == "In 2020."
+    assert set(follow_up) == {"answer", "reasoning", "source", "context", "source_data", "generated_question"}
+    assert rag.turn_counts == {"condensed": 1, "standalone": 1, "retrieved": 2, "reused": 1}